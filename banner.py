@@ -0,0 +1,782 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+
+import aiohttp
+from yarl import URL
+
+from breaker import BannerUnavailable, CircuitBreaker
+from cookie_jar import BannerCookieJar
+from limiter import ConcurrencyController, RateLimiter, Throttle, retry_after
+from logs import get_logger
+from metrics import metrics
+from search_results import SEAT_FIELDS, SearchResultsParser
+
+logger = get_logger('banner')
+
+# Program Constants
+TERMS = {
+    'FALL': '09',
+    'WINTER': '01',
+    'SPRING': '05',
+    'SUMMER': '07',
+}
+
+HEADERS = {
+    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
+    'Accept-Language': 'en-US,en;q=0.9,en-CA;q=0.8',
+    'Cache-Control': 'no-cache',
+    'Connection': 'keep-alive',
+    'Pragma': 'no-cache',
+    'Sec-Fetch-Dest': 'document',
+    'Sec-Fetch-Mode': 'navigate',
+    'Sec-Fetch-Site': 'none',
+    'Sec-Fetch-User': '?1',
+    'Upgrade-Insecure-Requests': '1',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36 Edg/137.0.0.0',
+    'sec-ch-ua': '"Microsoft Edge";v="137", "Chromium";v="137", "Not/A)Brand";v="24"',
+    'sec-ch-ua-mobile': '?0',
+    'sec-ch-ua-platform': '"Windows"',
+}
+
+
+BANNER_URL = URL('https://banner.usask.ca/StudentRegistrationSsb/')
+
+COOKIE_REFRESH_INTERVAL = 300
+# The background refresher wakes every REFRESHER_TICK seconds and renews any session
+# whose cookies are within REFRESH_MARGIN seconds of being due, so searches never wait on it
+REFRESHER_TICK = 15
+REFRESH_MARGIN = 60
+
+# Steps of the cookie refresh, in order. A step that hasn't changed any cookie in
+# STEP_MIN_SAMPLES successful refreshes is skipped, except on every STEP_PROBE_EVERY-th
+# refresh, which runs them all again to keep measuring
+REFRESH_STEPS = ('registration', 'banner_root', 'class_registration', 'term_search')
+STEP_MIN_SAMPLES = 5
+STEP_PROBE_EVERY = 10
+
+# How long any single request may take before it is abandoned (how many may be in flight at
+# once is up to the pool's ConcurrencyController)
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=30)
+
+# Number of sections requested per searchResults page
+SEARCH_PAGE_SIZE = 50
+# Bytes handed to a streaming response parser at a time
+STREAM_CHUNK_SIZE = 64 * 1024
+# Pages of at least this many sections (term-wide crawls, catalog builds) are parsed as they
+# stream in, off the event loop. Smaller ones are parsed whole with json.loads, which is faster
+# and, for pages this size, doesn't cost much memory
+STREAM_MIN_PAGE_SIZE = 200
+# Times the course at the front of a search_many queue can be passed over for a later course in
+# the term a session is already set to (saving it a term switch), and how far ahead it looks
+TERM_AFFINITY_LIMIT = 8
+
+# A course search: (term_code, subject, course_number)
+CourseKey = Tuple[str, str, str]
+
+def get_term_code(year: str, term: str) -> str:
+    """Build Banner's term code (e.g. 202409) from a year and term name"""
+    return f'{year}{TERMS[term.upper()]}'
+
+def get_refresh_term_code() -> str:
+    """Pick the current or next term to put a session into while refreshing its cookies"""
+    current_year = datetime.now().year
+    current_month = datetime.now().month
+
+    # Determine current or next term
+    if current_month >= 9:  # September or later = Fall term
+        return f"{current_year}09"
+    elif current_month >= 5:  # May or later = Summer term
+        return f"{current_year}07"
+    elif current_month >= 1:  # January or later = Winter term
+        return f"{current_year}01"
+    else:
+        return f"{current_year-1}09"  # Fall of previous year
+
+def search_term_dropped(json_data: Dict, term_code: str) -> bool:
+    """Detect a searchResults response that Banner served without our term context"""
+    if json_data.get('success') is False:
+        return True
+    return any(item.get('term', term_code) != term_code for item in json_data.get('data') or [])
+
+def endpoint_name(url: str) -> str:
+    """Label a request by its path below the Banner root, e.g. ssb/searchResults/searchResults"""
+    path = URL(url).path
+    if path.startswith(BANNER_URL.path):
+        path = path[len(BANNER_URL.path):]
+    return path.strip('/') or 'root'
+
+def section_seats(sections: List[Dict]) -> Dict[str, int]:
+    """Map each searchResults item's CRN to its available seats"""
+    return {item['courseReferenceNumber']: int(item['seatsAvailable']) for item in sections}
+
+class RefreshStepStats:
+    """Tracks which cookie refresh steps actually change cookies, shared by every pooled session
+
+    Banner's sessions all behave alike, so what one session learns about a step applies to all.
+    """
+
+    def __init__(self):
+        # step -> [times run, times it changed a cookie]
+        self.counts: Dict[str, List[int]] = {step: [0, 0] for step in REFRESH_STEPS}
+        self.refreshes = 0
+        self.successes = 0
+
+    def steps_to_run(self) -> List[str]:
+        """The steps the next refresh should run"""
+        if self.refreshes % STEP_PROBE_EVERY == 0:
+            return list(REFRESH_STEPS)
+        return [step for step in REFRESH_STEPS if not self.is_skipped(step)]
+
+    def is_skipped(self, step: str) -> bool:
+        runs, useful = self.counts[step]
+        return runs >= STEP_MIN_SAMPLES and useful == 0
+
+    def record_step(self, step: str, changed_cookies: bool):
+        self.counts[step][0] += 1
+        if changed_cookies:
+            self.counts[step][1] += 1
+
+    def record_refresh(self, success: bool, skipped: List[str]):
+        """Record a refresh outcome. A failure with steps skipped puts those steps back in rotation"""
+        self.refreshes += 1
+        if success:
+            self.successes += 1
+        elif skipped:
+            for step in skipped:
+                self.counts[step] = [0, 0]
+
+class BannerSession:
+    """One authenticated Banner session: its own cookie jar, search term state and refresh lifecycle
+
+    Banner's search form is stateful per session, so a session must only run one search
+    at a time. BannerSessionPool hands sessions out exclusively to guarantee that.
+    """
+
+    def __init__(self, name: str, baseline_cookies: Dict[str, str], connector: aiohttp.BaseConnector,
+                 concurrency: ConcurrencyController, rate_limiter: RateLimiter, throttle: Throttle, on_cookies_updated: Callable[[], None] = None,
+                 step_stats: RefreshStepStats = None, breaker: CircuitBreaker = None):
+        self.name = name
+        self.baseline_cookies = dict(baseline_cookies)
+        # Most recently persisted cookies, restored at the start of every refresh, and the jar
+        # version they were last compared at
+        self.saved_cookies: Dict[str, str] = {}
+        self.saved_version = -1
+        self.on_cookies_updated = on_cookies_updated
+        # Shared by the whole pool: how many requests may be in flight, how fast they may be sent
+        # and whether Banner asked us to wait
+        self.concurrency = concurrency
+        self.rate_limiter = rate_limiter
+        self.throttle = throttle
+        self.cookie_jar = BannerCookieJar()
+        self.http = aiohttp.ClientSession(
+            headers=HEADERS,
+            connector=connector,
+            connector_owner=False,
+            cookie_jar=self.cookie_jar,
+            timeout=REQUEST_TIMEOUT,
+        )
+        self.last_cookie_refresh = 0
+        # Total requests sent by this session
+        self.request_count = 0
+
+        # The refresh currently in flight, if any. Every caller that needs fresh cookies while
+        # it runs awaits this same task instead of starting another refresh
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.step_stats = step_stats or RefreshStepStats()
+        # Shared by every pooled session, as an outage takes all of them down at once
+        self.breaker = breaker or CircuitBreaker()
+        # Set while a background refresher keeps this session's cookies fresh, which takes
+        # the age-based refresh out of make_authenticated_request
+        self.background_refresh = False
+        self.last_refresh_duration = None
+        self.last_refresh_ok = None
+
+        # Remember which term the search form is set to and whether a previous search left
+        # criteria behind, so term/search and resetDataForm are only sent when needed
+        self.current_search_term = None
+        self.search_form_dirty = False
+
+    def log(self, message: str, level: int = logging.INFO, **fields):
+        logger.log(level, message, extra={'session': self.name, **fields})
+
+    def get_cookies(self) -> Dict[str, str]:
+        """Return the session's cookies as a name -> value dict"""
+        return self.cookie_jar.values()
+
+    def set_cookies(self, cookies: Dict[str, str]):
+        """Add cookies to the session's jar, scoped to the Banner host"""
+        self.cookie_jar.update_cookies(cookies, BANNER_URL)
+
+    def cookies_changed(self) -> Optional[Dict[str, str]]:
+        """The session's cookies if any value changed since they were last saved, else None"""
+        if self.cookie_jar.version == self.saved_version:
+            return None
+        cookies = self.get_cookies()
+        if cookies == self.saved_cookies:
+            self.saved_version = self.cookie_jar.version
+            return None
+        return cookies
+
+    def mark_saved(self, cookies: Dict[str, str]):
+        """Record cookies from cookies_changed() as persisted, so a later refresh restarts from them"""
+        self.saved_cookies = cookies
+        self.saved_version = self.cookie_jar.version
+
+    def initialize(self, saved_cookies: Dict[str, str] = None):
+        """Load the session's saved cookies (or its config baseline) into a fresh jar"""
+        if saved_cookies:
+            self.saved_cookies = dict(saved_cookies)
+
+        self.cookie_jar.clear()
+        self.set_cookies(self.saved_cookies or self.baseline_cookies)
+        self.last_cookie_refresh = time.time()
+        self.invalidate_search_state()
+        self.log(f"Session initialized with cookies: {list(self.get_cookies().keys())}")
+
+    async def close(self):
+        await self.http.close()
+
+    async def send_request(self, method: str, url: str, parser: Optional[SearchResultsParser] = None,
+                           **kwargs) -> aiohttp.ClientResponse:
+        """Send a request through the shared connection pool without blocking the event loop
+
+        The body is read before returning, so the connection goes straight back to the pool
+        and callers can still use response.status, response.text() and response.json().
+        Given a parser, a successful response's body is streamed into it chunk by chunk
+        instead, and is never held whole. The parser runs in the default executor, so a
+        large page doesn't hold up the event loop (and the Discord client on it).
+
+        Raises BannerUnavailable without sending anything while the circuit breaker is open.
+        """
+        is_probe = await self.breaker.before_request()
+        self.request_count += 1
+        labels = {'endpoint': endpoint_name(url)}
+        try:
+            started = await self.concurrency.acquire()
+            status = None
+            failed = False
+            try:
+                async with self.http.request(method, url, **kwargs) as response:
+                    if parser is not None and response.status == 200:
+                        loop = asyncio.get_running_loop()
+                        async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                            await loop.run_in_executor(None, parser.feed, chunk)
+                    else:
+                        await response.read()
+                status = response.status
+            except Exception as e:
+                failed = True
+                metrics.inc('banner_responses_total', {**labels, 'status': 'error'})
+                self.breaker.record_failure(f"{type(e).__name__}: {e}" if str(e) else type(e).__name__, is_probe)
+                raise
+            finally:
+                latency = time.monotonic() - started
+                metrics.observe('banner_request_seconds', latency, labels)
+                self.concurrency.release(started, status, failed)
+        except asyncio.CancelledError:
+            if is_probe:
+                # A cancelled probe says nothing about Banner, let another request probe instead
+                self.breaker.abandon_probe()
+            raise
+        metrics.inc('banner_responses_total', {**labels, 'status': str(response.status)})
+        if logger.isEnabledFor(logging.DEBUG):
+            self.log(f"{method} {labels['endpoint']}: HTTP {response.status} in {latency * 1000:.0f}ms", logging.DEBUG,
+                     endpoint=labels['endpoint'], status=response.status, latency=round(latency, 4))
+
+        # Banner answering at all is what counts, only its server errors mean it's down
+        if response.status >= 500:
+            self.breaker.record_failure(f"HTTP {response.status}", is_probe)
+        else:
+            self.breaker.record_success(is_probe)
+        return response
+
+    async def _run_refresh_step(self, step: str):
+        if step == 'registration':
+            # This mimics clicking the "registration" link that occasionally sends SSO cookies
+            await self.send_request('GET', str(BANNER_URL / 'ssb/registration'), allow_redirects=True)
+        elif step == 'banner_root':
+            # Try the main Banner entry point (also causes a potential SSO refresh)
+            await self.send_request('GET', str(BANNER_URL), allow_redirects=True)
+        elif step == 'class_registration':
+            # Access the menu/home page to trigger auth refresh
+            await self.send_request('GET', str(BANNER_URL / 'ssb/classRegistration/classRegistration'), allow_redirects=True)
+        elif step == 'term_search':
+            # Use an endpoint to refresh session
+            await self.send_request(
+                'POST',
+                str(BANNER_URL / 'ssb/term/search'),
+                params={'mode': 'registration'},
+                data={'term': get_refresh_term_code()},
+                allow_redirects=True,
+            )
+
+    async def check_cookies(self) -> int:
+        """Load one cheap authenticated page with the current cookies, returning its status (200 if they work)"""
+        response = await self.send_request(
+            'GET',
+            str(BANNER_URL / 'ssb/classRegistration/classRegistration'),
+            timeout=aiohttp.ClientTimeout(total=10),
+        )
+        return response.status
+
+    async def refresh_session_cookies(self) -> bool:
+        """Attempt to refresh session cookies using the redirect mechanism
+
+        Callers should go through refresh(), which makes sure only one refresh runs at a time.
+        """
+        started = time.monotonic()
+        steps = self.step_stats.steps_to_run()
+        skipped = [step for step in REFRESH_STEPS if step not in steps]
+        success = False
+        try:
+            self.log("Attempting to refresh session cookies...")
+            if skipped:
+                self.log(f"Skipping refresh steps that haven't changed cookies lately: {skipped}")
+
+            # The refresh replaces the server-side session, so its search term is unknown afterwards
+            self.invalidate_search_state()
+
+            # Store original cookies for comparison
+            original_cookies = self.get_cookies()
+
+            # Start over from the most recently saved cookies, or fall back to config
+            self.cookie_jar.clear()
+            if self.saved_cookies:
+                self.set_cookies(self.saved_cookies)
+                self.log(f"Restored saved cookies: {list(self.get_cookies().keys())}")
+            else:
+                self.set_cookies(self.baseline_cookies)
+                self.log(f"No saved cookies found, using config baseline: {list(self.get_cookies().keys())}")
+
+            # Check for new cookies after each step, to learn which steps are worth sending
+            for step in steps:
+                before_step = self.get_cookies()
+                await self._run_refresh_step(step)
+                new_from_step = {k: v for k, v in self.get_cookies().items() if before_step.get(k) != v}
+                self.step_stats.record_step(step, bool(new_from_step))
+                if new_from_step:
+                    self.log(f"Got new cookies from {step}: {list(new_from_step.keys())}")
+
+            # Check final cookie state
+            final_cookies = self.get_cookies()
+            all_updated_cookies = {k: v for k, v in final_cookies.items()
+                                 if k not in original_cookies or original_cookies[k] != v}
+
+            if all_updated_cookies:
+                self.log(f"Successfully refreshed cookies! Updated: {list(all_updated_cookies.keys())}")
+                for cookie_name, cookie_value in all_updated_cookies.items():
+                    self.log(f"  {cookie_name}: {cookie_value[:20]}...", logging.DEBUG)
+
+                # Save updated cookies
+                if self.on_cookies_updated:
+                    self.on_cookies_updated()
+            else:
+                self.log("No new cookies received during refresh")
+
+            self.last_cookie_refresh = time.time()
+
+            # Test if the refresh worked by making a simple API call
+            status = await self.check_cookies()
+
+            if status == 200:
+                self.log("Cookie refresh verification: SUCCESS")
+                success = True
+                return True
+            else:
+                self.log(f"Cookie refresh verification: FAILED (status {status})", logging.WARNING)
+                return False
+
+        except BannerUnavailable as e:
+            self.log(f"Can't refresh session cookies: {e}", logging.WARNING)
+            return False
+        except Exception as e:
+            logger.exception(f"Error refreshing session cookies: {e}", extra={'session': self.name})
+            return False
+        finally:
+            self.step_stats.record_refresh(success, skipped)
+            self.last_refresh_ok = success
+            self.last_refresh_duration = time.monotonic() - started
+            metrics.inc('cookie_refreshes_total', {'result': 'success' if success else 'failure'})
+            metrics.observe('cookie_refresh_seconds', self.last_refresh_duration)
+
+    async def refresh(self) -> bool:
+        """Refresh this session's cookies, joining the refresh already in flight if there is one"""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.ensure_future(self.refresh_session_cookies())
+        # Shielded so a cancelled caller doesn't cancel the refresh other callers are waiting on
+        return await asyncio.shield(self._refresh_task)
+
+    @property
+    def refreshing(self) -> bool:
+        return self._refresh_task is not None and not self._refresh_task.done()
+
+    def should_refresh_cookies(self, margin: float = 0) -> bool:
+        """Determine if cookies should be refreshed (or will be within margin seconds)"""
+        return time.time() - self.last_cookie_refresh > COOKIE_REFRESH_INTERVAL - margin
+
+    async def make_authenticated_request(self, method: str, url: str, **kwargs) -> aiohttp.ClientResponse:
+        """Make a request with automatic cookie refresh if needed"""
+        if self.refreshing:
+            # Don't send with cookies that are being replaced
+            await self.refresh()
+        elif not self.background_refresh and self.should_refresh_cookies():
+            # Refresh cookies if it's been a while (the background refresher normally gets there first)
+            await self.refresh()
+
+        # Make the request
+        response = await self.send_limited_request(method, url, **kwargs)
+
+        # If we get auth errors, try refreshing cookies once
+        if response.status in [401, 403]:
+            self.log(f"Auth error (status {response.status}), attempting cookie refresh...", logging.WARNING)
+            if await self.refresh():
+                # Retry the request with fresh cookies
+                response = await self.send_limited_request(method, url, **kwargs)
+
+        return response
+
+    async def send_limited_request(self, method: str, url: str, **kwargs) -> aiohttp.ClientResponse:
+        """Send a request once the pool's rate limiter allows, holding every request back if Banner answers 429"""
+        await self.throttle.wait()
+        await self.rate_limiter.acquire()
+        response = await self.send_request(method, url, **kwargs)
+        if response.status == 429:
+            pause = retry_after(response.headers)
+            self.throttle.pause(pause)
+            self.log(f"Throttled by Banner (429), holding requests back for {pause:.0f}s", logging.WARNING)
+        return response
+
+    def invalidate_search_state(self):
+        """Forget which term the search form is set to, forcing a term switch on the next search"""
+        self.current_search_term = None
+        self.search_form_dirty = False
+
+    async def prepare_search(self, term_code: str) -> bool:
+        """Get the search form ready for a new search in the given term
+
+        Only switches terms when the session is set to a different one, and only resets the
+        form when a previous search in the same term has left criteria behind.
+        """
+        if self.current_search_term != term_code:
+            data = {
+                'term': term_code,
+                'studyPath': '',
+                'studyPathText': '',
+                'startDatepicker': '',
+                'endDatepicker': '',
+            }
+
+            # Put user into search mode for the correct term
+            response = await self.make_authenticated_request(
+                'POST',
+                str(BANNER_URL / 'ssb/term/search'),
+                params={'mode': 'registration'},
+                data=data,
+            )
+            if response.status != 200:
+                self.log(f"HTTP {response.status} when switching to term {term_code}", logging.WARNING, term=term_code)
+                self.invalidate_search_state()
+                return False
+
+            # Switching terms starts a fresh search form
+            self.current_search_term = term_code
+            self.search_form_dirty = False
+        elif self.search_form_dirty:
+            # Reset the search form
+            response = await self.make_authenticated_request(
+                'POST',
+                str(BANNER_URL / 'ssb/classSearch/resetDataForm'),
+            )
+            if response.status != 200:
+                # The old criteria may still be set, so the next search starts over with a term switch
+                self.log(f"HTTP {response.status} when resetting the search form", logging.WARNING, term=term_code)
+                self.invalidate_search_state()
+                return False
+
+            self.search_form_dirty = False
+
+        return True
+
+    async def search_sections(self, term_code: str, subject: str = '', course_number: str = '',
+                              page_size: int = SEARCH_PAGE_SIZE,
+                              fields: Optional[Iterable[str]] = SEAT_FIELDS) -> Optional[List[Dict]]:
+        """Fetch every section matching a search, as Banner's result items (None if the search failed)
+
+        Walks every page of the search results, so courses with more sections than fit on
+        one page (large first-year courses with many labs) are resolved completely. Leave
+        course_number (and subject) blank to list a whole subject (or term).
+
+        Each item keeps only the given fields; pass fields=None for Banner's raw items in
+        full. Pages of STREAM_MIN_PAGE_SIZE or more are parsed as they stream in.
+        """
+        fields = tuple(fields) if fields is not None else None
+        description = f"{' '.join(part for part in (subject, course_number) if part) or 'all subjects'} ({term_code})"
+        try:
+            # If Banner silently drops the term context mid-search, switch back and retry once
+            for attempt in range(2):
+                if not await self.prepare_search(term_code):
+                    return None
+
+                sections = []
+                page_offset = 0
+                while True:
+                    params = {
+                        'txt_subject': subject,
+                        'txt_courseNumber': course_number,
+                        'txt_term': term_code,
+                        'startDatepicker': '',
+                        'endDatepicker': '',
+                        'pageOffset': str(page_offset),
+                        'pageMaxSize': str(page_size),
+                        'sortColumn': 'subjectDescription',
+                        'sortDirection': 'asc',
+                    }
+
+                    # Get the search results
+                    parser = SearchResultsParser(fields) if fields is not None and page_size >= STREAM_MIN_PAGE_SIZE else None
+                    response = await self.make_authenticated_request(
+                        'GET',
+                        str(BANNER_URL / 'ssb/searchResults/searchResults'),
+                        params=params,
+                        parser=parser,
+                    )
+                    self.search_form_dirty = True
+
+                    if response.status != 200:
+                        self.log(f"HTTP {response.status} when searching {description}", logging.WARNING, term=term_code)
+                        return None  # Request failed
+
+                    if parser is not None:
+                        json_data = parser.close()
+                    else:
+                        json_data = await response.json(content_type=None)
+                        if fields is not None:
+                            json_data['data'] = [{field: item[field] for field in fields if field in item}
+                                                 for item in json_data.get('data') or []]
+                    if search_term_dropped(json_data, term_code):
+                        self.log(f"Banner dropped the term context for {term_code}, switching terms again", logging.WARNING, term=term_code)
+                        self.invalidate_search_state()
+                        break
+
+                    page = json_data.get('data') or []
+                    sections.extend(page)
+
+                    # Stop once every section has been seen (or Banner runs out of results)
+                    page_offset += len(page)
+                    if not page or page_offset >= int(json_data.get('totalCount') or 0):
+                        return sections
+
+            return None
+        except BannerUnavailable:
+            return None  # Banner is down, the breaker has already said so
+        except Exception as e:
+            self.log(f"Error searching {description}: {e}", logging.ERROR, term=term_code)
+            return None
+
+    async def search_course_sections(self, term_code: str, subject: str, course_number: str) -> Optional[Dict[str, int]]:
+        """Look up every section of a course, returning CRN -> available seats (None if the search failed)"""
+        sections = await self.search_sections(term_code, subject, course_number)
+        return None if sections is None else section_seats(sections)
+
+class BannerSessionPool:
+    """A pool of independent Banner sessions that run searches in parallel
+
+    Each session is checked out exclusively while in use. Work is handed to sessions
+    already set to the right term where possible, so term switches stay rare.
+    """
+
+    def __init__(self, cookie_sets: List[Dict[str, str]], on_cookies_updated: Callable[[], None] = None,
+                 breaker: CircuitBreaker = None, concurrency: ConcurrencyController = None, rate_limiter: RateLimiter = None):
+        self.concurrency = concurrency or ConcurrencyController()
+        # Each session sends one request at a time (its search state lives on Banner's side),
+        # so the sessions are all the parallelism there is for the controller to adjust
+        self.concurrency.cap(len(cookie_sets))
+        self.rate_limiter = rate_limiter or RateLimiter()
+        self.throttle = Throttle()
+        self.connector = aiohttp.TCPConnector(limit=self.concurrency.maximum)
+        self.step_stats = RefreshStepStats()
+        self.breaker = breaker or CircuitBreaker()
+        self.sessions = [
+            BannerSession(f'session {index + 1}', cookies, self.connector, self.concurrency, self.rate_limiter, self.throttle,
+                          on_cookies_updated, self.step_stats, self.breaker)
+            for index, cookies in enumerate(cookie_sets)
+        ]
+        self._idle = list(self.sessions)
+        self._available = asyncio.Condition()
+        self._refresher: Optional[asyncio.Task] = None
+
+    def initialize(self, saved_cookie_sets: List[Dict[str, str]] = None):
+        """Load each session's saved cookies (matched by position), falling back to its config baseline"""
+        saved_cookie_sets = saved_cookie_sets or []
+        for index, banner_session in enumerate(self.sessions):
+            banner_session.initialize(saved_cookie_sets[index] if index < len(saved_cookie_sets) else None)
+
+    async def close(self):
+        self.stop_background_refresh()
+        for banner_session in self.sessions:
+            await banner_session.close()
+        await self.connector.close()
+
+    def start_background_refresh(self):
+        """Keep every session's cookies fresh from a background task, off the search path"""
+        if self._refresher is None or self._refresher.done():
+            for banner_session in self.sessions:
+                banner_session.background_refresh = True
+            self._refresher = asyncio.ensure_future(self._refresh_loop())
+
+    def stop_background_refresh(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+        for banner_session in self.sessions:
+            banner_session.background_refresh = False
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(REFRESHER_TICK)
+            if self.breaker.is_open:
+                continue  # No refresh can succeed while Banner is down
+            try:
+                # Renew ahead of time; a session only waits for the search it's running to finish
+                await self.refresh_due_sessions(margin=REFRESH_MARGIN)
+            except Exception as e:
+                logger.exception(f"Error in background cookie refresh: {e}")
+
+    @property
+    def request_count(self) -> int:
+        """Total requests sent by every session in the pool"""
+        return sum(banner_session.request_count for banner_session in self.sessions)
+
+    def get_cookie_sets(self) -> List[Dict[str, str]]:
+        """Return every session's current cookies, in pool order"""
+        return [banner_session.get_cookies() for banner_session in self.sessions]
+
+    @asynccontextmanager
+    async def acquire(self, term_code: str = None, banner_session: BannerSession = None):
+        """Check out an idle session, preferring one whose search form is already set to term_code
+
+        Pass banner_session to wait for that specific session instead.
+        """
+        async with self._available:
+            if banner_session is None:
+                await self._available.wait_for(lambda: self._idle)
+                banner_session = next((s for s in self._idle if s.current_search_term == term_code), self._idle[0])
+            else:
+                await self._available.wait_for(lambda: banner_session in self._idle)
+            self._idle.remove(banner_session)
+        try:
+            yield banner_session
+        finally:
+            async with self._available:
+                self._idle.append(banner_session)
+                self._available.notify_all()
+
+    async def verify_sessions(self):
+        """Check every session's restored cookies with one cheap request, refreshing only the sessions they no longer work for"""
+        async def verify(banner_session: BannerSession):
+            async with self.acquire(banner_session=banner_session):
+                try:
+                    status = await banner_session.check_cookies()
+                except Exception as e:
+                    status = e
+                if status == 200:
+                    banner_session.log("Saved cookies still work, reusing them")
+                    return
+                banner_session.log(f"Saved cookies didn't work ({status}), refreshing them")
+                await banner_session.refresh()
+
+        await asyncio.gather(*(verify(banner_session) for banner_session in self.sessions))
+
+    async def probe(self) -> bool:
+        """Send one cheap request on whichever session is free, to see whether Banner answers again"""
+        async with self.acquire() as banner_session:
+            try:
+                response = await banner_session.send_request('GET', str(BANNER_URL / 'ssb/classRegistration/classRegistration'))
+            except Exception:
+                return False
+        return response.status < 500
+
+    async def search_course_sections(self, term_code: str, subject: str, course_number: str) -> Optional[Dict[str, int]]:
+        """Look up every section of a course on whichever session is free"""
+        async with self.acquire(term_code) as banner_session:
+            return await banner_session.search_course_sections(term_code, subject, course_number)
+
+    async def check_class_seats(self, subject: str, course_number: str, year: str, term: str, crn: str) -> int:
+        """Check available seats for a specific class"""
+        seats_by_crn = await self.search_course_sections(get_term_code(year, term), subject, course_number)
+        if seats_by_crn is None:
+            return -2  # Request failed
+        return seats_by_crn.get(crn, -1)  # -1 if class not found
+
+    async def search_many(self, course_keys: Iterable[CourseKey],
+                          on_result: Callable[[CourseKey, Optional[List[Dict]]], Awaitable[None]],
+                          page_size: int = SEARCH_PAGE_SIZE, fields: Optional[Iterable[str]] = SEAT_FIELDS,
+                          deadline: Optional[float] = None) -> List[CourseKey]:
+        """Search many courses in parallel, one session per worker, calling on_result with each one's sections
+
+        Courses are searched in the order given, except that a worker may take a course
+        within the next TERM_AFFINITY_LIMIT in the term its session is already set to, saving
+        a term switch. The course at the front can only be passed over TERM_AFFINITY_LIMIT
+        times, so the order stays fair across terms. A key with a blank course number (and
+        subject) searches a whole subject (or term).
+
+        Once deadline (a time.monotonic() value) has passed no new search is started; the
+        courses that never were are returned. It is a cutoff for starting searches only: those
+        already running finish every page (a partial section list would read as sections gone),
+        so a pass can end up to one course's search after the deadline.
+        """
+        pending = deque(course_keys)
+        passed_over = 0
+
+        def next_course(banner_session: BannerSession) -> Optional[CourseKey]:
+            nonlocal passed_over
+            if not pending or (deadline is not None and time.monotonic() >= deadline):
+                return None
+            term_code = banner_session.current_search_term
+            if pending[0][0] != term_code and passed_over < TERM_AFFINITY_LIMIT:
+                for index in range(1, min(len(pending), TERM_AFFINITY_LIMIT + 1)):
+                    if pending[index][0] == term_code:
+                        key = pending[index]
+                        del pending[index]
+                        passed_over += 1
+                        return key
+            passed_over = 0
+            return pending.popleft()
+
+        # As many workers as the concurrency limit allows sessions to send at once. A cut during the
+        # pass retires workers as they finish a course (down to one), a raise shows in the next pass
+        workers = min(len(self.sessions), max(1, int(self.concurrency.limit)), len(pending))
+
+        async def worker():
+            nonlocal workers
+            # Sessions are checked out one course at a time so the background refresher can
+            # renew a session between searches instead of waiting for the whole pass
+            while True:
+                if workers > max(1, int(self.concurrency.limit)):
+                    workers -= 1
+                    return
+                async with self.acquire() as banner_session:
+                    key = next_course(banner_session)
+                    if key is None:
+                        return
+                    sections = await banner_session.search_sections(*key, page_size=page_size, fields=fields)
+                await on_result(key, sections)
+
+        await asyncio.gather(*(worker() for _ in range(workers)))
+        return list(pending)
+
+    async def refresh_due_sessions(self, force: bool = False, margin: float = 0) -> List[bool]:
+        """Refresh the cookies of every session that is due within margin seconds (or all of them if forced)"""
+        results = []
+        for banner_session in self.sessions:
+            if force or banner_session.should_refresh_cookies(margin):
+                async with self.acquire(banner_session=banner_session):
+                    # Another caller may have refreshed it while we waited for the session
+                    if force or banner_session.should_refresh_cookies(margin):
+                        results.append(await banner_session.refresh())
+        return results
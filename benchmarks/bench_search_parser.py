@@ -0,0 +1,66 @@
+"""Benchmark parsing searchResults pages: json.loads against the streaming field extractor
+
+Builds pages from the fake Banner's generated sections (with their nested faculty, meeting
+time and attribute data), then reports, per page size, the time to turn one page into
+CRN -> seats and the peak memory allocated while doing it.
+
+    python -m benchmarks.bench_search_parser --sizes 50,500 --repeat 20
+"""
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Callable, Dict, List
+
+from banner import STREAM_CHUNK_SIZE, section_seats
+from benchmarks.fake_banner import FakeBanner
+from search_results import SearchResultsParser
+
+def make_page(sections: List[Dict]) -> bytes:
+    return json.dumps({
+        'success': True, 'totalCount': len(sections), 'pageOffset': 0, 'pageMaxSize': len(sections),
+        'data': sections,
+    }).encode()
+
+def parse_full(body: bytes) -> Dict[str, int]:
+    return section_seats(json.loads(body)['data'])
+
+def parse_streaming(body: bytes) -> Dict[str, int]:
+    parser = SearchResultsParser()
+    for start in range(0, len(body), STREAM_CHUNK_SIZE):
+        parser.feed(body[start:start + STREAM_CHUNK_SIZE])
+    return section_seats(parser.close()['data'])
+
+def measure(parse: Callable[[bytes], Dict[str, int]], body: bytes, repeat: int):
+    """Best time per parse over repeat runs, and the peak memory of one more run"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse(body)
+        best = min(best, time.perf_counter() - started)
+
+    tracemalloc.start()
+    parse(body)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+def main(args):
+    fake = FakeBanner()
+    sections = fake.sections['202409']
+    print(f"{'sections':>8} {'page KB':>8} {'method':>10} {'ms/page':>8} {'peak KB':>8}")
+    for size in args.sizes:
+        body = make_page(sections[:size])
+        assert parse_full(body) == parse_streaming(body)
+        for name, parse in (('json.loads', parse_full), ('streaming', parse_streaming)):
+            seconds, peak = measure(parse, body, args.repeat)
+            print(f"{size:>8} {len(body) / 1024:>8.0f} {name:>10} {seconds * 1000:>8.2f} {peak / 1024:>8.0f}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,50,500', help='comma-separated numbers of sections per page')
+    parser.add_argument('--repeat', type=int, default=20, help='timed runs per page size')
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(',')]
+
+    main(args)
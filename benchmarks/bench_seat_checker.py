@@ -0,0 +1,174 @@
+"""Benchmark the seat_checker pipeline against the local fake Banner
+
+For each size, watches that many CRNs spread across many guilds, then runs full sweeps
+(every watched section due at once) through seat_checker and reports pass duration,
+throughput and Banner request counts. Nothing touches banner.usask.ca or Discord: the bot
+gets a generated config, a throwaway database and channels that discard messages.
+
+    python -m benchmarks.bench_seat_checker --sizes 10,1000,10000 --guilds 200
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import types
+from typing import Dict, List
+
+from yarl import URL
+
+from benchmarks.fake_banner import ROOT, FakeBanner, bound_port
+
+TERM_CODE = '202409'
+
+class NullChannel:
+    """Stands in for a Discord channel, counting what would have been sent"""
+    sent = 0
+
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.name = f'bench-{channel_id}'
+        self.mention = f'<#{channel_id}>'
+
+    async def send(self, content=None, embed=None):
+        NullChannel.sent += 1
+
+def install_config(args):
+    """Give the bot a generated config module instead of the real config.py"""
+    config = types.ModuleType('config')
+    config.BOT_TOKEN = ''
+    config.DEVELOPERS = []
+    config.CLASS_REGISTRAR_COOKIE_SETS = [{'JSESSIONID': f'bench-{index}'} for index in range(args.sessions)]
+    config.CLASS_REGISTRAR_COOKIES = config.CLASS_REGISTRAR_COOKIE_SETS[0]
+    config.BANNER_REQUESTS_PER_MINUTE = args.budget
+    config.PASS_TIME_BUDGET = args.time_budget
+    # Every pass is a full sweep, the first one included
+    config.WARMUP_PERIOD = 0
+    if args.crawl:
+        config.CRAWL_TERMS = [TERM_CODE]
+        config.CRAWL_INTERVAL = 0
+    sys.modules['config'] = config
+
+async def setup_size(bot_module, fake: FakeBanner, crns: List[str], guilds: int, watchers_per_crn: int):
+    """Fresh database and in-process poller watching the given CRNs"""
+    os.chdir(tempfile.mkdtemp(prefix='cn-bench-'))
+    if bot_module.seat_poller is not None:
+        await bot_module.seat_poller.close()
+        bot_module.seat_poller = None
+    if bot_module.storage is not None:
+        bot_module.storage.close()
+        bot_module.storage = None
+
+    bot_module.load_data()
+    bot_module.seat_poller.start()
+
+    # The catalog is built once per term, not per pass, so build it outside the measurements
+    await bot_module.seat_poller.catalog.refresh(bot_module.seat_poller.pool, TERM_CODE)
+
+    records = {record['courseReferenceNumber']: record for record in fake.sections[TERM_CODE]}
+    with bot_module.storage.connection:
+        for guild_id in range(guilds):
+            bot_module.storage.connection.execute(
+                'INSERT INTO guilds (guild_id, notify_channel_id) VALUES (?, ?)', (guild_id, 1000 + guild_id))
+    for index, crn in enumerate(crns):
+        record = records[crn]
+        for watcher in range(watchers_per_crn):
+            guild_id = (index + watcher * 7919) % guilds
+            user_id = 10**17 + index
+            subscription = bot_module.subscriptions.add(
+                guild_id, crn, '2024', 'FALL', record['subject'], record['courseNumber'], user_id)
+            bot_module.storage.add_subscription(subscription, user_id)
+
+    # Reload everything (notification channels included) the way the bot does at startup
+    bot_module.subscriptions = bot_module.storage.load_subscriptions()
+
+async def run_pass(bot_module, fake: FakeBanner) -> Dict:
+    from metrics import metrics
+
+    seat_poller = bot_module.seat_poller
+
+    # Make every watched section due now, so each pass is a full sweep
+    for key in list(seat_poller.scheduler.sections):
+        seat_poller.scheduler.defer(key, 'benchmark sweep', 0)
+    seat_poller.crawler.last_crawl.clear()
+
+    fake.reset_counts()
+    checked_before = sum(metrics.counters.get('classes_checked_total', {}).values())
+    requests_before = seat_poller.pool.request_count
+    started = time.monotonic()
+    await bot_module.seat_checker.coro()
+    duration = time.monotonic() - started
+
+    return {
+        'duration': duration,
+        'checked': sum(metrics.counters.get('classes_checked_total', {}).values()) - checked_before,
+        'requests': seat_poller.pool.request_count - requests_before,
+        'endpoints': dict(fake.request_counts),
+        'auth_errors': fake.status_counts.get(401, 0) + fake.status_counts.get(403, 0),
+    }
+
+async def main(args):
+    # The report goes to stdout, the bot's own logging is dropped unless --verbose
+    report = sys.stdout
+    if not args.verbose:
+        sys.stdout = open(os.devnull, 'w')
+
+    install_config(args)
+    # Imported after the generated config is in place
+    import banner
+    import discord_bot
+    import logs
+    logs.configure()
+
+    fake = FakeBanner([TERM_CODE], latency=args.latency, jitter=args.jitter, session_ttl=args.session_ttl,
+                      auth_error_rate=args.auth_error_rate)
+    runner = await fake.start()
+    banner.BANNER_URL = URL(f'http://localhost:{bound_port(runner)}{ROOT}')
+    discord_bot.bot.get_channel = NullChannel
+
+    all_crns = fake.all_crns(TERM_CODE)
+    print(f"Fake Banner: {len(all_crns)} sections, latency {args.latency * 1000:.0f}ms, "
+          f"{args.sessions} session(s), {'crawl' if args.crawl else 'per-course'} mode", file=report)
+    print(f"{'CRNs':>6} {'guilds':>6} {'pass':>4} {'seconds':>8} {'checked':>7} {'sections/s':>10} "
+          f"{'requests':>8} {'req/CRN':>7} {'401/403':>7}  endpoints", file=report)
+
+    try:
+        for size in args.sizes:
+            crns = fake.random.sample(all_crns, min(size, len(all_crns)))
+            await setup_size(discord_bot, fake, crns, args.guilds, args.watchers)
+
+            for pass_number in range(1, args.passes + 1):
+                result = await run_pass(discord_bot, fake)
+                endpoints = ', '.join(f"{path.split('/')[-1]}={count}" for path, count in sorted(result['endpoints'].items()))
+                print(f"{len(crns):>6} {args.guilds:>6} {pass_number:>4} {result['duration']:>8.2f} {result['checked']:>7} "
+                      f"{result['checked'] / result['duration']:>10.0f} {result['requests']:>8} "
+                      f"{result['requests'] / len(crns):>7.2f} {result['auth_errors']:>7}  {endpoints}", file=report)
+                fake.churn(args.churn)
+
+            await discord_bot.notification_dispatcher.drain()
+    finally:
+        if discord_bot.seat_poller is not None:
+            await discord_bot.seat_poller.close()
+        await runner.cleanup()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='10,1000,10000', help='comma-separated numbers of watched CRNs')
+    parser.add_argument('--guilds', type=int, default=200)
+    parser.add_argument('--watchers', type=int, default=2, help='guilds watching each CRN')
+    parser.add_argument('--passes', type=int, default=3)
+    parser.add_argument('--sessions', type=int, default=3, help='pooled Banner sessions')
+    parser.add_argument('--latency', type=float, default=0.02, help='fake Banner latency per request (seconds)')
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--session-ttl', type=float, default=1800, help='seconds before a fake Banner session expires')
+    parser.add_argument('--auth-error-rate', type=float, default=0.0, help='fraction of requests answered 401/403')
+    parser.add_argument('--churn', type=float, default=0.05, help='fraction of sections changing seats between passes')
+    parser.add_argument('--budget', type=int, default=10**9, help='BANNER_REQUESTS_PER_MINUTE')
+    parser.add_argument('--time-budget', type=float, default=10**9, help='PASS_TIME_BUDGET (seconds)')
+    parser.add_argument('--crawl', action='store_true', help='crawl the whole term instead of polling per course')
+    parser.add_argument('--verbose', action='store_true', help="show the bot's own log output")
+    args = parser.parse_args()
+    args.sizes = [int(size) for size in args.sizes.split(',')]
+
+    asyncio.run(main(args))
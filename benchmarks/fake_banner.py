@@ -0,0 +1,219 @@
+"""A local stand-in for Banner's class search, for benchmarks and offline testing
+
+Serves the registration pages, ssb/term/search, ssb/classSearch/resetDataForm and
+ssb/searchResults/searchResults from a generated catalog, with configurable latency,
+page size limits, session expiry and injected 401/403 responses.
+
+Run it on its own with `python -m benchmarks.fake_banner --port 8080`, then point the
+bot at http://localhost:8080/StudentRegistrationSsb/ (banner.BANNER_URL).
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+ROOT = '/StudentRegistrationSsb/'
+# Banner never returns more than this many sections per page, whatever pageMaxSize says
+MAX_PAGE_SIZE = 500
+
+class FakeBanner:
+    """Generated catalog plus the per-session state Banner keeps (current term, expiry)"""
+
+    def __init__(self, terms: List[str] = ('202409',), subjects: int = 40, courses_per_subject: int = 50,
+                 sections_per_course: int = 6, latency: float = 0.0, jitter: float = 0.0,
+                 session_ttl: float = 1800, auth_error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.session_ttl = session_ttl
+        self.auth_error_rate = auth_error_rate
+        self.random = random.Random(seed)
+
+        # term_code -> list of section records, sorted like Banner's subjectDescription ordering
+        self.sections: Dict[str, List[Dict]] = {}
+        crns = itertools.count(10000)
+        subject_codes = [f'S{index:03d}' for index in range(subjects)]
+        for term_code in terms:
+            records = []
+            for subject in subject_codes:
+                for course in range(courses_per_subject):
+                    for section in range(sections_per_course):
+                        capacity = self.random.choice((20, 40, 80, 150))
+                        records.append({
+                            'term': term_code,
+                            'courseReferenceNumber': str(next(crns)),
+                            'subject': subject,
+                            'courseNumber': str(100 + course),
+                            'sequenceNumber': f'{section + 1:02d}',
+                            'courseTitle': f'{subject} Course {100 + course}',
+                            'maximumEnrollment': capacity,
+                            'seatsAvailable': self.random.randint(0, 3),
+                            'waitCapacity': 10,
+                            'waitAvailable': self.random.randint(0, 10),
+                        })
+                        records[-1].update(self._section_details(records[-1]))
+            self.sections[term_code] = records
+
+        # JSESSIONID -> {'created': timestamp, 'term': term code or None}
+        self.sessions: Dict[str, Dict] = {}
+        self._session_ids = itertools.count(1)
+        # path below ROOT -> requests served, and status -> responses sent
+        self.request_counts: Dict[str, int] = {}
+        self.status_counts: Dict[int, int] = {}
+
+    def _section_details(self, record: Dict) -> Dict:
+        """The bulky nested data real Banner sends with every section, which the bot never reads"""
+        crn, term_code = record['courseReferenceNumber'], record['term']
+        days = self.random.choice(('MWF', 'TR'))
+        meeting_time = {
+            'beginTime': '0930', 'endTime': '1020', 'building': 'ARTS', 'buildingDescription': 'Arts',
+            'room': str(self.random.randint(100, 299)), 'campus': 'MAIN', 'campusDescription': 'Main Campus',
+            'category': '01', 'courseReferenceNumber': crn, 'creditHourSession': 3.0,
+            'startDate': '09/03/2024', 'endDate': '12/05/2024', 'hoursWeek': 2.5,
+            'meetingScheduleType': 'LEC', 'meetingType': 'CLAS', 'meetingTypeDescription': 'Class',
+            'term': term_code,
+        }
+        for day in ('monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday'):
+            meeting_time[day] = day[0].upper() in days
+        faculty = {
+            'bannerId': str(self.random.randint(10**7, 10**8)), 'category': None,
+            'class': 'net.hedtech.banner.student.faculty.FacultyResultDecorator',
+            'courseReferenceNumber': crn, 'displayName': f'Instructor, {crn}',
+            'emailAddress': f'instructor{crn}@usask.ca', 'primaryIndicator': True, 'term': term_code,
+        }
+        return {
+            'id': int(crn), 'termDesc': 'Fall 2024', 'partOfTerm': '1', 'campusDescription': 'Main Campus',
+            'scheduleTypeDescription': 'Lecture', 'creditHours': None, 'creditHourLow': 3, 'creditHourHigh': None,
+            'enrollment': record['maximumEnrollment'] - record['seatsAvailable'], 'crossList': None,
+            'openSection': record['seatsAvailable'] > 0, 'linkIdentifier': None, 'isSectionLinked': False,
+            'subjectCourse': f"{record['subject']}{record['courseNumber']}", 'instructionalMethod': 'P',
+            'instructionalMethodDescription': 'In Person',
+            'faculty': [faculty],
+            'meetingsFaculty': [{
+                'category': '01', 'class': 'net.hedtech.banner.student.schedule.SectionSessionDecorator',
+                'courseReferenceNumber': crn, 'faculty': [faculty], 'meetingTime': meeting_time, 'term': term_code,
+            }],
+            'sectionAttributes': [{
+                'class': 'net.hedtech.banner.student.schedule.SectionDegreeProgramAttributeDecorator',
+                'code': 'ART', 'courseReferenceNumber': crn, 'description': 'Arts & Science {core} [A\\B] "req"',
+                'isZTCAttribute': False, 'termCode': term_code,
+            }],
+        }
+
+    def all_crns(self, term_code: str) -> List[str]:
+        return [record['courseReferenceNumber'] for record in self.sections[term_code]]
+
+    def churn(self, fraction: float):
+        """Change the seat count of a random fraction of every term's sections"""
+        for records in self.sections.values():
+            for record in self.random.sample(records, int(len(records) * fraction)):
+                record['seatsAvailable'] = max(0, record['seatsAvailable'] + self.random.choice((-2, -1, 1, 2)))
+
+    def reset_counts(self):
+        self.request_counts.clear()
+        self.status_counts.clear()
+
+    def _session(self, request: web.Request) -> Optional[Dict]:
+        session = self.sessions.get(request.cookies.get('JSESSIONID'))
+        if session is not None and time.time() - session['created'] > self.session_ttl:
+            return None  # Expired
+        return session
+
+    def _respond(self, response: web.Response) -> web.Response:
+        self.status_counts[response.status] = self.status_counts.get(response.status, 0) + 1
+        return response
+
+    async def handle(self, request: web.Request) -> web.Response:
+        path = request.path[len(ROOT):] if request.path.startswith(ROOT) else request.path
+        self.request_counts[path or 'root'] = self.request_counts.get(path or 'root', 0) + 1
+        if self.latency or self.jitter:
+            await asyncio.sleep(self.latency + self.random.random() * self.jitter)
+
+        session = self._session(request)
+
+        # The registration pages hand out a new session whenever the current one is missing or expired
+        if path in ('', 'ssb/registration', 'ssb/classRegistration/classRegistration'):
+            response = web.Response(text='<html>registration</html>')
+            if session is None:
+                session_id = f'fake-{next(self._session_ids)}'
+                self.sessions[session_id] = {'created': time.time(), 'term': None}
+                response.set_cookie('JSESSIONID', session_id, path=ROOT)
+            return self._respond(response)
+
+        if session is None:
+            return self._respond(web.Response(status=401, text='session expired'))
+        if self.auth_error_rate and self.random.random() < self.auth_error_rate:
+            return self._respond(web.Response(status=self.random.choice((401, 403)), text='injected auth error'))
+
+        if path == 'ssb/term/search':
+            form = await request.post()
+            term_code = form.get('term')
+            if term_code not in self.sections:
+                return self._respond(web.json_response({'regAllowed': False}, status=400))
+            session['term'] = term_code
+            return self._respond(web.json_response({'fwdURL': 'classSearch/classSearch'}))
+
+        if path == 'ssb/classSearch/resetDataForm':
+            return self._respond(web.Response(text='true'))
+
+        if path == 'ssb/searchResults/searchResults':
+            return self._respond(self._search_results(request, session))
+
+        return self._respond(web.Response(status=404, text='not found'))
+
+    def _search_results(self, request: web.Request, session: Dict) -> web.Response:
+        term_code = session['term']
+        if term_code is None or request.query.get('txt_term', term_code) != term_code:
+            # Banner answers searches without a term context like this
+            return web.json_response({'success': False, 'totalCount': 0, 'data': None})
+
+        subject = request.query.get('txt_subject', '')
+        course_number = request.query.get('txt_courseNumber', '')
+        matches = [
+            record for record in self.sections[term_code]
+            if (not subject or record['subject'] == subject)
+            and (not course_number or record['courseNumber'] == course_number)
+        ]
+
+        offset = int(request.query.get('pageOffset', 0))
+        size = min(int(request.query.get('pageMaxSize', 10)), MAX_PAGE_SIZE)
+        return web.json_response({
+            'success': True,
+            'totalCount': len(matches),
+            'pageOffset': offset,
+            'pageMaxSize': size,
+            'data': matches[offset:offset + size],
+        })
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route('*', '/{tail:.*}', self.handle)
+        return app
+
+    async def start(self, host: str = 'localhost', port: int = 0) -> web.AppRunner:
+        """Start serving in the running event loop, returning the runner (see bound_port)"""
+        runner = web.AppRunner(self.make_app())
+        await runner.setup()
+        await web.TCPSite(runner, host, port).start()
+        return runner
+
+def bound_port(runner: web.AppRunner) -> int:
+    """The port a runner started with port=0 ended up listening on"""
+    return runner.addresses[0][1]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--terms', default='202409', help='comma-separated term codes')
+    parser.add_argument('--latency', type=float, default=0.05)
+    parser.add_argument('--session-ttl', type=float, default=1800)
+    parser.add_argument('--auth-error-rate', type=float, default=0.0)
+    args = parser.parse_args()
+
+    fake = FakeBanner(args.terms.split(','), latency=args.latency, session_ttl=args.session_ttl,
+                      auth_error_rate=args.auth_error_rate)
+    print(f"Serving {sum(len(records) for records in fake.sections.values())} sections at http://localhost:{args.port}{ROOT}")
+    web.run_app(fake.make_app(), host='localhost', port=args.port)
@@ -0,0 +1,129 @@
+import asyncio
+import random
+import time
+from typing import Callable, Optional
+
+from metrics import metrics
+
+# Consecutive failed Banner requests (errors, timeouts, 5xx) that mean Banner is down
+FAILURE_THRESHOLD = 5
+# Wait before the first probe after tripping, doubled on every failed probe up to the maximum
+BASE_BACKOFF = 30
+MAX_BACKOFF = 900
+
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half-open'
+
+class BannerUnavailable(Exception):
+    """Raised instead of sending a request while the circuit breaker is open"""
+
+class CircuitBreaker:
+    """Stops sending requests to Banner while it's down, probing with backoff until it's back
+
+    Closed, requests flow and failure_threshold consecutive failures trip it open. Open,
+    every request fails fast until a jittered exponential backoff runs out. Then it turns
+    half-open: one probe request goes through while the others wait for its outcome, which
+    either closes the breaker or opens it again for a longer backoff.
+
+    on_change is called with True when it trips and False once it closes again, not for
+    each failed probe in between. Once it has tripped only the probe's outcome counts, not
+    those of requests that were already in flight.
+    """
+
+    def __init__(self, failure_threshold: int = FAILURE_THRESHOLD, base_backoff: float = BASE_BACKOFF,
+                 max_backoff: float = MAX_BACKOFF, on_change: Callable[[bool], None] = None):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.on_change = on_change
+        self.random = random.Random()
+
+        self.state = CLOSED
+        self.failures = 0
+        # Times it has opened since it was last closed, which sets the backoff
+        self.trips = 0
+        self.opened_at: Optional[float] = None
+        self.retry_at = 0.0
+        self.last_error: Optional[str] = None
+        # How long the most recent outage lasted, from tripping to the successful probe
+        self.last_outage: Optional[float] = None
+        # Resolved with the outcome of the probe in flight, if any
+        self._probe: Optional[asyncio.Future] = None
+
+    def backoff(self) -> float:
+        """Seconds until the next probe: half the exponential ceiling, plus a random share of the other half"""
+        ceiling = min(self.max_backoff, self.base_backoff * 2 ** (self.trips - 1))
+        return ceiling / 2 + self.random.uniform(0, ceiling / 2)
+
+    @property
+    def is_open(self) -> bool:
+        """True while requests are refused outright (open and still backing off)"""
+        return self.state == OPEN and time.monotonic() < self.retry_at
+
+    @property
+    def retry_in(self) -> float:
+        return max(0.0, self.retry_at - time.monotonic())
+
+    async def before_request(self) -> bool:
+        """Wait until a request may be sent, returning whether it's the probe
+
+        Raises BannerUnavailable instead if Banner is considered down.
+        """
+        while True:
+            if self.state == CLOSED:
+                return False
+            if self.state == OPEN:
+                if time.monotonic() < self.retry_at:
+                    metrics.inc('banner_requests_rejected_total')
+                    raise BannerUnavailable(f"Banner is unavailable, next probe in {self.retry_in:.0f}s")
+                self.state = HALF_OPEN
+            if self._probe is None:
+                # This request is the probe
+                self._probe = asyncio.get_running_loop().create_future()
+                return True
+            # Shielded so a cancelled waiter doesn't cancel the probe the others are waiting on
+            await asyncio.shield(self._probe)
+
+    def record_success(self, is_probe: bool = False):
+        if self.state != CLOSED and not is_probe:
+            return  # A request sent before it tripped
+        self.failures = 0
+        if self.state == HALF_OPEN:
+            self.state = CLOSED
+            self.trips = 0
+            self.last_outage = time.monotonic() - self.opened_at
+            self._end_probe()
+            metrics.set('banner_circuit_open', 0)
+            if self.on_change:
+                self.on_change(False)
+
+    def record_failure(self, error: str, is_probe: bool = False):
+        if self.state != CLOSED and not is_probe:
+            return  # A request sent before it tripped
+        self.last_error = error
+        self.failures += 1
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self._trip()
+
+    def abandon_probe(self):
+        """Let another request probe instead, when the probe ended without an outcome"""
+        if self.state == HALF_OPEN:
+            self._end_probe()
+
+    def _trip(self):
+        was_closed = self.state == CLOSED
+        self.state = OPEN
+        self.trips += 1
+        self.retry_at = time.monotonic() + self.backoff()
+        self._end_probe()
+        metrics.inc('banner_circuit_trips_total')
+        metrics.set('banner_circuit_open', 1)
+        if was_closed:
+            self.opened_at = time.monotonic()
+            if self.on_change:
+                self.on_change(True)
+
+    def _end_probe(self):
+        if self._probe is not None:
+            if not self._probe.done():
+                self._probe.set_result(None)
+            self._probe = None
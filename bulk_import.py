@@ -0,0 +1,160 @@
+import csv
+import io
+import json
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+from banner import TERMS, get_term_code
+
+# Most classes one cn!addmany may add, and the largest attachment it reads
+MAX_IMPORT_ENTRIES = 100
+MAX_IMPORT_BYTES = 256 * 1024
+# Lines listed per summary section before the rest are only counted (an embed description
+# holds 4096 characters)
+MAX_SUMMARY_LINES = 20
+
+# Columns of an import file, in the order they're read from a file without a header row
+CSV_COLUMNS = ('crn', 'term', 'year', 'subject', 'course_number')
+
+# (what the user wrote, why it was rejected)
+Rejection = Tuple[str, str]
+
+class ImportEntry:
+    """One class to add, as parsed from a cn!addmany message or import file"""
+    __slots__ = ('crn', 'term', 'year', 'subject', 'course_number')
+
+    def __init__(self, crn: str, term: Optional[str] = None, year: Optional[str] = None,
+                 subject: Optional[str] = None, course_number: Optional[str] = None):
+        self.crn = crn
+        self.term = term.upper() if term else None
+        self.year = year
+        self.subject = subject.upper() if subject else None
+        self.course_number = course_number
+
+    @property
+    def term_code(self) -> str:
+        return get_term_code(self.year, self.term)
+
+    def describe(self) -> str:
+        if self.term and self.year:
+            return f"{self.crn} ({self.term} {self.year})"
+        return self.crn
+
+    def problem(self) -> Optional[str]:
+        """Why the entry can't be looked up at all, if it can't"""
+        if not self.crn.isdigit():
+            return "not a CRN"
+        if not self.term or not self.year:
+            return "no term and year given"
+        if self.term not in TERMS:
+            return f"unknown term, valid terms are {', '.join(TERMS)}"
+        if not (len(self.year) == 4 and self.year.isdigit()):
+            return "the year should look like 2024"
+        return None
+
+def parse_arguments(args: Iterable[str]) -> Tuple[List[ImportEntry], Optional[str], Optional[str]]:
+    """Read `[TERM YEAR] CRN [TERM YEAR] CRN ...`, returning the entries and the default term and year
+
+    A TERM YEAR pair before the first CRN applies to every CRN (and to import files), one
+    right after a CRN applies to that CRN only.
+    """
+    tokens = [token for arg in args for token in arg.replace(',', ' ').split()]
+    default_term = default_year = None
+    entries: List[ImportEntry] = []
+    last_entry = None
+    index = 0
+    while index < len(tokens):
+        token = tokens[index]
+        if token.upper() in TERMS:
+            year = tokens[index + 1] if index + 1 < len(tokens) else None
+            index += 2
+            if last_entry is not None:
+                last_entry.term, last_entry.year = token.upper(), year
+            else:
+                default_term, default_year = token.upper(), year
+            last_entry = None
+            continue
+        last_entry = ImportEntry(token, default_term, default_year)
+        entries.append(last_entry)
+        index += 1
+    return entries, default_term, default_year
+
+def parse_csv(text: str, default_term: str = None, default_year: str = None) -> List[ImportEntry]:
+    """Read CSV rows of crn, term, year (and optionally subject, course_number), with or without a header row"""
+    rows = [row for row in csv.reader(io.StringIO(text)) if any(cell.strip() for cell in row)]
+    if not rows:
+        return []
+    header = [cell.strip().lower().replace(' ', '_') for cell in rows[0]]
+    if 'crn' in header:
+        columns, rows = header, rows[1:]
+    else:
+        columns = CSV_COLUMNS
+
+    entries = []
+    for row in rows:
+        values = {column: cell.strip() for column, cell in zip(columns, row) if cell.strip()}
+        entries.append(ImportEntry(values.get('crn', ''), values.get('term', default_term), values.get('year', default_year),
+                                   values.get('subject'), values.get('course_number')))
+    return entries
+
+def parse_json(text: str, default_term: str = None, default_year: str = None) -> List[ImportEntry]:
+    """Read a JSON list of CRNs, or of objects with crn, term, year (and optionally subject, course_number)
+
+    Raises ValueError if it isn't one.
+    """
+    items = json.loads(text)
+    if not isinstance(items, list):
+        raise ValueError("expected a list of classes")
+
+    entries = []
+    for item in items:
+        if isinstance(item, dict):
+            values = {key: str(value) for key, value in item.items() if value is not None}
+            entries.append(ImportEntry(values.get('crn', ''), values.get('term', default_term), values.get('year', default_year),
+                                       values.get('subject'), values.get('course_number')))
+        else:
+            entries.append(ImportEntry(str(item), default_term, default_year))
+    return entries
+
+def parse_attachment(filename: str, data: bytes, default_term: str = None, default_year: str = None) -> List[ImportEntry]:
+    """Parse an import file as JSON or CSV by its extension, raising ValueError if it can't be read"""
+    try:
+        text = data.decode('utf-8-sig')
+    except UnicodeDecodeError:
+        raise ValueError("the file isn't UTF-8 text")
+    if filename.lower().endswith('.json'):
+        return parse_json(text, default_term, default_year)
+    try:
+        return parse_csv(text, default_term, default_year)
+    except csv.Error as e:
+        raise ValueError(str(e))
+
+def _summary_lines(lines: List[str]) -> str:
+    shown = lines[:MAX_SUMMARY_LINES]
+    if len(lines) > len(shown):
+        shown.append(f"...and {len(lines) - len(shown)} more")
+    return "\n".join(shown)
+
+def build_summary(added: List[str], rejected: List[Rejection]) -> discord.Embed:
+    """One embed listing the classes added and the entries rejected, with why"""
+    embed = discord.Embed(
+        title=f"📥 Added {len(added)} class(es), rejected {len(rejected)}",
+        color=0x0c6b41 if added else 0xcc3333,
+    )
+    parts = []
+    if added:
+        parts.append("**✅ Added**\n" + _summary_lines([f"• {line}" for line in added]))
+    if rejected:
+        parts.append("**❌ Rejected**\n" + _summary_lines([f"• {entry}: {reason}" for entry, reason in rejected]))
+    embed.description = "\n\n".join(parts)
+    if added:
+        embed.set_footer(text="You'll be notified when seats become available!")
+    return embed
+
+def group_by_term(entries: Iterable[ImportEntry]) -> Dict[str, List[ImportEntry]]:
+    """Entries by term code, so each term is looked up once for all of its CRNs"""
+    groups: Dict[str, List[ImportEntry]] = {}
+    for entry in entries:
+        groups.setdefault(entry.term_code, []).append(entry)
+    return groups
@@ -0,0 +1,185 @@
+import asyncio
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from banner import BannerSessionPool
+from logs import get_logger
+
+logger = get_logger('catalog')
+
+# How often a term's catalog is rebuilt from Banner
+CATALOG_REFRESH_INTERVAL = 6 * 3600
+# A CRN missing from a catalog older than this triggers one early rebuild before it's refused,
+# so sections added since the last rebuild can still be found
+CATALOG_MISS_REFRESH_AFTER = 600
+# Wait before retrying a term whose rebuild failed, doubled on every failure in a row up to
+# CATALOG_REFRESH_INTERVAL, so an outage doesn't turn into a term-wide search every tick
+CATALOG_RETRY_AFTER = 300
+# Sections requested per searchResults page while building a catalog (Banner caps pages at 500)
+CATALOG_PAGE_SIZE = 500
+# The searchResults fields a catalog entry is built from
+CATALOG_FIELDS = ('courseReferenceNumber', 'term', 'subject', 'courseNumber', 'sequenceNumber', 'courseTitle')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS catalog (
+    term_code TEXT NOT NULL,
+    crn TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    course_number TEXT NOT NULL,
+    section TEXT,
+    title TEXT,
+    PRIMARY KEY (term_code, crn)
+);
+
+CREATE TABLE IF NOT EXISTS catalog_terms (
+    term_code TEXT PRIMARY KEY,
+    refreshed_at REAL NOT NULL
+);
+"""
+
+class CatalogEntry:
+    """What the catalog knows about one section"""
+    __slots__ = ('crn', 'subject', 'course_number', 'section', 'title')
+
+    def __init__(self, crn: str, subject: str, course_number: str, section: str = None, title: str = None):
+        self.crn = crn
+        self.subject = subject
+        self.course_number = course_number
+        self.section = section
+        self.title = title
+
+    def describe(self) -> str:
+        description = f"{self.subject} {self.course_number}"
+        if self.section:
+            description += f" ({self.section})"
+        if self.title:
+            description += f" - {self.title}"
+        return description
+
+class SectionCatalog:
+    """Per-term index of every section Banner lists, mapping CRN -> section metadata
+
+    Catalogs are stored in SQLite, loaded into memory on first use and rebuilt from a
+    term-wide search every CATALOG_REFRESH_INTERVAL, so lookups never need a live query.
+    """
+
+    def __init__(self, connection: sqlite3.Connection):
+        self.connection = connection
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+        self.refreshed_at: Dict[str, float] = dict(
+            self.connection.execute('SELECT term_code, refreshed_at FROM catalog_terms'))
+        # term_code -> CRN -> entry, for the terms loaded so far
+        self._terms: Dict[str, Dict[str, CatalogEntry]] = {}
+        # Rebuilds in flight, so concurrent callers share one term-wide search
+        self._refreshes: Dict[str, asyncio.Task] = {}
+        # term_code -> (when its last rebuild failed, failures in a row), until one succeeds
+        self.failed: Dict[str, Tuple[float, int]] = {}
+
+    def has_term(self, term_code: str) -> bool:
+        return term_code in self.refreshed_at
+
+    def _load_term(self, term_code: str) -> Dict[str, CatalogEntry]:
+        if term_code not in self._terms:
+            self._terms[term_code] = {
+                crn: CatalogEntry(crn, subject, course_number, section, title)
+                for crn, subject, course_number, section, title in self.connection.execute(
+                    'SELECT crn, subject, course_number, section, title FROM catalog WHERE term_code = ?',
+                    (term_code,))
+            }
+        return self._terms[term_code]
+
+    def lookup(self, term_code: str, crn: str) -> Optional[CatalogEntry]:
+        if not self.has_term(term_code):
+            return None
+        return self._load_term(term_code).get(crn)
+
+    def retry_at(self, term_code: str) -> float:
+        """When a term whose last rebuild failed may be rebuilt again (0 if it didn't fail)"""
+        if term_code not in self.failed:
+            return 0.0
+        failed_at, failures = self.failed[term_code]
+        return failed_at + min(CATALOG_REFRESH_INTERVAL, CATALOG_RETRY_AFTER * 2 ** (failures - 1))
+
+    def stale_terms(self, term_codes: Iterable[str], now: float = None) -> List[str]:
+        """The given terms whose catalog is missing or older than CATALOG_REFRESH_INTERVAL, oldest first
+
+        Terms backing off after a failed rebuild are left out until their retry_at().
+        """
+        now = now or time.time()
+        return sorted(
+            (term_code for term_code in set(term_codes)
+             if now - self.refreshed_at.get(term_code, 0) >= CATALOG_REFRESH_INTERVAL and now >= self.retry_at(term_code)),
+            key=lambda term_code: self.refreshed_at.get(term_code, 0),
+        )
+
+    def replace_term(self, term_code: str, sections: List[Dict]):
+        """Swap in a freshly fetched list of searchResults items as a term's catalog"""
+        entries = {
+            item['courseReferenceNumber']: CatalogEntry(
+                item['courseReferenceNumber'], item['subject'], item['courseNumber'],
+                item.get('sequenceNumber'), item.get('courseTitle'),
+            )
+            for item in sections
+        }
+        now = time.time()
+        with self.connection:
+            self.connection.execute('DELETE FROM catalog WHERE term_code = ?', (term_code,))
+            self.connection.executemany(
+                'INSERT INTO catalog (term_code, crn, subject, course_number, section, title) VALUES (?, ?, ?, ?, ?, ?)',
+                [(term_code, entry.crn, entry.subject, entry.course_number, entry.section, entry.title)
+                 for entry in entries.values()],
+            )
+            self.connection.execute(
+                'INSERT INTO catalog_terms (term_code, refreshed_at) VALUES (?, ?) '
+                'ON CONFLICT (term_code) DO UPDATE SET refreshed_at = excluded.refreshed_at',
+                (term_code, now),
+            )
+        self._terms[term_code] = entries
+        self.refreshed_at[term_code] = now
+
+    async def _rebuild(self, pool: BannerSessionPool, term_code: str) -> bool:
+        results = []
+
+        async def on_result(key, sections: Optional[List[Dict]]):
+            results.append(sections)
+
+        await pool.search_many([(term_code, '', '')], on_result, page_size=CATALOG_PAGE_SIZE, fields=CATALOG_FIELDS)
+        sections = results[0] if results else None
+        if sections is None:
+            failures = self.failed.get(term_code, (0.0, 0))[1] + 1
+            self.failed[term_code] = (time.time(), failures)
+            logger.warning(f"Failed to rebuild the section catalog for {term_code}, retrying in "
+                           f"{(self.retry_at(term_code) - time.time()) / 60:.0f} min", extra={'term': term_code})
+            return False
+
+        self.replace_term(term_code, sections)
+        self.failed.pop(term_code, None)
+        logger.info(f"Rebuilt the section catalog for {term_code}: {len(sections)} sections", extra={'term': term_code})
+        return True
+
+    async def refresh(self, pool: BannerSessionPool, term_code: str) -> bool:
+        """Rebuild a term's catalog, joining the rebuild already in flight if there is one"""
+        task = self._refreshes.get(term_code)
+        if task is None or task.done():
+            task = self._refreshes[term_code] = asyncio.ensure_future(self._rebuild(pool, term_code))
+        return await asyncio.shield(task)
+
+    async def resolve(self, pool: BannerSessionPool, term_code: str, crn: str) -> Optional[CatalogEntry]:
+        """Look up a CRN, building the term's catalog first if it has none
+
+        A miss against a catalog older than CATALOG_MISS_REFRESH_AFTER rebuilds it once before
+        giving up, unless the term is backing off after a failed rebuild. Check has_term() afterwards to tell "no such section" from "catalog unavailable".
+        """
+        return (await self.resolve_many(pool, term_code, [crn]))[crn]
+
+    async def resolve_many(self, pool: BannerSessionPool, term_code: str, crns: Iterable[str]) -> Dict[str, Optional[CatalogEntry]]:
+        """Look up several CRNs of one term as resolve() does, with at most one term-wide search for all of them"""
+        entries = {crn: self.lookup(term_code, crn) for crn in crns}
+        now = time.time()
+        if (None in entries.values() and now - self.refreshed_at.get(term_code, 0) >= CATALOG_MISS_REFRESH_AFTER
+                and now >= self.retry_at(term_code)):
+            if await self.refresh(pool, term_code):
+                entries = {crn: self.lookup(term_code, crn) for crn in entries}
+        return entries
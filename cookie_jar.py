@@ -0,0 +1,57 @@
+from contextlib import contextmanager
+from typing import Dict
+
+import aiohttp
+from yarl import URL
+
+class BannerCookieJar(aiohttp.CookieJar):
+    """Cookie jar holding one cookie per name, with a version that changes whenever a value does
+
+    Banner and the SSO pages around it set the same cookie names under different domains
+    and paths. aiohttp keeps every (name, domain, path) separately and would send them all,
+    so here storing a cookie replaces its name's cookie in any other scope, and there are
+    never duplicates to clean up. version only moves when the name -> value mapping does,
+    which lets callers skip persisting cookies that haven't changed.
+    """
+
+    def __init__(self):
+        super().__init__(quote_cookie=False)
+        self._version = 0
+        self._values: Dict[str, str] = {}
+
+    @property
+    def version(self) -> int:
+        # Worked out from the jar's contents, so it can't miss a cookie stored some other way
+        values = self.values()
+        if values != self._values:
+            self._values = values
+            self._version += 1
+        return self._version
+
+    def values(self) -> Dict[str, str]:
+        """The jar's cookies as a name -> value dict"""
+        return {cookie.key: cookie.value for cookie in self}
+
+    def update_cookies(self, cookies, response_url: URL = URL()):
+        with self._replacing_other_scopes():
+            super().update_cookies(cookies, response_url)
+
+    def update_cookies_from_headers(self, headers, response_url: URL):
+        # How aiohttp 3.12+ stores a response's cookies, without going through update_cookies()
+        with self._replacing_other_scopes():
+            super().update_cookies_from_headers(headers, response_url)
+
+    @contextmanager
+    def _replacing_other_scopes(self):
+        """Around storing cookies: a cookie stored under a new scope replaces its name's other copies"""
+        scopes_before = {(cookie.key, cookie['domain'], cookie['path']) for cookie in self}
+        yield
+
+        stored = {}
+        for cookie in self:
+            if (cookie.key, cookie['domain'], cookie['path']) not in scopes_before:
+                stored.setdefault(cookie.key, (cookie['domain'], cookie['path']))
+        for name, scope in stored.items():
+            # Only the copy just stored survives
+            self.clear(lambda cookie, name=name, scope=scope:
+                       cookie.key == name and (cookie['domain'], cookie['path']) != scope)
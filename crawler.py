@@ -0,0 +1,120 @@
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from banner import BannerSessionPool, CourseKey
+from logs import get_logger
+from search_results import SEAT_FIELDS
+
+logger = get_logger('crawler')
+
+# Sections requested per searchResults page while crawling (Banner caps pages at 500)
+CRAWL_PAGE_SIZE = 500
+# A snapshot also records each section's subject, so a failed subject can be carried over
+CRAWL_FIELDS = SEAT_FIELDS + ('subject',)
+# Seconds between crawls of the same term
+CRAWL_INTERVAL = 60
+
+# A seat change between two snapshots: (previous seats, current seats), None where the
+# section was missing from that snapshot
+SeatChange = Tuple[Optional[int], Optional[int]]
+
+class TermSnapshot:
+    """Every section's seat count in one term (or in its crawled subjects) at a point in time"""
+    __slots__ = ('term_code', 'taken_at', 'seats', 'subjects')
+
+    def __init__(self, term_code: str, taken_at: float):
+        self.term_code = term_code
+        self.taken_at = taken_at
+        # CRN -> available seats
+        self.seats: Dict[str, int] = {}
+        # CRN -> subject, so a subject that failed to crawl can be carried over from the last snapshot
+        self.subjects: Dict[str, str] = {}
+
+    def add_sections(self, sections: List[Dict]):
+        for item in sections:
+            crn = item['courseReferenceNumber']
+            self.seats[crn] = int(item['seatsAvailable'])
+            self.subjects[crn] = item.get('subject', '')
+
+    def carry_over(self, previous: 'TermSnapshot', subject: str):
+        """Copy one subject's sections from an older snapshot (its crawl failed this time)"""
+        for crn, crn_subject in previous.subjects.items():
+            if crn_subject == subject:
+                self.seats[crn] = previous.seats[crn]
+                self.subjects[crn] = crn_subject
+
+    def diff(self, previous: Optional['TermSnapshot']) -> Dict[str, SeatChange]:
+        """Every CRN whose seat count differs from the previous snapshot, or that appeared or disappeared"""
+        if previous is None:
+            return {crn: (None, seats) for crn, seats in self.seats.items()}
+
+        changes = {
+            crn: (previous.seats.get(crn), seats)
+            for crn, seats in self.seats.items()
+            if previous.seats.get(crn) != seats
+        }
+        for crn in previous.seats.keys() - self.seats.keys():
+            changes[crn] = (previous.seats[crn], None)
+        return changes
+
+class SnapshotCrawler:
+    """Crawls whole terms (or a configured set of subjects) into snapshots and diffs them
+
+    A crawl costs the same number of requests however many sections are watched, so busy
+    terms are better served this way than by polling sections one course at a time.
+    """
+
+    def __init__(self, terms: Iterable[str], subjects: Iterable[str] = (), interval: float = CRAWL_INTERVAL):
+        self.terms = set(terms)
+        # Empty means crawl every subject in one search
+        self.subjects = sorted(subjects)
+        self.interval = interval
+        self.snapshots: Dict[str, TermSnapshot] = {}
+        self.last_crawl: Dict[str, float] = {}
+        # Requests the last crawl of each term took
+        self.last_cost: Dict[str, int] = {}
+
+    def covers(self, term_code: str) -> bool:
+        return term_code in self.terms
+
+    def due_terms(self, watched_terms: Iterable[str], now: float = None) -> List[str]:
+        """Crawled terms with at least one watched section whose next crawl is due"""
+        now = now or time.time()
+        return sorted(
+            term_code for term_code in set(watched_terms) & self.terms
+            if now - self.last_crawl.get(term_code, 0) >= self.interval
+        )
+
+    async def crawl(self, pool: BannerSessionPool, term_code: str) -> Optional[Dict[str, SeatChange]]:
+        """Take a new snapshot of a term and return what changed since the last one
+
+        Subjects are spread across the session pool. Returns None (keeping the old snapshot)
+        if nothing could be fetched.
+        """
+        self.last_crawl[term_code] = time.time()
+        previous = self.snapshots.get(term_code)
+        snapshot = TermSnapshot(term_code, time.time())
+        keys: List[CourseKey] = [(term_code, subject, '') for subject in self.subjects] or [(term_code, '', '')]
+        failed: List[str] = []
+
+        async def on_result(key: CourseKey, sections: Optional[List[Dict]]):
+            if sections is None:
+                failed.append(key[1])
+            else:
+                snapshot.add_sections(sections)
+
+        requests_before = pool.request_count
+        await pool.search_many(keys, on_result, page_size=CRAWL_PAGE_SIZE, fields=CRAWL_FIELDS)
+        self.last_cost[term_code] = pool.request_count - requests_before
+
+        if len(failed) == len(keys):
+            logger.warning(f"Crawl of {term_code} failed, keeping the previous snapshot", extra={'term': term_code})
+            return None
+        if failed:
+            logger.warning(f"Crawl of {term_code} failed for {', '.join(failed)}, reusing their last results", extra={'term': term_code})
+            if previous is not None:
+                for subject in failed:
+                    snapshot.carry_over(previous, subject)
+
+        self.snapshots[term_code] = snapshot
+        return snapshot.diff(previous)
@@ -1,253 +1,85 @@
-import json
+import asyncio
 import time
 from datetime import datetime
-from traceback import print_exc
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
 import discord
-import requests
 from discord.ext import commands, tasks
 
+import config
+from banner import COOKIE_REFRESH_INTERVAL, REFRESH_MARGIN, TERMS, get_term_code
+from breaker import CLOSED
+from bulk_import import (MAX_IMPORT_BYTES, MAX_IMPORT_ENTRIES, ImportEntry, Rejection, build_summary, group_by_term,
+                         parse_arguments, parse_attachment)
+from logs import configure_from_config, get_logger
+from metrics import metrics, start_http_server
+from notifier import NotificationDispatcher, SeatOpening
+from poller import SCHEDULER_TICK, PollerClient, SeatPoller, section_message
+from seat_history import SeatHistory
+from status import StatusBoard, StatusView, parse_filter
+from storage import DATABASE_PATH, BotStorage
+from subscriptions import Section, Subscription, SubscriptionIndex
 from config import BOT_TOKEN, CLASS_REGISTRAR_COOKIES, DEVELOPERS
 
-# Program Constants
-TERMS = {
-    'FALL': '09',
-    'WINTER': '01',
-    'SPRING': '05',
-    'SUMMER': '07',
-}
-
-HEADERS = {
-    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,image/apng,*/*;q=0.8,application/signed-exchange;v=b3;q=0.7',
-    'Accept-Language': 'en-US,en;q=0.9,en-CA;q=0.8',
-    'Cache-Control': 'no-cache',
-    'Connection': 'keep-alive',
-    'Pragma': 'no-cache',
-    'Sec-Fetch-Dest': 'document',
-    'Sec-Fetch-Mode': 'navigate',
-    'Sec-Fetch-Site': 'none',
-    'Sec-Fetch-User': '?1',
-    'Upgrade-Insecure-Requests': '1',
-    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/137.0.0.0 Safari/537.36 Edg/137.0.0.0',
-    'sec-ch-ua': '"Microsoft Edge";v="137", "Chromium";v="137", "Not/A)Brand";v="24"',
-    'sec-ch-ua-mobile': '?0',
-    'sec-ch-ua-platform': '"Windows"',
-}
-
-
-COOKIE_REFRESH_INTERVAL = 300
-
-# Session management
-session = requests.Session()
-session.headers.update(HEADERS)
-last_cookie_refresh = 0
-
-def clean_duplicate_cookies():
-    """Remove duplicate cookies while keeping the most recent ones"""
-    global session
-
-    try:
-        # Get all cookies as a list
-        all_cookies = list(session.cookies)
-
-        # Check for duplicates
-        cookie_names = [cookie.name for cookie in all_cookies]
-        duplicates = [name for name in set(cookie_names) if cookie_names.count(name) > 1]
-
-        if duplicates:
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Found duplicate cookies: {duplicates}")
-
-            # Create a new cookie jar with only unique cookies (keeping the last one of each name)
-            from requests.cookies import RequestsCookieJar
-            new_jar = RequestsCookieJar()
-
-            # Track which cookies we've seen to keep only the last occurrence
-            seen_cookies = {}
-
-            for cookie in all_cookies:
-                # Always update to keep the latest one
-                seen_cookies[cookie.name] = cookie
-
-            # Add unique cookies to new jar
-            for cookie_name, cookie in seen_cookies.items():
-                new_jar.set_cookie(cookie)
-
-            # Replace the session's cookie jar
-            session.cookies = new_jar
-
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] After cleanup: {list(session.cookies.keys())}")
-
-    except Exception as e:
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Error cleaning duplicate cookies: {e}")
-        print_exc()
-
-def initialize_session():
-    """Initialize the session with the provided cookies"""
-    global session, last_cookie_refresh
-    session.cookies.update(CLASS_REGISTRAR_COOKIES)
-    last_cookie_refresh = time.time()
-    clean_duplicate_cookies()
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] Session initialized with cookies: {list(session.cookies.keys())}")
-
-def refresh_session_cookies():
-    """Attempt to refresh session cookies using the redirect mechanism"""
-    global session, last_cookie_refresh
-
-    try:
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Attempting to refresh session cookies...")
-
-        # Store original cookies for comparison
-        original_cookies = dict(session.cookies)
-
-        # Clear existing cookies to prevent duplicates
-        session.cookies.clear()
-
-        # Re-add the most recent saved cookies from bot_data.json, or fall back to config
-        try:
-            with open('bot_data.json', 'r') as f:
-                saved_data = json.load(f)
-                if 'cookies' in saved_data and saved_data['cookies']:
-                    session.cookies.update(saved_data['cookies'])
-                    print(f"[{datetime.now().strftime('%H:%M:%S')}] Restored cookies from bot_data.json: {list(session.cookies.keys())}")
-                else:
-                    session.cookies.update(CLASS_REGISTRAR_COOKIES)
-                    print(f"[{datetime.now().strftime('%H:%M:%S')}] No saved cookies found, using config baseline: {list(session.cookies.keys())}")
-        except (FileNotFoundError, json.JSONDecodeError, KeyError):
-            # Fall back to config cookies if file doesn't exist or is corrupted
-            session.cookies.update(CLASS_REGISTRAR_COOKIES)
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Error loading saved cookies, using config baseline: {list(session.cookies.keys())}")
-
-        # This mimics clicking the "registration" link that occasionally sends SSO cookies 
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Trying registration endpoint...")
-        registration_response = session.get(
-            'https://banner.usask.ca/StudentRegistrationSsb/ssb/registration',
-            allow_redirects=True,
-            timeout=30
-        )
-
-        # Check for new cookies after each step
-        cookies_after_registration = dict(session.cookies)
-        new_from_registration = {k: v for k, v in cookies_after_registration.items()
-                               if k not in original_cookies or original_cookies[k] != v}
-
-        if new_from_registration:
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Got new cookies from registration: {list(new_from_registration.keys())}")
-
-        # Try the main Banner entry point (also causes a potential SSO refresh)
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Trying main Banner entry point...")
-        banner_response = session.get(
-            'https://banner.usask.ca/StudentRegistrationSsb/',
-            allow_redirects=True,
-            timeout=30
-        )
-
-        # Access the menu/home page to trigger auth refresh
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Trying Banner menu...")
-        session.get(
-            'https://banner.usask.ca/StudentRegistrationSsb/ssb/classRegistration/classRegistration',
-            allow_redirects=True,
-            timeout=30
-        )
-
-        # Use an endpoint to refresh session
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Trying term search...")
-        current_year = datetime.now().year
-        current_month = datetime.now().month
-
-        # Determine current or next term
-        if current_month >= 9:  # September or later = Fall term
-            term_code = f"{current_year}09"
-        elif current_month >= 5:  # May or later = Summer term
-            term_code = f"{current_year}07"
-        elif current_month >= 1:  # January or later = Winter term
-            term_code = f"{current_year}01"
-        else:
-            term_code = f"{current_year-1}09"  # Fall of previous year
-
-        session.post(
-            'https://banner.usask.ca/StudentRegistrationSsb/ssb/term/search',
-            params={'mode': 'registration'},
-            data={'term': term_code},
-            allow_redirects=True,
-            timeout=30
-        )
-
-        # Clean any duplicate cookies that might have been created
-        clean_duplicate_cookies()
-
-        # Check final cookie state
-        final_cookies = dict(session.cookies)
-        all_updated_cookies = {k: v for k, v in final_cookies.items()
-                             if k not in original_cookies or original_cookies[k] != v}
-
-        if all_updated_cookies:
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Successfully refreshed cookies! Updated: {list(all_updated_cookies.keys())}")
-            for cookie_name, cookie_value in all_updated_cookies.items():
-                print(f"[{datetime.now().strftime('%H:%M:%S')}]   {cookie_name}: {cookie_value[:20]}...")
-
-            # Save updated cookies
-            save_data()
-        else:
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] No new cookies received during refresh")
-
-        last_cookie_refresh = time.time()
-
-        # Test if the refresh worked by making a simple API call
-        test_response = session.get(
-            'https://banner.usask.ca/StudentRegistrationSsb/ssb/classRegistration/classRegistration',
-            timeout=10
-        )
-
-        if test_response.status_code == 200:
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Cookie refresh verification: SUCCESS")
-            return True
-        else:
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Cookie refresh verification: FAILED (status {test_response.status_code})")
-            return False
-
-    except Exception as e:
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Error refreshing session cookies: {e}")
-        print_exc()
-        return False
-    finally:
-        # Always ensure we clean duplicates even if there was an error
-        try:
-            clean_duplicate_cookies()
-        except Exception as cleanup_error:
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Error in final cleanup: {cleanup_error}")
-
-def should_refresh_cookies():
-    """Determine if cookies should be refreshed"""
-    return time.time() - last_cookie_refresh > COOKIE_REFRESH_INTERVAL
-
-def make_authenticated_request(method: str, url: str, **kwargs) -> requests.Response:
-    """Make a request with automatic cookie refresh if needed"""
-    global session
-
-    # Refresh cookies if it's been a while
-    if should_refresh_cookies():
-        refresh_session_cookies()
-
-    # Make the request
-    response = session.request(method, url, **kwargs)
-
-    # If we get auth errors, try refreshing cookies once
-    if response.status_code in [401, 403]:
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Auth error (status {response.status_code}), attempting cookie refresh...")
-        if refresh_session_cookies():
-            # Retry the request with fresh cookies
-            response = session.request(method, url, **kwargs)
-
-    return response
+# One cookie set per pooled Banner session. CLASS_REGISTRAR_COOKIE_SETS is optional in
+# config.py; without it the bot runs a single session from CLASS_REGISTRAR_COOKIES
+COOKIE_SETS = getattr(config, 'CLASS_REGISTRAR_COOKIE_SETS', None) or [CLASS_REGISTRAR_COOKIES]
+
+# Polling runs inside the bot unless POLLER_SOCKET (optional in config.py) points at a
+# standalone poller started with `python poller.py`, which keeps polling across bot restarts
+POLLER_SOCKET = getattr(config, 'POLLER_SOCKET', None)
+POLLER_ELSEWHERE = "ℹ️ Polling runs in the standalone poller, check its log and metrics endpoint instead."
+
+# Characters of cn!mylist's list before the rest are only counted (an embed description holds
+# 4096, this leaves room for the count)
+MYLIST_MAX_CHARS = 4000
+
+logger = get_logger('bot')
+
+# Persistent storage and the seat history kept alongside it (opened by load_data)
+storage: BotStorage = None
+seat_history: SeatHistory = None
+# In-process polling engine (created by load_data), or the connection to the standalone one
+seat_poller: SeatPoller = None
+poller_client: PollerClient = None
+notification_dispatcher = NotificationDispatcher()
+metrics.set_callback('notification_queue_depth', lambda: notification_dispatcher.depth)
+# What cn!status shows, republished after each pass (or when asked for) once something changed
+status_board = StatusBoard()
+# Local Prometheus endpoint, started on the first on_ready if METRICS_PORT (BOT_METRICS_PORT
+# when polling runs in a standalone poller) is set
+metrics_server = None
 
 # Bot setup
 intents = discord.Intents.default()
 intents.message_content = True
 bot = commands.Bot(command_prefix='cn!', intents=intents, help_command=None)
 
-# Data storage: guild_id -> {crn -> {class_info, users_to_notify, last_available_seats}, notify_channel_id -> channel_id}
-guild_data: Dict[int, Dict[str, Dict]] = {}
+# Every guild's subscriptions, indexed by guild, by watched section (each polled once per pass
+# no matter how many guilds watch it) and by user. Loaded by load_data
+subscriptions = SubscriptionIndex()
+
+def subscribe(guild_id: int, crn: str, year: str, term: str, subject: str, course_number: str, user_id: int) -> Subscription:
+    """Subscribe a user to a guild's class, telling a standalone poller when a guild starts watching a section"""
+    newly_watched = subscriptions.subscription(guild_id, crn) is None
+    subscription = subscriptions.add(guild_id, crn, year, term, subject, course_number, user_id)
+    status_board.invalidate()
+    if newly_watched and poller_client is not None:
+        poller_client.watch(subscription.section)
+    return subscription
+
+def drop_subscription(guild_id: int, crn: str):
+    """Stop watching a class in a guild, telling a standalone poller which guilds (if any) still watch the section"""
+    subscription = subscriptions.subscription(guild_id, crn)
+    if subscription is None:
+        return
+    section = subscriptions.remove(guild_id, crn)
+    status_board.invalidate()
+    if poller_client is not None:
+        if section is not None:
+            poller_client.unwatch(section.key)
+        else:
+            poller_client.watch(subscription.section)
 
 def is_developer():
     """Custom check to verify if user is in the DEVELOPERS list"""
@@ -272,115 +104,105 @@ def is_admin_or_developer():
     return commands.check(predicate)
 
 def load_data():
-    """Load persistent data from file"""
-    global guild_data
-    try:
-        with open('bot_data.json', 'r') as f:
-            data = json.load(f)
-            guild_data = {int(k): v for k, v in data['guilds'].items()}
-
-            # Load cookies if they exist
-            if 'cookies' in data:
-                session.cookies.update(data['cookies'])
-                print(f"[{datetime.now().strftime('%H:%M:%S')}] Loaded {len(data['cookies'])} saved cookies")
+    """Load persistent data from the database"""
+    global subscriptions, storage, seat_history, seat_poller
+
+    if storage is None:
+        storage = BotStorage()
+        # One-time import of the old whole-file format
+        if storage.migrate_from_json():
+            logger.info(f"Migrated bot_data.json into {DATABASE_PATH}")
+        if POLLER_SOCKET:
+            # The standalone poller records history into the same database, the bot only reads it
+            seat_history = SeatHistory(storage.connection)
+        else:
+            seat_poller = SeatPoller(storage, COOKIE_SETS)
+            seat_poller.on_notice = on_poller_notice
+            seat_history = seat_poller.seat_history
+
+    subscriptions = storage.load_subscriptions()
+    status_board.invalidate()
+
+def resolve_notify_channels(guild_ids) -> Dict[int, discord.abc.Messageable]:
+    """Look up the notification channel of each given guild that has a usable one"""
+    notify_channels = {}
+    for guild_id in guild_ids:
+        guild = subscriptions.guilds.get(guild_id)
+        notify_channel_id = guild.notify_channel_id if guild is not None else None
+        if not notify_channel_id:
+            continue  # Skip if no notification channel set
 
-    except FileNotFoundError:
-        guild_data = {}
+        notify_channel = bot.get_channel(notify_channel_id)
+        if not notify_channel:
+            logger.warning(f"Notification channel {notify_channel_id} not found for guild {guild_id}", extra={'guild': guild_id})
+            continue  # Skip if channel no longer exists
 
-def save_data():
-    """Save data to file"""
-    try:
-        # Clean duplicates before saving to prevent CookieConflictError
-        clean_duplicate_cookies()
+        notify_channels[guild_id] = notify_channel
+    return notify_channels
 
-        # Now safely convert cookies to dict
+async def notify_developers(message: str):
+    """DM every developer in config.py, e.g. about Banner outages"""
+    for developer_id in DEVELOPERS:
         try:
-            cookies_dict = dict(session.cookies)
-        except Exception as cookie_error:
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Error converting cookies to dict: {cookie_error}")
-            # Fall back to manual extraction if dict conversion fails
-            cookies_dict = {}
-            for cookie in session.cookies:
-                cookies_dict[cookie.name] = cookie.value
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Used fallback cookie extraction, got {len(cookies_dict)} cookies")
-
-        data = {
-            'guilds': guild_data,
-            'cookies': cookies_dict,
-            'last_updated': datetime.now().isoformat()
-        }
-
-        with open('bot_data.json', 'w') as f:
-            json.dump(data, f, indent=2)
-
-    except Exception as e:
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Error in save_data: {e}")
-        print_exc()
+            user = bot.get_user(developer_id) or await bot.fetch_user(developer_id)
+            await user.send(message)
+        except discord.HTTPException as e:
+            logger.warning(f"Couldn't notify developer {developer_id}: {e}")
+
+def on_poller_notice(message: str):
+    asyncio.ensure_future(notify_developers(message))
+
+async def resolve_section(term_code: str, crn: str):
+    """Look a CRN up in the term's section catalog, returning (entry or None, whether the catalog is available)"""
+    if poller_client is not None:
+        return await poller_client.resolve(term_code, crn)
+    return await seat_poller.resolve_section(term_code, crn)
+
+async def resolve_sections(term_code: str, crns: List[str]):
+    """Look several CRNs of one term up at once, returning (CRN -> entry or None, whether the catalog is available)"""
+    if poller_client is not None:
+        return await poller_client.resolve_many(term_code, crns)
+    return await seat_poller.resolve_sections(term_code, crns)
+
+async def on_poller_seats(event: Dict):
+    """Handle a seat count change reported by the standalone poller"""
+    section = subscriptions.sections.get((event['term_code'], event['crn']))
+    if section is None:
+        return
+    # The poller knows what the count changed from, even if the bot was offline at the time
+    section.last_available_seats = event['previous']
+    await process_seat_result(section, event['seats'], resolve_notify_channels(section.subscriptions.keys()))
 
-def check_class_seats(subject: str, course_number: str, year: str, term: str, crn: str) -> int:
-    """Check available seats for a specific class"""
-    try:
-        params = {
-            'txt_subject': subject,
-            'txt_courseNumber': course_number,
-            'txt_term': f'{year}{TERMS[term.upper()]}',
-            'startDatepicker': '',
-            'endDatepicker': '',
-            'pageOffset': '0',
-            'pageMaxSize': '10',
-            'sortColumn': 'subjectDescription',
-            'sortDirection': 'asc',
-        }
-
-        data = {
-            'term': f'{year}{TERMS[term.upper()]}',
-            'studyPath': '',
-            'studyPathText': '',
-            'startDatepicker': '',
-            'endDatepicker': '',
-        }
-
-        # Put user into search mode for the correct term
-        make_authenticated_request(
-            'POST',
-            'https://banner.usask.ca/StudentRegistrationSsb/ssb/term/search',
-            params={'mode': 'registration'},
-            data=data,
-        )
+@bot.event
+async def on_ready():
+    global metrics_server, poller_client
+    logger.info(f'{bot.user} has logged in!')
 
-        # Reset the search form
-        make_authenticated_request(
-            'POST',
-            'https://banner.usask.ca/StudentRegistrationSsb/ssb/classSearch/resetDataForm',
-        )
+    load_data()
 
-        # Get the search results
-        response = make_authenticated_request(
-            'GET',
-            'https://banner.usask.ca/StudentRegistrationSsb/ssb/searchResults/searchResults',
-            params=params,
-        )
+    if POLLER_SOCKET:
+        if poller_client is None:
+            poller_client = PollerClient(
+                POLLER_SOCKET,
+                lambda: [section_message(section) for section in subscriptions.sections.values()],
+                on_poller_seats,
+                on_poller_notice,
+            )
+        poller_client.start()
+        # METRICS_PORT belongs to the poller process, the bot's own metrics (its notification
+        # queue) go on a port of their own
+        metrics_port = getattr(config, 'BOT_METRICS_PORT', None)
+    else:
+        # on_ready can fire again after a reconnect, start() keeps the existing sessions and connection pool
+        seat_poller.start()
+        metrics_port = getattr(config, 'METRICS_PORT', None)
 
-        if response.status_code == 200:
-            json_data = response.json()
-            data = json_data['data']
-            for item in data:
-                if item['courseReferenceNumber'] == crn:
-                    return int(item['seatsAvailable'])
-            return -1  # Class not found
-        else:
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] HTTP {response.status_code} when checking seats for {crn}")
-            return -2  # Request failed
-    except Exception as e:
-        print(f"Error checking seats for {crn}: {e}")
-        return -2
+    if metrics_port and metrics_server is None:
+        metrics_server = await start_http_server(metrics_port)
+        logger.info(f"Serving metrics at http://127.0.0.1:{metrics_port}/metrics")
 
-@bot.event
-async def on_ready():
-    print(f'{bot.user} has logged in!')
-    initialize_session()
-    load_data()
-    seat_checker.start()
+    if not POLLER_SOCKET and not seat_checker.is_running():
+        seat_checker.start()
 
 @bot.command(name='help')
 async def help_command(ctx):
@@ -401,14 +223,24 @@ async def help_command(ctx):
     )
 
     embed.add_field(
-        name="cn!add CRN SUBJECT COURSE_NUMBER YEAR TERM",
+        name="cn!add CRN TERM YEAR",
         value="Add a class to monitoring list\n"
               "• You'll be pinged when seats become available\n"
-              "• Example: `cn!add 12345 CMPT 332 2024 FALL`\n"
+              "• The CRN is checked against the term's class list\n"
+              "• Example: `cn!add 12345 FALL 2024`\n"
               "• Valid terms: FALL, WINTER, SPRING, SUMMER",
         inline=False
     )
 
+    embed.add_field(
+        name="cn!addmany [TERM YEAR] CRN CRN ...",
+        value="Add many classes at once, with one summary of what was added and rejected\n"
+              "• Example: `cn!addmany FALL 2024 12345 23456 34567 WINTER 2025`\n"
+              "• A TERM YEAR right after a CRN applies to that CRN only\n"
+              "• Or attach a CSV (`crn,term,year`) or JSON file of classes",
+        inline=False
+    )
+
     embed.add_field(
         name="cn!remove CRN",
         value="Stop monitoring a class\n"
@@ -417,10 +249,34 @@ async def help_command(ctx):
     )
 
     embed.add_field(
-        name="cn!status",
-        value="Show all monitored classes and seat counts\n"
+        name="cn!unsubscribe CRN",
+        value="Stop being notified about a class\n"
+              "• Others watching it in this server still get notified\n"
+              "• Example: `cn!unsubscribe 12345`",
+        inline=False
+    )
+
+    embed.add_field(
+        name="cn!mylist",
+        value="Show the classes you're watching in this server",
+        inline=False
+    )
+
+    embed.add_field(
+        name="cn!status [TERM] [SUBJECT] [open]",
+        value="Show all monitored classes and seat counts, 12 per page\n"
               "• Shows notification channel status\n"
-              "• Shows number of users watching each class",
+              "• Shows number of users watching each class\n"
+              "• Filter by term, subject or classes with open seats, e.g. `cn!status FALL CMPT open`",
+        inline=False
+    )
+
+    embed.add_field(
+        name="cn!history CRN [DAYS]",
+        value="Show how a class's seat count has changed\n"
+              "• Seat changes, time spent full and when seats usually open up\n"
+              "• Covers the last 7 days unless DAYS is given\n"
+              "• Example: `cn!history 12345 30`",
         inline=False
     )
 
@@ -446,9 +302,24 @@ async def help_command(ctx):
         inline=False
     )
 
+    embed.add_field(
+        name="cn!schedule [CRN]",
+        value="Show the adaptive polling schedule (Developers only)\n"
+              "• Lists the next classes due, their intervals and why\n"
+              "• Pass a CRN to see its recent seat checks",
+        inline=False
+    )
+
+    embed.add_field(
+        name="cn!metrics",
+        value="Show Banner latency, refresh success, pass timing and queue depth (Developers only)\n"
+              "• Set METRICS_PORT in config.py to also serve Prometheus metrics locally",
+        inline=False
+    )
+
     embed.add_field(
         name="📋 How it works",
-        value="• Bot checks all classes every 20 seconds\n"
+        value="• Busy classes are checked every 10-20 seconds, quiet ones less often\n"
               "• Notifications sent when seats go from 0 → available\n"
               "• Automatic cookie refresh every 5 minutes\n"
               "• Each Discord server has independent monitoring",
@@ -460,54 +331,187 @@ async def help_command(ctx):
     await ctx.send(embed=embed)
 
 @bot.command(name='add')
-async def add_class(ctx, crn: str, subject: str, course_number: str, year: str, term: str):
-    """Add a class to be monitored"""
+async def add_class(ctx, crn: str, *args: str):
+    """Add a class to be monitored: `CRN TERM YEAR`, or the older `CRN SUBJECT COURSE_NUMBER YEAR TERM`"""
     guild_id = ctx.guild.id
     user_id = ctx.author.id
 
+    if len(args) == 2:
+        term, year = args
+        subject = course_number = None
+    elif len(args) == 4:
+        subject, course_number, year, term = args
+    else:
+        await ctx.send("Usage: `cn!add CRN TERM YEAR` (e.g. `cn!add 12345 FALL 2024`)")
+        return
+
     # Validate term
     if term.upper() not in TERMS:
         await ctx.send(f"Invalid term '{term}'. Valid terms are: {', '.join(TERMS.keys())}")
         return
 
-    # Initialize guild data if needed
-    if guild_id not in guild_data:
-        guild_data[guild_id] = {}
+    # A guild watches each CRN for one term only, and joining that subscription would watch the wrong term
+    term_code = get_term_code(year, term)
+    existing = subscriptions.subscription(guild_id, crn)
+    if existing is not None and existing.section.term_code != term_code:
+        await ctx.send(f"❌ This server already watches CRN {crn} for {existing.section.term} {existing.section.year}.")
+        return
 
-    # Initialize class data if needed
-    if crn not in guild_data[guild_id]:
-        guild_data[guild_id][crn] = {
-            'subject': subject.upper(),
-            'course_number': course_number,
-            'year': year,
-            'term': term.upper(),
-            'users_to_notify': [],
-            'last_available_seats': None
-        }
+    # Check the section exists against the local catalog (built from Banner the first time a term is used)
+    section, has_term = await resolve_section(term_code, crn)
+    if section is None:
+        if has_term:
+            await ctx.send(f"❌ There's no section with CRN {crn} in {term.upper()} {year}.")
+        else:
+            await ctx.send("❌ Couldn't load the class list from Banner to check that CRN, please try again later.")
+        return
+    if subject is not None and (subject.upper(), course_number) != (section.subject, section.course_number):
+        await ctx.send(f"❌ CRN {crn} is {section.subject} {section.course_number} in {term.upper()} {year}, not {subject.upper()} {course_number}.")
+        return
 
-    # Add user to notification list if not already there
-    if user_id not in guild_data[guild_id][crn]['users_to_notify']:
-        guild_data[guild_id][crn]['users_to_notify'].append(user_id)
+    # A guild already watching this CRN keeps its existing entry, the user just joins it
+    subscription = subscribe(guild_id, crn, year, term.upper(), section.subject, section.course_number, user_id)
+    storage.add_subscription(subscription, user_id)
+
+    watched = subscription.section
+    await ctx.send(f"✅ Added {section.describe()} (CRN: {crn}) for {watched.term} {watched.year}. You'll be notified when seats become available!")
+
+async def import_entries(guild_id: int, user_id: int, entries: List[ImportEntry]) -> Tuple[List[str], List[Rejection]]:
+    """Check entries together, one catalog lookup per term, then subscribe the user to every valid one in one transaction
+
+    Entries the guild's existing subscriptions rule out are rejected before anything is looked up.
+    """
+    rejected: List[Rejection] = []
+    valid = []
+    seen = set()
+    for entry in entries:
+        problem = entry.problem()
+        # A guild watches each CRN for one term only, so the same CRN twice is a duplicate whatever the terms
+        if problem is None and entry.crn in seen:
+            problem = "listed more than once"
+        if problem is None:
+            existing = subscriptions.subscription(guild_id, entry.crn)
+            if existing is not None and (existing.section.term, existing.section.year) != (entry.term, entry.year):
+                problem = f"this server already watches CRN {entry.crn} for {existing.section.term} {existing.section.year}"
+            elif existing is not None and user_id in existing.user_ids:
+                problem = "you're already watching it"
+        if problem is not None:
+            rejected.append((entry.describe(), problem))
+            continue
+        seen.add(entry.crn)
+        valid.append(entry)
+
+    groups = group_by_term(valid)
+    lookups = await asyncio.gather(*(
+        resolve_sections(term_code, [entry.crn for entry in group]) for term_code, group in groups.items()
+    ))
+
+    accepted = []
+    for group, (sections, has_term) in zip(groups.values(), lookups):
+        for entry in group:
+            section = sections.get(entry.crn)
+            if section is None:
+                rejected.append((entry.describe(), f"there's no such section in {entry.term} {entry.year}" if has_term
+                                 else "couldn't load the class list from Banner, please try again later"))
+            elif entry.subject and (entry.subject, entry.course_number) != (section.subject, section.course_number):
+                rejected.append((entry.describe(), f"it's {section.subject} {section.course_number}, not {entry.subject} {entry.course_number}"))
+            else:
+                accepted.append((entry, section))
+
+    new_subscriptions = [
+        subscribe(guild_id, entry.crn, entry.year, entry.term, section.subject, section.course_number, user_id)
+        for entry, section in accepted
+    ]
+    storage.add_subscriptions(new_subscriptions, user_id)
+
+    added = [f"{section.describe()} (CRN: {entry.crn}) for {subscription.section.term} {subscription.section.year}"
+             for (entry, section), subscription in zip(accepted, new_subscriptions)]
+    return added, rejected
+
+@bot.command(name='addmany')
+async def add_many(ctx, *args: str):
+    """Add many classes at once: `[TERM YEAR] CRN CRN ...`, and/or an attached CSV or JSON file"""
+    entries, default_term, default_year = parse_arguments(args)
+    for attachment in ctx.message.attachments:
+        if attachment.size > MAX_IMPORT_BYTES:
+            await ctx.send(f"❌ {attachment.filename} is too large, import files can be up to {MAX_IMPORT_BYTES // 1024} KB.")
+            return
+        try:
+            entries += parse_attachment(attachment.filename, await attachment.read(), default_term, default_year)
+        except ValueError as e:
+            await ctx.send(f"❌ Couldn't read {attachment.filename}: {e}")
+            return
 
-    save_data()
+    if not entries:
+        await ctx.send("Usage: `cn!addmany FALL 2024 12345 23456 ...`, or attach a CSV or JSON file of CRNs with their term and year")
+        return
+    if len(entries) > MAX_IMPORT_ENTRIES:
+        await ctx.send(f"❌ That's {len(entries)} classes, at most {MAX_IMPORT_ENTRIES} can be added at once.")
+        return
 
-    class_info = guild_data[guild_id][crn]
-    await ctx.send(f"✅ Added {class_info['subject']} {class_info['course_number']} (CRN: {crn}) for {class_info['term']} {class_info['year']}. You'll be notified when seats become available!")
+    async with ctx.typing():
+        added, rejected = await import_entries(ctx.guild.id, ctx.author.id, entries)
+    await ctx.send(embed=build_summary(added, rejected))
 
 @bot.command(name='remove')
 async def remove_class(ctx, crn: str):
     """Remove a class from monitoring"""
     guild_id = ctx.guild.id
 
-    if guild_id not in guild_data or crn not in guild_data[guild_id]:
+    subscription = subscriptions.subscription(guild_id, crn)
+    if subscription is None:
         await ctx.send(f"❌ CRN {crn} is not being monitored in this server.")
         return
 
-    class_info = guild_data[guild_id][crn]
-    del guild_data[guild_id][crn]
-    save_data()
+    drop_subscription(guild_id, crn)
+    storage.remove_class(guild_id, crn)
+
+    await ctx.send(f"✅ Removed {subscription.section.describe()} (CRN: {crn}) from monitoring.")
+
+@bot.command(name='unsubscribe')
+async def unsubscribe(ctx, crn: str):
+    """Stop being notified about a class, leaving it monitored for anyone else watching it"""
+    guild_id = ctx.guild.id
+    user_id = ctx.author.id
+
+    subscription = subscriptions.subscription(guild_id, crn)
+    if subscription is None or user_id not in subscription.user_ids:
+        await ctx.send(f"❌ You're not watching CRN {crn} in this server.")
+        return
+
+    subscriptions.remove_user(subscription, user_id)
+    status_board.invalidate()
+    if subscription.user_ids:
+        storage.remove_subscription(guild_id, crn, user_id)
+    else:
+        # Nobody left to notify, so stop monitoring it here altogether
+        drop_subscription(guild_id, crn)
+        storage.remove_class(guild_id, crn)
+
+    await ctx.send(f"✅ You won't be notified about {subscription.section.describe()} (CRN: {crn}) anymore.")
+
+@bot.command(name='mylist')
+async def my_list(ctx):
+    """Show the classes you're watching in this server"""
+    watching = subscriptions.user_subscriptions(ctx.author.id, ctx.guild.id)
+    if not watching:
+        await ctx.send("📋 You're not watching any classes in this server. Use `cn!add` to start.")
+        return
 
-    await ctx.send(f"✅ Removed {class_info['subject']} {class_info['course_number']} (CRN: {crn}) from monitoring.")
+    lines = []
+    length = 0
+    for index, subscription in enumerate(watching):
+        section = subscription.section
+        seats = section.last_available_seats if section.last_available_seats is not None else 'Checking...'
+        line = f"**{section.describe()}** (CRN: {section.crn}) - {section.term} {section.year}, seats: {seats}"
+        length += len(line) + 1
+        if length > MYLIST_MAX_CHARS:
+            lines.append(f"...and {len(watching) - index} more")
+            break
+        lines.append(line)
+
+    embed = discord.Embed(title=f"📚 Classes watched by {ctx.author.display_name}", description="\n".join(lines), color=0x0c6b41)
+    await ctx.send(embed=embed)
 
 @bot.command(name='setchannel')
 @is_admin_or_developer()
@@ -519,13 +523,10 @@ async def set_notify_channel(ctx, channel: discord.TextChannel = None):
     if channel is None:
         channel = ctx.channel
 
-    # Initialize guild data if needed
-    if guild_id not in guild_data:
-        guild_data[guild_id] = {}
-
     # Store the notification channel ID
-    guild_data[guild_id]['notify_channel_id'] = channel.id
-    save_data()
+    subscriptions.guild(guild_id).notify_channel_id = channel.id
+    storage.set_notify_channel(guild_id, channel.id)
+    status_board.invalidate()
 
     await ctx.send(f"✅ Notification channel set to {channel.mention}. All seat availability notifications will be sent here.")
 
@@ -539,63 +540,83 @@ async def on_command_error(ctx, error):
         pass
     else:
         # For other errors, you might want to log them or handle them differently
-        print(f"Command error in {ctx.command}: {error}")
+        logger.error(f"Command error in {ctx.command}: {error}", extra={'guild': ctx.guild.id if ctx.guild else None})
+
+def publish_status():
+    """Republish the cn!status snapshot if seat counts, subscriptions or channels changed since the last one"""
+    if status_board.stale:
+        status_board.publish(subscriptions, resolve_notify_channels(subscriptions.guilds.keys()))
+
+def current_status(guild_id: int):
+    """The guild's status snapshot, None if it doesn't watch anything"""
+    publish_status()
+    status = status_board.guilds.get(guild_id)
+    return status if status is not None and status.rows else None
 
 @bot.command(name='status')
-async def status(ctx):
-    """Show status of all monitored classes"""
+async def status(ctx, *filters: str):
+    """Show status of all monitored classes, a page at a time, optionally filtered by term, subject or open seats"""
     guild_id = ctx.guild.id
-
-    if guild_id not in guild_data:
+    if current_status(guild_id) is None:
         await ctx.send("📋 No classes are currently being monitored in this server.")
         return
 
-    # Check if notification channel is set
-    notify_channel_id = guild_data[guild_id].get('notify_channel_id')
-    notify_channel = None
-    if notify_channel_id:
-        notify_channel = bot.get_channel(notify_channel_id)
+    view = StatusView(lambda: current_status(guild_id), ctx.author.id, parse_filter(filters))
+    view.message = await ctx.send(embed=view.render(), view=view)
 
-    # Filter out non-class data (like notify_channel_id)
-    classes = {crn: info for crn, info in guild_data[guild_id].items() if crn != 'notify_channel_id'}
+@bot.command(name='history')
+async def seat_history_command(ctx, crn: str, days: int = 7):
+    """Show seat changes and summary stats for a class over the last few days"""
+    subscription = subscriptions.subscription(ctx.guild.id, crn)
+    if subscription is not None:
+        term_code = subscription.section.term_code
+    else:
+        term_code = seat_history.latest_term(crn)
 
-    if not classes:
-        await ctx.send("📋 No classes are currently being monitored in this server.")
+    if term_code is None:
+        await ctx.send(f"❌ No seat history recorded for CRN {crn}.")
         return
 
-    embed = discord.Embed(title="📚 Class Monitoring Status", color=0x0c6b41)
+    end = time.time()
+    start = end - days * 24 * 3600
+    summary = seat_history.summarize(term_code, crn, start, end)
+    if not summary['count']:
+        await ctx.send(f"❌ No seat history recorded for CRN {crn} in the last {days} day(s).")
+        return
 
-    # Add notification channel info
-    if notify_channel:
-        embed.add_field(
-            name="📢 Notification Channel",
-            value=notify_channel.mention,
-            inline=False
-        )
-    else:
+    section = subscriptions.sections.get((term_code, crn))
+    title = f"{section.describe()} (CRN: {crn})" if section else f"CRN {crn}"
+    embed = discord.Embed(title=f"📈 Seat History: {title}", description=f"Term {term_code}, last {days} day(s)", color=0x0c6b41)
+
+    embed.add_field(name="Checks Recorded", value=str(summary['count']), inline=True)
+    embed.add_field(name="Seats (min / avg / max)", value=f"{summary['min']} / {summary['mean']:.1f} / {summary['max']}", inline=True)
+    embed.add_field(name="Currently", value=str(summary['last'][1]), inline=True)
+
+    full_fraction = summary['full_fraction']
+    embed.add_field(name="Time Full", value=f"{full_fraction:.0%}" if full_fraction is not None else "Unknown", inline=True)
+    embed.add_field(name="Seat Changes", value=str(summary['changes']), inline=True)
+    embed.add_field(name="Times Opened Up", value=str(summary['openings']), inline=True)
+
+    # When do seats usually open up? Show the busiest hours of the day
+    busiest_hours = sorted(
+        (hour for hour, count in enumerate(summary['openings_by_hour']) if count),
+        key=lambda hour: -summary['openings_by_hour'][hour]
+    )[:3]
+    if busiest_hours:
         embed.add_field(
-            name="⚠️ Notification Channel",
-            value="Not set! Use `cn!setchannel` to set where notifications will be sent.",
+            name="Usually Opens Around",
+            value=", ".join(f"{hour:02d}:00 ({summary['openings_by_hour'][hour]}x)" for hour in busiest_hours),
             inline=False
         )
 
-    for crn, class_info in classes.items():
-        subject = class_info['subject']
-        course_number = class_info['course_number']
-        year = class_info['year']
-        term = class_info['term']
-        users_count = len(class_info['users_to_notify'])
-        last_seats = class_info.get('last_available_seats', 'Unknown')
-
-        status_text = f"**Term:** {term} {year}\n"
-        status_text += f"**Users watching:** {users_count}\n"
-        status_text += f"**Available seats:** {last_seats if last_seats is not None else 'Checking...'}"
-
-        embed.add_field(
-            name=f"{subject} {course_number} (CRN: {crn})",
-            value=status_text,
-            inline=True
-        )
+    if summary['events']:
+        lines = [
+            f"{datetime.fromtimestamp(at).strftime('%Y-%m-%d %H:%M')}: {before} → {after}"
+            for at, before, after in reversed(summary['events'])
+        ]
+        embed.add_field(name="Recent Changes", value="```" + "\n".join(lines) + "```", inline=False)
+    else:
+        embed.add_field(name="Recent Changes", value="No changes in this period", inline=False)
 
     await ctx.send(embed=embed)
 
@@ -603,53 +624,53 @@ async def status(ctx):
 @is_developer()
 async def cookie_status(ctx):
     """Show current cookie status and allow manual refresh"""
-    global session, last_cookie_refresh
+    if seat_poller is None:
+        await ctx.send(POLLER_ELSEWHERE)
+        return
 
     embed = discord.Embed(title="🍪 Cookie Status", color=0x0c6b41)
 
-    # Show current cookies
-    current_cookies = dict(session.cookies)
-    cookie_names = list(current_cookies.keys())
+    for banner_session in seat_poller.pool.sessions:
+        # Show current cookies
+        cookie_names = list(banner_session.get_cookies().keys())
+        status_text = f"**Active Cookies:** ```{', '.join(cookie_names) if cookie_names else 'None'}```"
+
+        # Show last refresh time and next scheduled refresh
+        if banner_session.last_cookie_refresh > 0:
+            last_refresh = datetime.fromtimestamp(banner_session.last_cookie_refresh)
+            next_refresh = datetime.fromtimestamp(banner_session.last_cookie_refresh + COOKIE_REFRESH_INTERVAL - REFRESH_MARGIN)
+            status_text += f"**Last Refresh:** {last_refresh.strftime('%Y-%m-%d %H:%M:%S')}\n"
+            status_text += f"**Next Auto-Refresh:** {next_refresh.strftime('%Y-%m-%d %H:%M:%S')}\n"
+        else:
+            status_text += "**Last Refresh:** Never\n"
+            status_text += "**Next Auto-Refresh:** Will refresh on first API call\n"
 
-    embed.add_field(
-        name="Active Cookies",
-        value=f"```{', '.join(cookie_names) if cookie_names else 'None'}```",
-        inline=False
-    )
+        if banner_session.refreshing:
+            status_text += "**Refresh:** In progress\n"
+        elif banner_session.last_refresh_duration is not None:
+            outcome = 'succeeded' if banner_session.last_refresh_ok else 'failed'
+            status_text += f"**Last Refresh Result:** {outcome} in {banner_session.last_refresh_duration:.1f}s\n"
 
-    # Show last refresh time
-    if last_cookie_refresh > 0:
-        last_refresh = datetime.fromtimestamp(last_cookie_refresh)
-        embed.add_field(
-            name="Last Refresh",
-            value=f"{last_refresh.strftime('%Y-%m-%d %H:%M:%S')}",
-            inline=True
-        )
-    else:
-        embed.add_field(
-            name="Last Refresh",
-            value="Never",
-            inline=True
-        )
+        status_text += f"**Search Term:** {banner_session.current_search_term or 'Not set'}"
 
-    # Show next scheduled refresh
-    if last_cookie_refresh > 0:
-        next_refresh = datetime.fromtimestamp(last_cookie_refresh + COOKIE_REFRESH_INTERVAL)
         embed.add_field(
-            name="Next Auto-Refresh",
-            value=f"{next_refresh.strftime('%Y-%m-%d %H:%M:%S')}",
-            inline=True
-        )
-    else:
-        embed.add_field(
-            name="Next Auto-Refresh",
-            value="Will refresh on first API call",
-            inline=True
+            name=banner_session.name.capitalize(),
+            value=status_text,
+            inline=False
         )
 
+    # Which refresh steps have been changing cookies, shared across the pool
+    step_stats = seat_poller.pool.step_stats
+    step_lines = [
+        f"{step:<18} {useful}/{runs} changed cookies{' (skipped)' if step_stats.is_skipped(step) else ''}"
+        for step, (runs, useful) in step_stats.counts.items()
+    ]
+    step_lines.append(f"{step_stats.successes}/{step_stats.refreshes} refreshes verified")
+    embed.add_field(name="Refresh Steps", value="```" + "\n".join(step_lines) + "```", inline=False)
+
     embed.add_field(
         name="Manual Refresh",
-        value="Use `cn!refresh` to manually refresh cookies now\nCookies are saved in bot_data.json",
+        value=f"Use `cn!refresh` to manually refresh cookies now\nCookies are saved in {DATABASE_PATH}",
         inline=False
     )
 
@@ -659,110 +680,222 @@ async def cookie_status(ctx):
 @is_developer()
 async def manual_refresh(ctx):
     """Manually refresh session cookies"""
+    if seat_poller is None:
+        await ctx.send(POLLER_ELSEWHERE)
+        return
+
     await ctx.send("🔄 Attempting to refresh cookies...")
 
-    success = refresh_session_cookies()
+    success = all(await seat_poller.pool.refresh_due_sessions(force=True))
 
     if success:
         await ctx.send("✅ Cookie refresh completed! Check `cn!cookies` for updated status.")
     else:
         await ctx.send("❌ Cookie refresh failed. Check bot logs for details.")
 
-@tasks.loop(seconds=20)
+@bot.command(name='schedule')
+@is_developer()
+async def schedule_status(ctx, crn: str = None):
+    """Show the adaptive poll scheduler's decisions, for the next classes due or one CRN"""
+    if seat_poller is None:
+        await ctx.send(POLLER_ELSEWHERE)
+        return
+
+    poll_scheduler = seat_poller.scheduler
+    now = time.time()
+
+    if crn:
+        items = [(key, schedule) for key, schedule in poll_scheduler.sections.items() if key[1] == crn]
+        if not items:
+            await ctx.send(f"❌ CRN {crn} is not scheduled for polling.")
+            return
+    else:
+        items = poll_scheduler.upcoming(10)
+
+    embed = discord.Embed(title="⏱️ Poll Schedule", color=0x0c6b41)
+
+    embed.add_field(
+        name="Request Budget",
+        value=f"{poll_scheduler.budget.available():.0f} / {poll_scheduler.budget.capacity} requests per minute",
+        inline=True
+    )
+    embed.add_field(name="Classes Scheduled", value=str(len(poll_scheduler.sections)), inline=True)
+    embed.add_field(
+        name="Registration Window",
+        value="Active" if poll_scheduler.in_registration_window(now) else "Inactive",
+        inline=True
+    )
+
+    # The class whose seat count has gone unconfirmed longest right now, and the worst any class has had
+    stalest = poll_scheduler.stalest(now)
+    if stalest:
+        (_, stalest_crn), staleness = stalest
+        worst_key, worst_schedule = max(poll_scheduler.sections.items(), key=lambda item: item[1].worst_staleness)
+        embed.add_field(
+            name="Staleness",
+            value=f"Now: {staleness:.0f}s (CRN {stalest_crn})\n"
+                  f"Worst: {worst_schedule.worst_staleness:.0f}s (CRN {worst_key[1]})",
+            inline=True
+        )
+
+    for (term_code, section_crn), schedule in items:
+        section = subscriptions.sections.get((term_code, section_crn))
+        if section is None:
+            continue
+
+        status_text = f"**Next check:** in {max(0, schedule.next_due - now):.0f}s\n"
+        status_text += f"**Interval:** {schedule.interval:.0f}s\n"
+        status_text += f"**Why:** {schedule.reason}\n"
+        status_text += f"**Last seats:** {schedule.last_seats if schedule.last_seats is not None else 'Unknown'}\n"
+        status_text += f"**Staleness:** {schedule.staleness(now):.0f}s now, {schedule.worst_staleness:.0f}s at worst"
+
+        # Show the recent observations behind the decision when looking at a single class
+        if crn and schedule.observations:
+            recent = [f"{datetime.fromtimestamp(at).strftime('%H:%M:%S')} → {seats}" for at, seats in list(schedule.observations)[-5:]]
+            status_text += "\n**Recent checks:** " + ", ".join(recent)
+
+        embed.add_field(
+            name=f"{section.describe()} (CRN: {section_crn}, {section.term} {section.year})",
+            value=status_text,
+            inline=False
+        )
+
+    await ctx.send(embed=embed)
+
+@bot.command(name='metrics')
+@is_developer()
+async def metrics_status(ctx):
+    """Summarize Banner latency, refresh health, pass timing and the notification queue"""
+    def seconds(value: Optional[float]) -> str:
+        return 'n/a' if value is None else f"{value:.2f}s"
+
+    embed = discord.Embed(title="📈 Metrics", color=0x0c6b41)
+
+    # Per-endpoint latency and how its responses came back
+    responses = metrics.counters.get('banner_responses_total', {})
+    lines = []
+    for labels, histogram in sorted(metrics.histograms.get('banner_request_seconds', {}).items()):
+        endpoint = dict(labels)['endpoint']
+        statuses = ", ".join(
+            f"{dict(response_labels)['status']}×{count:g}"
+            for response_labels, count in sorted(responses.items())
+            if dict(response_labels)['endpoint'] == endpoint
+        )
+        lines.append(f"{'/'.join(endpoint.split('/')[-2:])}: n={histogram.count} p50={seconds(histogram.quantile(0.5))} "
+                     f"p95={seconds(histogram.quantile(0.95))} [{statuses}]")
+    embed.add_field(name="Banner Endpoints", value="```" + ("\n".join(lines) or "No requests yet") + "```", inline=False)
+
+    refreshes_ok = metrics.counter_value('cookie_refreshes_total', {'result': 'success'})
+    refreshes_failed = metrics.counter_value('cookie_refreshes_total', {'result': 'failure'})
+    refreshes = refreshes_ok + refreshes_failed
+    embed.add_field(
+        name="Cookie Refreshes",
+        value=f"{refreshes_ok:g}/{refreshes:g} succeeded" + (f" ({refreshes_ok / refreshes:.0%})" if refreshes else ""),
+        inline=True
+    )
+
+    pass_histogram = metrics.histograms.get('seat_check_pass_seconds', {}).get(())
+    embed.add_field(
+        name="Pass Duration",
+        value=f"Last: {seconds(metrics.gauge_value('seat_check_last_pass_seconds'))}\n"
+              f"p95: {seconds(pass_histogram.quantile(0.95) if pass_histogram else None)}",
+        inline=True
+    )
+
+    lag_histogram = metrics.histograms.get('scheduler_lag_seconds', {}).get(())
+    embed.add_field(
+        name="Scheduler Lag",
+        value=f"p50: {seconds(lag_histogram.quantile(0.5) if lag_histogram else None)}\n"
+              f"p95: {seconds(lag_histogram.quantile(0.95) if lag_histogram else None)}",
+        inline=True
+    )
+
+    checked = sum(metrics.counters.get('classes_checked_total', {}).values())
+    skipped = ", ".join(
+        f"{dict(labels)['reason']}: {count:g}"
+        for labels, count in sorted(metrics.counters.get('classes_skipped_total', {}).items())
+    )
+    embed.add_field(name="Classes Since Start", value=f"Checked: {checked:g}\nSkipped: {skipped or 'none'}", inline=True)
+    embed.add_field(name="Notification Queue", value=str(notification_dispatcher.depth), inline=True)
+    if seat_poller is not None:
+        breaker = seat_poller.breaker
+        if breaker.state == CLOSED:
+            banner_status = f"Up ({breaker.failures} recent failure(s))"
+        else:
+            banner_status = f"Down since {(time.monotonic() - breaker.opened_at) / 60:.1f} min ago, next probe in {breaker.retry_in:.0f}s"
+        embed.add_field(name="Banner", value=banner_status, inline=True)
+
+        concurrency = seat_poller.concurrency
+        limits = (f"Concurrency: {concurrency.limit:.1f} of max {concurrency.maximum}, {concurrency.in_flight} in flight\n"
+                  f"Rate: {seat_poller.rate_limiter.rate * 60:g} requests/min, bursts of {seat_poller.rate_limiter.burst}")
+        if concurrency.last_decrease:
+            limits += f"\nLast cut: {concurrency.last_decrease.replace('_', ' ')}, {(time.monotonic() - concurrency.decreased_at) / 60:.1f} min ago"
+        throttle = seat_poller.pool.throttle if seat_poller.pool else None
+        if throttle and throttle.paused_for:
+            limits += f"\nThrottled, paused for {throttle.paused_for:.0f}s"
+        embed.add_field(name="Banner Limits", value=limits, inline=False)
+    else:
+        embed.set_footer(text="Polling metrics are served by the standalone poller")
+
+    await ctx.send(embed=embed)
+
+async def process_seat_result(section: Section, available_seats: int, notify_channels: Dict):
+    """Record a section's latest seat count and notify watching guilds if seats opened up"""
+    crn = section.crn
+    try:
+        # Get previous seat count
+        previous_seats = section.last_available_seats
+
+        # Handle API errors
+        if available_seats == -1:
+            logger.warning(f"Class {crn} not found in search results", extra={'term': section.term_code, 'crn': crn})
+            return  # Don't update seat count if class not found
+        elif available_seats == -2:
+            logger.error(f"Failed to check seats for {crn}", extra={'term': section.term_code, 'crn': crn})
+            return  # Don't update seat count if request failed
+
+        # Update last known seat count only if we got a valid response (every guild's subscription shares it)
+        section.last_available_seats = available_seats
+        if available_seats != previous_seats:
+            status_board.invalidate()
+
+        # Improved notification logic: only notify if we have a valid previous state
+        # and seats went from 0 to >0 (not on first check when previous_seats is None)
+        should_notify = (
+            available_seats > 0 and
+            previous_seats is not None and
+            previous_seats == 0
+        )
+
+        if not should_notify:
+            return
+        logger.info(f"Seats became available for {crn}! ({previous_seats} -> {available_seats})", extra={
+            'term': section.term_code, 'crn': crn, 'seats': available_seats, 'guild': list(section.subscriptions)})
+
+        for guild_id, subscription in list(section.subscriptions.items()):
+            if guild_id in notify_channels:
+                # Sent by the dispatcher in the background, so slow sends never hold up polling
+                notification_dispatcher.enqueue(notify_channels[guild_id], SeatOpening(subscription, available_seats))
+
+    except Exception as e:
+        logger.exception(f"Error processing class {crn}: {e}", extra={'crn': crn})
+        # Continue processing other classes even if one fails
+
+@tasks.loop(seconds=SCHEDULER_TICK)
 async def seat_checker():
-    """Background task to check seats every 20 seconds"""
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] Checking seats...")
+    """Background task that runs an in-process poller pass over the watched sections"""
+    # Resolve each guild's notification channel once per pass
+    notify_channels = resolve_notify_channels(subscriptions.guilds.keys())
 
-    for guild_id, guild_info in guild_data.items():
-        # Get notification channel for this guild
-        notify_channel_id = guild_info.get('notify_channel_id')
-        if not notify_channel_id:
-            continue  # Skip if no notification channel set
+    async def on_result(section: Section, available_seats: int):
+        await process_seat_result(section, available_seats, notify_channels)
 
-        notify_channel = bot.get_channel(notify_channel_id)
-        if not notify_channel:
-            print(f"[{datetime.now().strftime('%H:%M:%S')}] Warning: Notification channel {notify_channel_id} not found for guild {guild_id}")
-            continue  # Skip if channel no longer exists
+    # Sections no guild could be notified about aren't worth polling
+    def is_active(section: Section) -> bool:
+        return any(guild_id in notify_channels for guild_id in section.subscriptions)
 
-        # Filter out non-class data (like notify_channel_id)
-        classes = {crn: info for crn, info in guild_info.items() if crn != 'notify_channel_id'}
-
-        for crn, class_info in classes.items():
-            try:
-                # Check available seats
-                available_seats = check_class_seats(
-                    class_info['subject'],
-                    class_info['course_number'],
-                    class_info['year'],
-                    class_info['term'],
-                    crn
-                )
-
-                # Get previous seat count
-                previous_seats = class_info.get('last_available_seats')
-
-                # Handle API errors
-                if available_seats == -1:
-                    print(f"[{datetime.now().strftime('%H:%M:%S')}] Warning: Class {crn} not found in search results")
-                    continue  # Don't update seat count if class not found
-                elif available_seats == -2:
-                    print(f"[{datetime.now().strftime('%H:%M:%S')}] Error: Failed to check seats for {crn}")
-                    continue  # Don't update seat count if request failed
-
-                # Update last known seat count only if we got a valid response
-                class_info['last_available_seats'] = available_seats
-
-
-                # Improved notification logic: only notify if we have a valid previous state
-                # and seats went from 0 to >0 (not on first check when previous_seats is None)
-                should_notify = (
-                    available_seats > 0 and
-                    previous_seats is not None and
-                    previous_seats == 0
-                )
-
-                if should_notify:
-                    print(f"[{datetime.now().strftime('%H:%M:%S')}] Seats became available for {crn}! ({previous_seats} -> {available_seats})")
-
-                    # Create notification message
-                    user_mentions = []
-                    for user_id in class_info['users_to_notify']:
-                        user_mentions.append(f"<@{user_id}>")
-
-                    if user_mentions:
-                        try:
-                            embed = discord.Embed(
-                                title="🎉 Seats Available!",
-                                description=f"**{class_info['subject']} {class_info['course_number']}** (CRN: {crn})",
-                                color=0x0c6b41
-                            )
-                            embed.add_field(name="Available Seats", value=str(available_seats), inline=True)
-                            embed.add_field(name="Term", value=f"{class_info['term']} {class_info['year']}", inline=True)
-
-                            mentions_text = " ".join(user_mentions)
-                            await notify_channel.send(content=mentions_text, embed=embed)
-                            print(f"[{datetime.now().strftime('%H:%M:%S')}] Successfully sent notification for {crn} to {len(user_mentions)} users")
-
-                        except discord.Forbidden:
-                            print(f"[{datetime.now().strftime('%H:%M:%S')}] Error: Bot lacks permission to send messages in channel {notify_channel.name}")
-                        except discord.HTTPException as e:
-                            print(f"[{datetime.now().strftime('%H:%M:%S')}] Error sending notification: {e}")
-                        except Exception as e:
-                            print(f"[{datetime.now().strftime('%H:%M:%S')}] Unexpected error sending notification for {crn}: {e}")
-                    else:
-                        print(f"[{datetime.now().strftime('%H:%M:%S')}] Warning: No valid users to notify for {crn}")
-
-            except Exception as e:
-                print(f"[{datetime.now().strftime('%H:%M:%S')}] Error processing class {crn}: {e}")
-                # Continue processing other classes even if one fails
-
-    # Periodic cookie refresh - refresh regardless of class activity
-    if should_refresh_cookies():
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] Periodic cookie refresh needed (no API calls in {COOKIE_REFRESH_INTERVAL} seconds)")
-        refresh_session_cookies()
-
-    # Save data after all classes have been checked
-    save_data()
+    await seat_poller.run_pass(subscriptions.sections, on_result, is_active)
+    publish_status()
 
 @seat_checker.before_loop
 async def before_seat_checker():
@@ -770,5 +903,6 @@ async def before_seat_checker():
 
 # Run the bot
 if __name__ == "__main__":
+    configure_from_config()
     # You need to replace 'YOUR_BOT_TOKEN' with your actual Discord bot token
     bot.run(BOT_TOKEN)
@@ -0,0 +1,173 @@
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Mapping, Optional
+
+from metrics import metrics
+
+# Requests started per second across the whole session pool, in bursts of up to REQUEST_BURST
+REQUEST_RATE = 4.0
+REQUEST_BURST = 10
+# How long every request waits after a 429 that doesn't say (with Retry-After) how long to wait
+THROTTLE_PAUSE = 5
+
+# Banner requests in flight at once across the session pool: the controller starts at
+# INITIAL_CONCURRENCY and moves between MIN_CONCURRENCY and MAX_CONCURRENCY (or the number
+# of sessions, as each sends one request at a time)
+INITIAL_CONCURRENCY = 4
+MIN_CONCURRENCY = 1
+MAX_CONCURRENCY = 16
+# Share of the concurrency limit kept after a 429, 5xx, error or latency spike
+DECREASE_FACTOR = 0.5
+# A response slower than this multiple of the smoothed latency, and at least MIN_SPIKE_LATENCY
+# seconds, is a latency spike. LATENCY_SMOOTHING is the weight of each new response
+LATENCY_SPIKE_FACTOR = 3.0
+MIN_SPIKE_LATENCY = 1.0
+LATENCY_SMOOTHING = 0.1
+
+def retry_after(headers: Mapping[str, str], default: float = THROTTLE_PAUSE) -> float:
+    """Seconds a 429 response asks us to wait (only the delta-seconds form of Retry-After is understood)"""
+    try:
+        return max(0.0, float(headers.get('Retry-After', default)))
+    except ValueError:
+        return default
+
+class RateLimiter:
+    """Token bucket that every Banner request waits on before it's sent
+
+    Tokens refill at rate per second up to burst, and callers are served in arrival order.
+    Unlike the scheduler's RequestBudget, which only plans seat checks, this paces every
+    request: cookie refreshes, probes and the catalog rebuilds started by cn!add included.
+    """
+
+    def __init__(self, rate: float = REQUEST_RATE, burst: int = REQUEST_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self._turn = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self):
+        async with self._turn:
+            self._refill(time.monotonic())
+            while self.tokens < 1:
+                wait = (1 - self.tokens) / self.rate
+                metrics.inc('banner_rate_limit_wait_seconds_total', None, wait)
+                await asyncio.sleep(wait)
+                self._refill(time.monotonic())
+            self.tokens -= 1
+
+class Throttle:
+    """Holds every Banner request back for as long as a 429 asked"""
+
+    def __init__(self):
+        self.paused_until = 0.0
+
+    @property
+    def paused_for(self) -> float:
+        return max(0.0, self.paused_until - time.monotonic())
+
+    async def wait(self):
+        while self.paused_for > 0:
+            wait = self.paused_for
+            metrics.inc('banner_throttle_wait_seconds_total', None, wait)
+            await asyncio.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Hold every request back for the given number of seconds"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class ConcurrencyController:
+    """AIMD limit on the number of Banner requests in flight
+
+    While responses come back healthy the limit grows by about one per limit's worth of
+    responses (additive increase), as long as it's actually being used. A 429, 5xx, failed
+    request or latency spike halves it (multiplicative decrease), once per round: responses
+    to requests already in flight when it backed off don't cut it again.
+    """
+
+    def __init__(self, initial: int = INITIAL_CONCURRENCY, minimum: int = MIN_CONCURRENCY, maximum: int = MAX_CONCURRENCY):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.limit = float(min(max(initial, minimum), maximum))
+        self.in_flight = 0
+        # Smoothed latency of answered requests, the baseline latency spikes are measured against
+        self.latency: Optional[float] = None
+        self.decreased_at = 0.0
+        self.last_decrease: Optional[str] = None
+        self._waiters: Deque[asyncio.Future] = deque()
+        metrics.set('banner_concurrency_limit', self.limit)
+        metrics.set('banner_concurrency_max', self.maximum)
+
+    def cap(self, maximum: int):
+        """Lower the maximum to what can actually be in flight, so a saturated limit can be told apart"""
+        self.maximum = max(self.minimum, min(self.maximum, maximum))
+        self.limit = min(self.limit, self.maximum)
+        metrics.set('banner_concurrency_limit', self.limit)
+        metrics.set('banner_concurrency_max', self.maximum)
+
+    async def acquire(self) -> float:
+        """Wait for a free slot, returning when the request started, which goes back to release()"""
+        if self.in_flight < int(self.limit) and not self._waiters:
+            self.in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Handed a slot just as it was cancelled, pass it on
+                    self.in_flight -= 1
+                    self._wake()
+                else:
+                    self._waiters.remove(waiter)
+                raise
+        metrics.set('banner_requests_in_flight', self.in_flight)
+        return time.monotonic()
+
+    def release(self, started: float, status: Optional[int] = None, failed: bool = False):
+        """Free a slot, adjusting the limit by how the request went
+
+        status is the response's status; without one, failed says whether the request
+        failed (rather than being cancelled, which says nothing about Banner).
+        """
+        latency = time.monotonic() - started
+        saturated = self.in_flight >= int(self.limit)
+        self.in_flight -= 1
+
+        reason = None
+        if failed:
+            reason = 'error'
+        elif status == 429:
+            reason = 'throttled'
+        elif status is not None and status >= 500:
+            reason = 'server_error'
+        elif status is not None and self.latency is not None and latency > max(MIN_SPIKE_LATENCY, LATENCY_SPIKE_FACTOR * self.latency):
+            reason = 'latency_spike'
+        if status is not None:
+            self.latency = latency if self.latency is None else self.latency + LATENCY_SMOOTHING * (latency - self.latency)
+
+        if reason is not None:
+            if started >= self.decreased_at:
+                self.limit = max(self.minimum, self.limit * DECREASE_FACTOR)
+                self.decreased_at = time.monotonic()
+                self.last_decrease = reason
+                metrics.inc('banner_concurrency_decreases_total', {'reason': reason})
+        elif status is not None and saturated:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+
+        metrics.set('banner_concurrency_limit', self.limit)
+        metrics.set('banner_requests_in_flight', self.in_flight)
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
@@ -0,0 +1,123 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime
+from typing import Dict, Optional
+
+# Every module logs under this logger, so configure() only touches the bot's own loggers
+ROOT_LOGGER = 'class_notifier'
+
+# Structured fields a call can attach with extra={...}, written as JSON keys (and, in the
+# text format, the session as a prefix)
+FIELDS = ('session', 'guild', 'term', 'crn', 'seats', 'endpoint', 'status', 'latency')
+
+# Rotation of LOG_FILE: size at which it's rolled over, and how many old files are kept
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+
+def get_logger(name: str) -> logging.Logger:
+    return logging.getLogger(f'{ROOT_LOGGER}.{name}')
+
+class TextFormatter(logging.Formatter):
+    """The console format: [HH:MM:SS] [session] message"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = f"[{datetime.fromtimestamp(record.created).strftime('%H:%M:%S')}] "
+        session = getattr(record, 'session', None)
+        if session:
+            line += f"[{session}] "
+        line += record.getMessage()
+        if record.exc_text:
+            line += '\n' + record.exc_text
+        return line
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with the time, level, logger, message and any structured fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """Hands records to the listener thread, so a slow stdout or disk never blocks the event loop
+
+    Only the message and traceback are rendered here, the listener's handlers do the rest.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def configure(level: str = 'INFO', console_format: str = 'text', log_file: str = None,
+              max_bytes: int = MAX_BYTES, backup_count: int = BACKUP_COUNT, levels: Dict[str, str] = None):
+    """Send the bot's logs through a queue to the console and, if log_file is set, a rotated JSON file
+
+    levels overrides the level of single modules, e.g. {'banner': 'DEBUG'}.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(JsonFormatter() if console_format == 'json' else TextFormatter())
+    handlers = [console]
+    if log_file:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8')
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+
+    records = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(records, *handlers)
+    _listener.start()
+
+    root = logging.getLogger(ROOT_LOGGER)
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(records))
+    root.setLevel(level.upper())
+    root.propagate = False
+    for name, module_level in (levels or {}).items():
+        get_logger(name).setLevel(module_level.upper())
+
+def configure_from_config():
+    """configure() with the optional LOG_* settings from config.py"""
+    import config
+
+    configure(
+        level=getattr(config, 'LOG_LEVEL', 'INFO'),
+        console_format=getattr(config, 'LOG_FORMAT', 'text'),
+        log_file=getattr(config, 'LOG_FILE', None),
+        max_bytes=getattr(config, 'LOG_MAX_BYTES', MAX_BYTES),
+        backup_count=getattr(config, 'LOG_BACKUP_COUNT', BACKUP_COUNT),
+        levels=getattr(config, 'LOG_LEVELS', None),
+    )
+
+def shutdown():
+    """Flush whatever is still queued"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+atexit.register(shutdown)
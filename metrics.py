@@ -0,0 +1,162 @@
+import bisect
+from typing import Callable, Dict, Optional, Tuple
+
+from aiohttp import web
+
+# Histogram bucket upper bounds (seconds)
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+PASS_BUCKETS = (0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+LAG_BUCKETS = (1.0, 5.0, 10.0, 20.0, 60.0, 120.0, 300.0, 600.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def _labels(labels: Optional[Dict[str, str]]) -> Labels:
+    return tuple(sorted((labels or {}).items()))
+
+def _format_labels(labels: Labels, extra: Dict[str, str] = None) -> str:
+    items = list(labels) + list((extra or {}).items())
+    if not items:
+        return ''
+    return '{' + ','.join(f'{key}="{value}"' for key, value in items) + '}'
+
+class Histogram:
+    """Fixed-bucket histogram, cumulative like Prometheus' when rendered"""
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        # One count per bucket plus the +Inf overflow
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate a quantile by interpolating inside the bucket it falls in"""
+        if not self.count:
+            return None
+        target = q * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= target and bucket_count:
+                lower = self.buckets[index - 1] if index > 0 else 0.0
+                if index == len(self.buckets):
+                    return lower  # Past the last bucket, the best we can say is "at least this"
+                return lower + (self.buckets[index] - lower) * (target - seen) / bucket_count
+            seen += bucket_count
+        return self.buckets[-1]
+
+class Metrics:
+    """In-process counters, gauges and histograms, rendered in the Prometheus text format"""
+
+    def __init__(self):
+        # name -> (type, help text)
+        self.descriptions: Dict[str, Tuple[str, str]] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        self.gauge_callbacks: Dict[str, Callable[[], float]] = {}
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+
+    def describe(self, name: str, metric_type: str, help_text: str):
+        self.descriptions[name] = (metric_type, help_text)
+
+    def inc(self, name: str, labels: Dict[str, str] = None, value: float = 1):
+        series = self.counters.setdefault(name, {})
+        key = _labels(labels)
+        series[key] = series.get(key, 0) + value
+
+    def set(self, name: str, value: float, labels: Dict[str, str] = None):
+        self.gauges.setdefault(name, {})[_labels(labels)] = value
+
+    def set_callback(self, name: str, callback: Callable[[], float]):
+        """Read a gauge from callback whenever metrics are rendered"""
+        self.gauge_callbacks[name] = callback
+
+    def observe(self, name: str, value: float, labels: Dict[str, str] = None, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        series = self.histograms.setdefault(name, {})
+        key = _labels(labels)
+        if key not in series:
+            series[key] = Histogram(buckets)
+        series[key].observe(value)
+
+    def counter_value(self, name: str, labels: Dict[str, str] = None) -> float:
+        return self.counters.get(name, {}).get(_labels(labels), 0)
+
+    def gauge_value(self, name: str, labels: Dict[str, str] = None) -> Optional[float]:
+        if name in self.gauge_callbacks:
+            return self.gauge_callbacks[name]()
+        return self.gauges.get(name, {}).get(_labels(labels))
+
+    def _header(self, name: str, default_type: str):
+        metric_type, help_text = self.descriptions.get(name, (default_type, ''))
+        lines = [f'# HELP {name} {help_text}'] if help_text else []
+        lines.append(f'# TYPE {name} {metric_type}')
+        return lines
+
+    def render(self) -> str:
+        lines = []
+        for name, series in sorted(self.counters.items()):
+            lines += self._header(name, 'counter')
+            lines += [f'{name}{_format_labels(labels)} {value:g}' for labels, value in sorted(series.items())]
+
+        gauges = {name: dict(series) for name, series in self.gauges.items()}
+        for name, callback in self.gauge_callbacks.items():
+            gauges[name] = {(): callback()}
+        for name, series in sorted(gauges.items()):
+            lines += self._header(name, 'gauge')
+            lines += [f'{name}{_format_labels(labels)} {value:g}' for labels, value in sorted(series.items())]
+
+        for name, series in sorted(self.histograms.items()):
+            lines += self._header(name, 'histogram')
+            for labels, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, bucket_count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+                    cumulative += bucket_count
+                    le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                    lines.append(f'{name}_bucket{_format_labels(labels, {"le": le})} {cumulative}')
+                lines.append(f'{name}_sum{_format_labels(labels)} {histogram.sum:g}')
+                lines.append(f'{name}_count{_format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+# The process-wide registry every module records into
+metrics = Metrics()
+metrics.describe('banner_request_seconds', 'histogram', 'Banner request latency by endpoint')
+metrics.describe('banner_responses_total', 'counter', 'Banner responses by endpoint and status (error = no response)')
+metrics.describe('cookie_refreshes_total', 'counter', 'Cookie refreshes by result')
+metrics.describe('cookie_refresh_seconds', 'histogram', 'Duration of the whole cookie refresh sequence')
+metrics.describe('seat_check_pass_seconds', 'histogram', 'Duration of one seat_checker pass')
+metrics.describe('seat_check_last_pass_seconds', 'gauge', 'Duration of the most recent seat_checker pass')
+metrics.describe('classes_checked_total', 'counter', 'Watched sections resolved by seat_checker')
+metrics.describe('classes_skipped_total', 'counter', 'Due sections seat_checker pushed back, by reason')
+metrics.describe('scheduler_lag_seconds', 'histogram', 'How overdue sections were when they were polled')
+metrics.describe('section_staleness_seconds', 'histogram', 'How long a polled section had gone unconfirmed when it was checked')
+metrics.describe('section_staleness_max_seconds', 'gauge', 'Longest any polled section has currently gone unconfirmed')
+metrics.describe('banner_circuit_open', 'gauge', '1 while the Banner circuit breaker is open or probing')
+metrics.describe('banner_circuit_trips_total', 'counter', 'Times the Banner circuit breaker opened, failed probes included')
+metrics.describe('banner_requests_rejected_total', 'counter', 'Banner requests refused without sending while the breaker was open')
+metrics.describe('banner_concurrency_limit', 'gauge', 'Banner requests currently allowed in flight at once (adaptive)')
+metrics.describe('banner_concurrency_max', 'gauge', 'Most Banner requests the concurrency limit may grow to (BANNER_MAX_CONCURRENCY, capped at the number of sessions)')
+metrics.describe('banner_requests_in_flight', 'gauge', 'Banner requests in flight')
+metrics.describe('banner_concurrency_decreases_total', 'counter', 'Times the concurrency limit was cut, by reason')
+metrics.describe('banner_rate_limit_wait_seconds_total', 'counter', 'Time requests spent waiting on the request rate limiter')
+metrics.describe('banner_throttle_wait_seconds_total', 'counter', 'Time requests spent held back after Banner answered 429')
+metrics.describe('notification_queue_depth', 'gauge', 'Seat openings queued but not yet sent')
+
+async def start_http_server(port: int, host: str = '127.0.0.1') -> web.AppRunner:
+    """Serve the registry in the Prometheus text format at http://host:port/metrics"""
+    async def handle_metrics(request):
+        return web.Response(
+            body=metrics.render().encode(),
+            headers={'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'},
+        )
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    return runner
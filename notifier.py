@@ -0,0 +1,155 @@
+import asyncio
+import time
+from typing import Dict, List, Tuple
+
+import discord
+
+from logs import get_logger
+from subscriptions import Subscription
+
+logger = get_logger('notifier')
+
+# Discord rejects message content longer than this
+MAX_MESSAGE_LENGTH = 2000
+# Openings merged into one message (one embed line each)
+MAX_OPENINGS_PER_MESSAGE = 10
+# How long a channel's first opening waits for others to merge with before sending
+COALESCE_DELAY = 1.0
+
+# Per-channel send budget, kept under Discord's limit of 5 messages per 5 seconds so
+# discord.py never has to sit out a 429
+CHANNEL_BURST = 5
+CHANNEL_MESSAGES_PER_SECOND = 1.0
+
+class SeatOpening:
+    """Seats opening up in one class, to be announced to one guild's watchers"""
+    __slots__ = ('crn', 'subject', 'course_number', 'term', 'year', 'available_seats', 'user_ids')
+
+    def __init__(self, subscription: Subscription, available_seats: int):
+        section = subscription.section
+        self.crn = section.crn
+        self.subject = section.subject
+        self.course_number = section.course_number
+        self.term = section.term
+        self.year = section.year
+        self.available_seats = available_seats
+        self.user_ids = list(subscription.user_ids)
+
+class ChannelBucket:
+    """Token bucket pacing sends to one channel"""
+
+    def __init__(self):
+        self.tokens = float(CHANNEL_BURST)
+        self.updated = time.monotonic()
+
+    async def acquire(self):
+        now = time.monotonic()
+        self.tokens = min(CHANNEL_BURST, self.tokens + (now - self.updated) * CHANNEL_MESSAGES_PER_SECOND)
+        self.updated = now
+        if self.tokens < 1:
+            await asyncio.sleep((1 - self.tokens) / CHANNEL_MESSAGES_PER_SECOND)
+            self.tokens = 1
+            self.updated = time.monotonic()
+        self.tokens -= 1
+
+def chunk_mentions(user_ids: List[int], limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+    """Join user mentions into as few messages as possible, none longer than limit"""
+    chunks = []
+    current = ''
+    for user_id in user_ids:
+        mention = f"<@{user_id}>"
+        if current and len(current) + 1 + len(mention) > limit:
+            chunks.append(current)
+            current = mention
+        else:
+            current = f"{current} {mention}" if current else mention
+    if current:
+        chunks.append(current)
+    return chunks
+
+def build_embed(openings: List[SeatOpening]) -> discord.Embed:
+    embed = discord.Embed(title="🎉 Seats Available!", color=0x0c6b41)
+    if len(openings) == 1:
+        opening = openings[0]
+        embed.description = f"**{opening.subject} {opening.course_number}** (CRN: {opening.crn})"
+        embed.add_field(name="Available Seats", value=str(opening.available_seats), inline=True)
+        embed.add_field(name="Term", value=f"{opening.term} {opening.year}", inline=True)
+    else:
+        embed.description = "\n".join(
+            f"**{opening.subject} {opening.course_number}** (CRN: {opening.crn}) - "
+            f"{opening.available_seats} seat(s), {opening.term} {opening.year}"
+            for opening in openings
+        )
+    return embed
+
+class NotificationDispatcher:
+    """Outbound queue for seat notifications, sent separately from polling
+
+    Each channel gets its own worker, so channels are sent to concurrently while every
+    channel's own messages stay in order and within its rate limit. Openings queued for a
+    channel while its worker waits or sends are merged into as few messages as possible.
+    """
+
+    def __init__(self):
+        # channel id -> (channel, openings waiting to be sent)
+        self._pending: Dict[int, Tuple[discord.abc.Messageable, List[SeatOpening]]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+        self._buckets: Dict[int, ChannelBucket] = {}
+
+    @property
+    def depth(self) -> int:
+        """Openings queued but not sent yet"""
+        return sum(len(openings) for _, openings in self._pending.values())
+
+    def enqueue(self, channel, opening: SeatOpening):
+        if not opening.user_ids:
+            logger.warning(f"No valid users to notify for {opening.crn}", extra={'crn': opening.crn})
+            return
+
+        self._pending.setdefault(channel.id, (channel, []))[1].append(opening)
+        worker = self._workers.get(channel.id)
+        if worker is None or worker.done():
+            self._workers[channel.id] = asyncio.ensure_future(self._channel_worker(channel.id))
+
+    async def _channel_worker(self, channel_id: int):
+        bucket = self._buckets.setdefault(channel_id, ChannelBucket())
+        while channel_id in self._pending:
+            # Give other openings found in the same pass a moment to join this message
+            await asyncio.sleep(COALESCE_DELAY)
+            channel, queued = self._pending.pop(channel_id)
+
+            # A class queued more than once only needs its latest seat count, for all its watchers
+            merged: Dict[str, SeatOpening] = {}
+            for opening in queued:
+                if opening.crn in merged:
+                    opening.user_ids = list(dict.fromkeys(merged[opening.crn].user_ids + opening.user_ids))
+                merged[opening.crn] = opening
+            openings = list(merged.values())
+
+            for start in range(0, len(openings), MAX_OPENINGS_PER_MESSAGE):
+                await self._send(channel, openings[start:start + MAX_OPENINGS_PER_MESSAGE], bucket)
+
+    async def _send(self, channel, openings: List[SeatOpening], bucket: ChannelBucket):
+        crns = ', '.join(opening.crn for opening in openings)
+        # Everyone watching any of the merged classes, each mentioned once
+        user_ids = list(dict.fromkeys(user_id for opening in openings for user_id in opening.user_ids))
+
+        try:
+            embed = build_embed(openings)
+            for index, mentions_text in enumerate(chunk_mentions(user_ids)):
+                await bucket.acquire()
+                # The embed goes with the first chunk, the rest are mention-only follow-ups
+                await channel.send(content=mentions_text, embed=embed if index == 0 else None)
+            logger.info(f"Successfully sent notification for {crns} to {len(user_ids)} users", extra={'crn': crns})
+
+        except discord.Forbidden:
+            logger.error(f"Bot lacks permission to send messages in channel {channel.name}", extra={'crn': crns})
+        except discord.HTTPException as e:
+            logger.error(f"Error sending notification: {e}", extra={'crn': crns})
+        except Exception as e:
+            logger.exception(f"Unexpected error sending notification for {crns}: {e}", extra={'crn': crns})
+
+    async def drain(self):
+        """Wait for everything queued so far to be sent"""
+        while any(not worker.done() for worker in self._workers.values()):
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
@@ -0,0 +1,671 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import config
+from banner import BannerSessionPool, CourseKey, section_seats
+from breaker import BASE_BACKOFF, CLOSED, FAILURE_THRESHOLD, MAX_BACKOFF, CircuitBreaker
+from catalog import CatalogEntry, SectionCatalog
+from crawler import CRAWL_INTERVAL, SnapshotCrawler
+from limiter import MAX_CONCURRENCY, REQUEST_BURST, ConcurrencyController, RateLimiter
+from logs import configure_from_config, get_logger
+from metrics import LAG_BUCKETS, PASS_BUCKETS, metrics, start_http_server
+from scheduler import BASE_POLL_INTERVAL, MAX_POLL_INTERVAL, WARMUP_PERIOD, PollScheduler, RoundRobin
+from seat_history import SeatHistory
+from storage import BotStorage
+from subscriptions import Section, SectionKey, Subscription
+
+# How often the seat checker wakes up to poll whatever is due
+SCHEDULER_TICK = 5
+# Banner requests a course search is expected to cost (reset the form + one results page)
+ESTIMATED_REQUESTS_PER_SEARCH = 2
+# Seconds a pass may spend starting course searches, whatever is left waits for the next tick
+PASS_TIME_BUDGET = 15
+# Stands in for the guild of sections no guild is known to watch, in the round-robin
+NO_GUILD = 0
+# Seconds between checkpoints of when each section's seat count was last confirmed (changed
+# counts are saved straight away), which a restart resumes from
+CHECKPOINT_INTERVAL = 60
+
+# IPC between the bot and a standalone poller: newline-delimited JSON over a Unix socket.
+# Lines can carry the whole watch list, so allow them to be long
+IPC_LINE_LIMIT = 16 * 1024 * 1024
+# Seat changes kept for the bot while it's disconnected, and how old they may get before
+# they're no longer worth announcing
+EVENT_BUFFER_SIZE = 10000
+EVENT_MAX_AGE = 300
+# Bytes waiting to be sent to a bot before it counts as stuck and is disconnected (it
+# re-syncs when it reconnects)
+CLIENT_WRITE_BUFFER_LIMIT = 8 * 1024 * 1024
+# Client side: wait between reconnection attempts, and for the poller to answer a lookup
+RECONNECT_DELAY = 5
+RESOLVE_TIMEOUT = 60
+# How often a standalone poller writes out the seat history it's still buffering, so the bot's
+# cn!history (reading the database) is at most this far behind
+HISTORY_SYNC_INTERVAL = 60
+
+# Called with each section checked and the seats found (-1 not found, -2 failed)
+ResultCallback = Callable[[Section, int], Awaitable[None]]
+
+logger = get_logger('poller')
+
+class SeatPoller:
+    """The seat polling engine: Banner sessions, scheduling, crawling, catalogs and seat history
+
+    Knows nothing about Discord. Each pass is handed the watched sections and reports what
+    it found through a callback, so it runs the same inside the bot or in a worker.
+    """
+
+    def __init__(self, storage: BotStorage, cookie_sets: List[Dict[str, str]], history_sync_interval: Optional[float] = None):
+        self.storage = storage
+        self.cookie_sets = cookie_sets
+        self.seat_history = SeatHistory(storage.connection, history_sync_interval)
+        self.catalog = SectionCatalog(storage.connection)
+
+        # Adaptive per-class polling. BANNER_REQUESTS_PER_MINUTE and REGISTRATION_WINDOWS (a list of
+        # ('YYYY-MM-DD HH:MM', 'YYYY-MM-DD HH:MM') pairs, polled at the fastest rate) are optional in config.py
+        self.scheduler = PollScheduler(
+            getattr(config, 'BANNER_REQUESTS_PER_MINUTE', 240),
+            getattr(config, 'REGISTRATION_WINDOWS', []),
+        )
+        # Due courses are taken in turns across the guilds watching them, resuming after the guild
+        # served last, starting searches for up to PASS_TIME_BUDGET seconds per pass (searches under way
+        # then still finish). GUILD_POLL_QUOTAS ({guild_id: courses per pass}) and PASS_TIME_BUDGET are
+        # optional in config.py
+        self.round_robin = RoundRobin(getattr(config, 'GUILD_POLL_QUOTAS', {}))
+        self.time_budget = getattr(config, 'PASS_TIME_BUDGET', PASS_TIME_BUDGET)
+        metrics.set_callback('section_staleness_max_seconds', self._max_staleness)
+        # The first pass restores the checkpointed baselines and ramps polling up over WARMUP_PERIOD
+        # seconds (optional in config.py) rather than checking everything at once
+        self.warmup_period = getattr(config, 'WARMUP_PERIOD', WARMUP_PERIOD)
+        self.warm_started = False
+        # (term_code, crn) -> when its seat count was confirmed, not yet checkpointed
+        self._checked: Dict[SectionKey, float] = {}
+        self._last_checkpoint = time.monotonic()
+        # Terms listed in CRAWL_TERMS are crawled whole (or by CRAWL_SUBJECTS) instead of polled per course
+        self.crawler = SnapshotCrawler(
+            getattr(config, 'CRAWL_TERMS', []),
+            getattr(config, 'CRAWL_SUBJECTS', []),
+            getattr(config, 'CRAWL_INTERVAL', CRAWL_INTERVAL),
+        )
+
+        # Polling stops while Banner is down. BANNER_FAILURE_THRESHOLD, BANNER_BASE_BACKOFF and
+        # BANNER_MAX_BACKOFF (seconds) are optional in config.py
+        self.breaker = CircuitBreaker(
+            getattr(config, 'BANNER_FAILURE_THRESHOLD', FAILURE_THRESHOLD),
+            getattr(config, 'BANNER_BASE_BACKOFF', BASE_BACKOFF),
+            getattr(config, 'BANNER_MAX_BACKOFF', MAX_BACKOFF),
+            on_change=self._on_breaker_change,
+        )
+        # Every Banner request, not only the seat checks the budget plans, waits its turn at
+        # BANNER_REQUESTS_PER_MINUTE, in bursts of up to BANNER_REQUEST_BURST (optional in config.py)
+        self.rate_limiter = RateLimiter(self.scheduler.budget.capacity / 60, getattr(config, 'BANNER_REQUEST_BURST', REQUEST_BURST))
+        # Works out how many sessions Banner handles searching at once, up to BANNER_MAX_CONCURRENCY
+        # (optional in config.py) or the number of sessions, whichever is lower
+        self.concurrency = ConcurrencyController(maximum=getattr(config, 'BANNER_MAX_CONCURRENCY', MAX_CONCURRENCY))
+        # Called with a notice for developers when Banner goes down and when it's back
+        self.on_notice: Optional[Callable[[str], None]] = None
+
+        # Created by start(), once the event loop is running
+        self.pool: BannerSessionPool = None
+
+    def start(self):
+        """Open the Banner session pool with each session's saved cookies and keep them fresh"""
+        if self.pool is not None:
+            return
+        self.pool = BannerSessionPool(self.cookie_sets, on_cookies_updated=self.save_cookies, breaker=self.breaker,
+                                      concurrency=self.concurrency, rate_limiter=self.rate_limiter)
+        logger.info(f"Created a pool of {len(self.pool.sessions)} Banner session(s)")
+
+        saved_cookie_sets = self.storage.load_cookie_sets()
+        if saved_cookie_sets:
+            logger.info(f"Loaded {len(saved_cookie_sets)} saved cookie set(s)")
+        self.pool.initialize(saved_cookie_sets)
+        self.pool.start_background_refresh()
+
+    async def close(self):
+        if self.pool is not None:
+            await self.pool.close()
+        self.checkpoint()
+        self.seat_history.flush(force=True)
+
+    async def warm_start(self, watches: Dict[SectionKey, Section]):
+        """Resume after a (re)start: reuse the saved cookies that still work and ramp up from the saved baselines"""
+        self.warm_started = True
+        await self.pool.verify_sessions()
+
+        saved = self.storage.load_baselines()
+        baselines = {
+            key: saved.get(key, (section.last_available_seats, None, None))
+            for key, section in watches.items() if not self.crawler.covers(key[0])
+        }
+        self.scheduler.warm_start(baselines, self.warmup_period)
+        if baselines:
+            checked = [checked_at for _, checked_at, _ in baselines.values() if checked_at]
+            oldest = f", the oldest from {(time.time() - min(checked)) / 60:.0f} min ago" if checked else ""
+            logger.info(f"Warm start: restored {len(checked)}/{len(baselines)} seat baseline(s){oldest}, "
+                f"ramping polling up over {self.warmup_period:.0f}s")
+
+    def checkpoint(self):
+        """Save when each section checked since the last checkpoint had its seat count confirmed"""
+        if self._checked:
+            self.storage.checkpoint_checks((term_code, crn, checked_at) for (term_code, crn), checked_at in self._checked.items())
+            self._checked.clear()
+        self._last_checkpoint = time.monotonic()
+
+    def _max_staleness(self) -> float:
+        stalest = self.scheduler.stalest()
+        return stalest[1] if stalest else 0
+
+    def _on_breaker_change(self, opened: bool):
+        if opened:
+            notice = (f"⚠️ Banner looks down after {self.breaker.failure_threshold} failed requests in a row "
+                      f"(last: {self.breaker.last_error}). Polling is paused, next probe in {self.breaker.retry_in:.0f}s.")
+        else:
+            notice = f"✅ Banner is back after {self.breaker.last_outage / 60:.1f} minute(s), polling has resumed."
+        logger.log(logging.WARNING if opened else logging.INFO, notice)
+        if self.on_notice:
+            self.on_notice(notice)
+
+    def save_cookies(self):
+        """Persist the cookies of every pooled session whose cookies changed since they were last saved"""
+        try:
+            for index, banner_session in enumerate(self.pool.sessions if self.pool else []):
+                cookies = banner_session.cookies_changed()
+                if cookies is None:
+                    continue
+
+                self.storage.save_cookie_set(index, cookies)
+                banner_session.mark_saved(cookies)
+
+        except Exception as e:
+            logger.exception(f"Error saving cookies: {e}")
+
+    async def resolve_section(self, term_code: str, crn: str) -> Tuple[Optional[CatalogEntry], bool]:
+        """Look a CRN up in the term's catalog, returning (entry or None, whether the catalog is available)"""
+        entry = await self.catalog.resolve(self.pool, term_code, crn)
+        return entry, self.catalog.has_term(term_code)
+
+    async def resolve_sections(self, term_code: str, crns: Iterable[str]) -> Tuple[Dict[str, Optional[CatalogEntry]], bool]:
+        """Look several CRNs of one term up at once, as resolve_section does"""
+        entries = await self.catalog.resolve_many(self.pool, term_code, crns)
+        return entries, self.catalog.has_term(term_code)
+
+    async def run_pass(self, watches: Dict[SectionKey, Section], on_result: ResultCallback,
+                       is_active: Callable[[Section], bool] = None):
+        """Check whichever watched sections are due, calling on_result for each one resolved
+
+        Sections for which is_active returns False (nobody could be notified) are pushed back
+        instead of polled. on_result is responsible for updating the section's last_available_seats.
+        Nothing is polled while the circuit breaker is open; whatever is due stays due. Once
+        its backoff runs out, a single probe request decides whether the pass goes ahead.
+        """
+        if self.breaker.state != CLOSED and (self.breaker.is_open or not await self.pool.probe()):
+            return
+        if not self.warm_started:
+            await self.warm_start(watches)
+        pass_started = time.monotonic()
+
+        # (term_code, crn, seats) of every section whose seat count changed this pass
+        changed_seat_counts: List[Tuple[str, str, int]] = []
+
+        # Crawled terms are resolved from one term-wide snapshot per cycle, whatever the number of watchers
+        watched_by_term: Dict[str, Dict[str, Section]] = {}
+        for (term_code, crn), section in watches.items():
+            watched_by_term.setdefault(term_code, {})[crn] = section
+
+        for term_code in self.crawler.due_terms(watched_by_term.keys()):
+            changes = await self.crawler.crawl(self.pool, term_code)
+            self.scheduler.budget.charge(self.crawler.last_cost[term_code])
+            if changes is None:
+                continue
+
+            snapshot = self.crawler.snapshots[term_code]
+            watched = watched_by_term[term_code]
+            for crn in watched:
+                if crn in snapshot.seats:
+                    self.seat_history.record(term_code, crn, snapshot.seats[crn], snapshot.taken_at)
+                    self._checked[(term_code, crn)] = snapshot.taken_at
+            metrics.inc('classes_checked_total', {'source': 'crawl'}, len(watched))
+
+            # Only watched sections that changed (or have no baseline yet) need processing
+            events = (changes.keys() & watched.keys()) | {crn for crn, section in watched.items() if section.last_available_seats is None}
+            if events:
+                logger.info(f"Crawl of {term_code}: {len(snapshot.seats)} sections, {len(changes)} changed, {len(events)} watched",
+                            extra={'term': term_code})
+            for crn in events:
+                section = watched[crn]
+                available_seats = snapshot.seats.get(crn, -1)
+                if available_seats != -1 and available_seats != section.last_available_seats:
+                    changed_seat_counts.append((term_code, crn, available_seats))
+                await on_result(section, available_seats)
+
+        # Keep each watched term's section catalog fresh, one rebuild per tick at most
+        stale_terms = self.catalog.stale_terms(watched_by_term.keys())
+        if stale_terms:
+            requests_before = self.pool.request_count
+            await self.catalog.refresh(self.pool, stale_terms[0])
+            self.scheduler.budget.charge(self.pool.request_count - requests_before)
+
+        # Keep the scheduler tracking exactly the watched sections it polls (new ones are due immediately)
+        polled_keys = [key for key in watches if not self.crawler.covers(key[0])]
+        self.scheduler.sync(polled_keys, {key: watches[key].last_available_seats for key in polled_keys})
+
+        # Group the due sections by course, and list each guild's due courses, most overdue first
+        due_courses: Dict[CourseKey, List[SectionKey]] = {}
+        courses_by_guild: Dict[int, Dict[CourseKey, None]] = {}
+        now = time.time()
+        for key in self.scheduler.pop_due(now):
+            section = watches[key]
+            metrics.observe('scheduler_lag_seconds', now - self.scheduler.sections[key].next_due, buckets=LAG_BUCKETS)
+
+            # Skip sections that no guild could be notified about
+            if is_active is not None and not is_active(section):
+                self.scheduler.defer(key, 'no notification channel', BASE_POLL_INTERVAL)
+                metrics.inc('classes_skipped_total', {'reason': 'no_channel'})
+                continue
+            course_key = (key[0], section.subject, section.course_number)
+            due_courses.setdefault(course_key, []).append(key)
+            for guild_id in section.subscriptions or (NO_GUILD,):
+                courses_by_guild.setdefault(guild_id, {})[course_key] = None
+
+        # Guilds take turns, so one guild's hundreds of classes can't hold everyone else's back.
+        # Courses over a guild's quota stay due for a later tick
+        fair_order, over_quota = self.round_robin.order(courses_by_guild)
+        for course_key in over_quota:
+            for key in due_courses[course_key]:
+                self.scheduler.requeue(key)
+            metrics.inc('classes_skipped_total', {'reason': 'guild_quota'}, len(due_courses[course_key]))
+
+        # Spend the request budget course by course, anything that doesn't fit waits for a later tick
+        course_groups: Dict[CourseKey, List[Section]] = {}
+        for course_key, _ in fair_order:
+            if self.scheduler.budget.try_consume(ESTIMATED_REQUESTS_PER_SEARCH):
+                course_groups[course_key] = []
+            else:
+                for key in due_courses[course_key]:
+                    self.scheduler.defer(key, 'over the request budget')
+                metrics.inc('classes_skipped_total', {'reason': 'budget'}, len(due_courses[course_key]))
+
+        if course_groups:
+            # A course search resolves every watched section of it, due or not
+            for section in watches.values():
+                course_key = (section.term_code, section.subject, section.course_number)
+                if course_key in course_groups:
+                    course_groups[course_key].append(section)
+
+            logger.info(f"Checking seats for {sum(len(sections) for sections in course_groups.values())} classes in {len(course_groups)} courses...")
+
+            # One search per course resolves every watched section of it, then each result is
+            # handed on for every guild watching that section
+            async def on_course_result(course_key: CourseKey, sections: Optional[List[Dict]]):
+                seats_by_crn = None if sections is None else section_seats(sections)
+                for section in course_groups[course_key]:
+                    available_seats = -2 if seats_by_crn is None else seats_by_crn.get(section.crn, -1)
+
+                    key = section.key
+                    if available_seats == -2:
+                        self.scheduler.defer(key, 'last check failed', BASE_POLL_INTERVAL)
+                        metrics.inc('classes_skipped_total', {'reason': 'failed'})
+                    elif available_seats == -1:
+                        self.scheduler.defer(key, 'not found in search results', MAX_POLL_INTERVAL)
+                    else:
+                        schedule = self.scheduler.sections.get(key)
+                        if schedule is not None:
+                            metrics.observe('section_staleness_seconds', schedule.staleness(time.time()), buckets=LAG_BUCKETS)
+                        self.scheduler.record(key, available_seats)
+                        self._checked[key] = time.time()
+                        metrics.inc('classes_checked_total', {'source': 'poll'})
+                        self.seat_history.record(section.term_code, section.crn, available_seats)
+                        if available_seats != section.last_available_seats:
+                            changed_seat_counts.append((section.term_code, section.crn, available_seats))
+
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug(f"Class {section.crn}: {available_seats} seat(s)", extra={
+                            'term': section.term_code, 'crn': section.crn, 'seats': available_seats,
+                            'guild': list(section.subscriptions)})
+                    await on_result(section, available_seats)
+
+            # Courses are spread across the session pool, each session working through one term at a time.
+            # Whatever hasn't started by the end of the time budget keeps its place for the next tick
+            requests_before = self.pool.request_count
+            unstarted = set(await self.pool.search_many(course_groups.keys(), on_course_result,
+                                                        deadline=pass_started + self.time_budget))
+            for course_key in unstarted:
+                for key in due_courses[course_key]:
+                    self.scheduler.requeue(key)
+                metrics.inc('classes_skipped_total', {'reason': 'time_budget'}, len(due_courses[course_key]))
+            if unstarted:
+                logger.info(f"Out of time for this pass, {len(unstarted)} course(s) wait for the next one")
+
+            # The next pass starts with the guild after the last one served
+            served = [guild_id for course_key, guild_id in fair_order if course_key in course_groups and course_key not in unstarted]
+            if served:
+                self.round_robin.served(served[-1])
+
+            # Settle the budget with what the searches actually cost (term switches, extra pages, retries),
+            # refunding the estimate of searches that never started
+            requests_made = self.pool.request_count - requests_before
+            self.scheduler.budget.charge(requests_made - len(course_groups) * ESTIMATED_REQUESTS_PER_SEARCH)
+
+        # Persist seat counts that moved and cookies Banner rotated right away, and when unchanged
+        # counts were confirmed every CHECKPOINT_INTERVAL
+        if changed_seat_counts:
+            self.storage.save_seat_counts(changed_seat_counts)
+        if time.monotonic() - self._last_checkpoint >= CHECKPOINT_INTERVAL:
+            self.checkpoint()
+        self.save_cookies()
+        self.seat_history.maintain()
+
+        pass_duration = time.monotonic() - pass_started
+        metrics.observe('seat_check_pass_seconds', pass_duration, buckets=PASS_BUCKETS)
+        metrics.set('seat_check_last_pass_seconds', pass_duration)
+
+def encode_message(message: Dict) -> bytes:
+    return (json.dumps(message, separators=(',', ':')) + '\n').encode()
+
+def section_message(section: Section) -> Dict:
+    """What the poller needs to know about a watched section"""
+    return {
+        'term_code': section.term_code,
+        'crn': section.crn,
+        'subject': section.subject,
+        'course_number': section.course_number,
+        'last_available_seats': section.last_available_seats,
+        'guild_ids': list(section.subscriptions),
+    }
+
+class PollerServer:
+    """Runs a SeatPoller as a standalone worker, serving bots over a Unix socket
+
+    Bots send their watch list ('sync', then 'watch'/'unwatch' as it changes) and catalog
+    lookups ('resolve'); the worker sends back a 'seats' event for every seat count change
+    and a 'notice' for developers when Banner goes down or comes back.
+    Events are buffered while no bot is connected, so polling carries on across bot restarts.
+    """
+
+    def __init__(self, poller: SeatPoller, socket_path: str):
+        self.poller = poller
+        self.socket_path = socket_path
+        self.watches: Dict[SectionKey, Section] = {}
+        self.clients: Set[asyncio.StreamWriter] = set()
+        self.buffered: Deque[Dict] = deque(maxlen=EVENT_BUFFER_SIZE)
+        self._server = None
+        poller.on_notice = lambda notice: self.publish({'type': 'notice', 'message': notice, 'at': time.time()})
+
+    def load_watches(self):
+        """Start from the sections saved in the database, so polling begins before any bot connects"""
+        self.watches = self.poller.storage.load_watched_sections()
+        logger.info(f"Watching {len(self.watches)} saved section(s)")
+
+    async def start(self):
+        # A socket file left behind by a previous run would make the bind fail
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self._server = await asyncio.start_unix_server(self._handle_client, self.socket_path, limit=IPC_LINE_LIMIT)
+        logger.info(f"Poller listening on {self.socket_path}")
+
+    async def run(self):
+        """Poll forever, one pass every SCHEDULER_TICK"""
+        while True:
+            try:
+                await self.poller.run_pass(self.watches, self.on_result)
+            except Exception as e:
+                logger.exception(f"Error in poller pass: {e}")
+            await asyncio.sleep(SCHEDULER_TICK)
+
+    async def on_result(self, section: Section, available_seats: int):
+        if available_seats == -1:
+            logger.warning(f"Class {section.crn} not found in search results", extra={'term': section.term_code, 'crn': section.crn})
+            return
+        elif available_seats == -2:
+            logger.error(f"Failed to check seats for {section.crn}", extra={'term': section.term_code, 'crn': section.crn})
+            return
+        if available_seats == section.last_available_seats:
+            return
+
+        self.publish({
+            'type': 'seats',
+            'term_code': section.term_code,
+            'crn': section.crn,
+            'seats': available_seats,
+            'previous': section.last_available_seats,
+            'at': time.time(),
+        })
+        section.last_available_seats = available_seats
+
+    def publish(self, event: Dict):
+        if not self.clients:
+            self.buffered.append(event)
+            return
+        data = encode_message(event)
+        for writer in list(self.clients):
+            self._write(writer, data)
+
+    def _write(self, writer: asyncio.StreamWriter, data: bytes):
+        """Queue data for a bot, disconnecting it if it has stopped reading"""
+        if writer.is_closing():
+            return
+        writer.write(data)
+        if writer.transport.get_write_buffer_size() > CLIENT_WRITE_BUFFER_LIMIT:
+            logger.warning("Disconnecting a bot that has fallen behind on events")
+            self.clients.discard(writer)
+            writer.close()
+
+    def _apply_watch(self, message: Dict):
+        key = (message['term_code'], message['crn'])
+        section = self.watches.get(key)
+        if section is None:
+            section = self.watches[key] = Section(message['term_code'], message['crn'], message['subject'], message['course_number'],
+                                                  last_available_seats=message.get('last_available_seats'))
+        else:
+            section.subject = message['subject']
+            section.course_number = message['course_number']
+        # Which guilds watch it, for sharing polling fairly between guilds (their users stay with the bot)
+        section.subscriptions = {
+            guild_id: section.subscriptions.get(guild_id) or Subscription(guild_id, section)
+            for guild_id in message.get('guild_ids', ())
+        }
+
+    async def _handle_message(self, message: Dict, writer: asyncio.StreamWriter):
+        message_type = message.get('type')
+        if message_type == 'sync':
+            # The bot's full watch list replaces ours, keeping the seat counts we already know
+            keys = set()
+            for section in message['sections']:
+                self._apply_watch(section)
+                keys.add((section['term_code'], section['crn']))
+            for key in list(self.watches):
+                if key not in keys:
+                    del self.watches[key]
+            logger.info(f"Bot synced {len(keys)} watched section(s)")
+        elif message_type == 'watch':
+            self._apply_watch(message)
+        elif message_type == 'unwatch':
+            self.watches.pop((message['term_code'], message['crn']), None)
+        elif message_type == 'resolve':
+            entries, has_term = await self.poller.resolve_sections(message['term_code'], message['crns'])
+            self._write(writer, encode_message({
+                'type': 'resolved',
+                'id': message['id'],
+                'sections': {
+                    crn: None if entry is None else {slot: getattr(entry, slot) for slot in CatalogEntry.__slots__}
+                    for crn, entry in entries.items()
+                },
+                'has_term': has_term,
+            }))
+        else:
+            logger.warning(f"Ignoring unknown message type {message_type!r}")
+
+    async def _serve_message(self, message: Dict, writer: asyncio.StreamWriter):
+        try:
+            await self._handle_message(message, writer)
+        except Exception as e:
+            logger.exception(f"Error handling a {message.get('type')!r} message from the bot: {e}")
+            if message.get('type') == 'resolve' and 'id' in message:
+                # Answer anyway, so the bot isn't left waiting out RESOLVE_TIMEOUT
+                self._write(writer, encode_message({'type': 'resolved', 'id': message['id'], 'error': f"{type(e).__name__}: {e}"}))
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        logger.info("Bot connected")
+        self.clients.add(writer)
+
+        # Hand over what happened while no bot was listening, minus anything too old to announce
+        cutoff = time.time() - EVENT_MAX_AGE
+        while self.buffered:
+            event = self.buffered.popleft()
+            if event['at'] >= cutoff:
+                self._write(writer, encode_message(event))
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    message = None
+                if not isinstance(message, dict):
+                    logger.warning("Ignoring malformed message from bot")
+                    continue
+                # Lookups can take a while (building a catalog), so don't hold up the rest of the stream
+                asyncio.ensure_future(self._serve_message(message, writer))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            writer.close()
+            logger.info("Bot disconnected")
+
+class PollerClient:
+    """The bot's side of the connection to a standalone poller
+
+    Reconnects on its own, and re-sends the full watch list every time it does.
+    """
+
+    def __init__(self, socket_path: str, get_sections: Callable[[], List[Dict]],
+                 on_seats: Callable[[Dict], Awaitable[None]], on_notice: Callable[[str], None] = None):
+        self.socket_path = socket_path
+        self.get_sections = get_sections
+        self.on_seats = on_seats
+        self.on_notice = on_notice
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._task: Optional[asyncio.Task] = None
+        self._next_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._run())
+
+    def _send(self, message: Dict) -> bool:
+        if self._writer is None:
+            return False
+        self._writer.write(encode_message(message))
+        return True
+
+    def watch(self, section: Section):
+        # Missed while disconnected is fine: the next connection re-syncs everything
+        self._send({'type': 'watch', **section_message(section)})
+
+    def unwatch(self, key: SectionKey):
+        self._send({'type': 'unwatch', 'term_code': key[0], 'crn': key[1]})
+
+    async def resolve(self, term_code: str, crn: str) -> Tuple[Optional[CatalogEntry], bool]:
+        """Ask the poller to look a CRN up in its catalog, as SeatPoller.resolve_section does"""
+        entries, has_term = await self.resolve_many(term_code, [crn])
+        return entries.get(crn), has_term
+
+    async def resolve_many(self, term_code: str, crns: List[str]) -> Tuple[Dict[str, Optional[CatalogEntry]], bool]:
+        """Ask the poller to look several CRNs of one term up in one request, as SeatPoller.resolve_sections does"""
+        self._next_id += 1
+        request_id = self._next_id
+        future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+        try:
+            if not self._send({'type': 'resolve', 'id': request_id, 'term_code': term_code, 'crns': crns}):
+                return {}, False
+            reply = await asyncio.wait_for(future, RESOLVE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return {}, False
+        finally:
+            self._pending.pop(request_id, None)
+
+        if 'error' in reply:
+            logger.warning(f"The poller failed to look up CRNs in {term_code}: {reply['error']}", extra={'term': term_code})
+            return {}, False
+        return {crn: CatalogEntry(**section) if section else None for crn, section in reply['sections'].items()}, reply['has_term']
+
+    async def _run(self):
+        while True:
+            try:
+                reader, self._writer = await asyncio.open_unix_connection(self.socket_path, limit=IPC_LINE_LIMIT)
+                logger.info(f"Connected to the poller at {self.socket_path}")
+                self._send({'type': 'sync', 'sections': self.get_sections()})
+
+                while True:
+                    line = await reader.readline()
+                    if not line:
+                        break
+                    message = json.loads(line)
+                    if message.get('type') == 'seats':
+                        await self.on_seats(message)
+                    elif message.get('type') == 'notice':
+                        if self.on_notice:
+                            self.on_notice(message['message'])
+                    elif message.get('type') == 'resolved':
+                        future = self._pending.get(message['id'])
+                        if future is not None and not future.done():
+                            future.set_result(message)
+
+                logger.warning("Lost the connection to the poller")
+            except (OSError, ValueError) as e:
+                logger.warning(f"Can't reach the poller at {self.socket_path}: {e}")
+            finally:
+                if self._writer is not None:
+                    self._writer.close()
+                self._writer = None
+                # Nothing in flight will be answered on this connection
+                for future in self._pending.values():
+                    if not future.done():
+                        future.set_result({'sections': {}, 'has_term': False})
+
+            await asyncio.sleep(RECONNECT_DELAY)
+
+async def main():
+    configure_from_config()
+    storage = BotStorage()
+    # The poller may be started before the bot ever ran against this database
+    if storage.migrate_from_json():
+        logger.info("Migrated bot_data.json into the database")
+    # One cookie set per pooled Banner session, as in the bot
+    cookie_sets = getattr(config, 'CLASS_REGISTRAR_COOKIE_SETS', None) or [config.CLASS_REGISTRAR_COOKIES]
+    poller = SeatPoller(storage, cookie_sets, history_sync_interval=HISTORY_SYNC_INTERVAL)
+    poller.start()
+
+    server = PollerServer(poller, getattr(config, 'POLLER_SOCKET', 'poller.sock'))
+    server.load_watches()
+    await server.start()
+
+    metrics_port = getattr(config, 'METRICS_PORT', None)
+    if metrics_port:
+        await start_http_server(metrics_port)
+        logger.info(f"Serving metrics at http://127.0.0.1:{metrics_port}/metrics")
+
+    try:
+        await server.run()
+    finally:
+        await poller.close()
+        storage.close()
+
+# Run the poller on its own (set POLLER_SOCKET in config.py so the bot connects to it)
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,275 @@
+import bisect
+import heapq
+import math
+import time
+from collections import deque
+from datetime import datetime
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+# Polling intervals (seconds). Sections start at the base interval, drop towards the
+# minimum while they're volatile, nearly full or inside a registration window, and back
+# off towards the maximum while their seat count stays put
+MIN_POLL_INTERVAL = 10
+BASE_POLL_INTERVAL = 20
+MAX_POLL_INTERVAL = 600
+
+# A section counts as volatile if its seat count changed within this window
+VOLATILITY_WINDOW = 900
+# Every STABLE_DOUBLING_PERIOD without a change doubles the interval
+STABLE_DOUBLING_PERIOD = 600
+# Seat counts this low (but above zero) are about to flip, so keep them at the base rate
+NEAR_ZERO_SEATS = 3
+# How long to push back a section that couldn't be polled (over budget, request failed)
+DEFER_DELAY = 5
+# After a restart, polling ramps up to full speed over this many seconds
+WARMUP_PERIOD = 60
+
+# Observations kept per section for the volatility calculation
+HISTORY_LENGTH = 32
+
+class RequestBudget:
+    """Token bucket capping how many Banner requests are made per minute"""
+
+    def __init__(self, requests_per_minute: int):
+        self.capacity = requests_per_minute
+        self.tokens = float(requests_per_minute)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def available(self) -> float:
+        self._refill()
+        return self.tokens
+
+    def try_consume(self, cost: float) -> bool:
+        """Take cost tokens if they're available"""
+        self._refill()
+        if self.tokens < cost:
+            return False
+        self.tokens -= cost
+        return True
+
+    def charge(self, cost: float):
+        """Take tokens unconditionally (requests already made), possibly going into debt"""
+        self._refill()
+        self.tokens -= cost
+
+class SectionSchedule:
+    """Scheduling state for one watched section"""
+    __slots__ = ('next_due', 'interval', 'reason', 'last_seats', 'last_change', 'observations',
+                 'last_checked', 'worst_staleness')
+
+    def __init__(self, now: float):
+        self.next_due = now
+        self.interval = BASE_POLL_INTERVAL
+        self.reason = 'new section'
+        self.last_seats: Optional[int] = None
+        self.last_change = now
+        # (timestamp, seats) of recent checks
+        self.observations = deque(maxlen=HISTORY_LENGTH)
+        # When the seat count was last confirmed (tracking starts the clock), and the longest
+        # it has ever gone unconfirmed
+        self.last_checked = now
+        self.worst_staleness = 0.0
+
+    def staleness(self, now: float) -> float:
+        """Seconds since the section's seat count was last confirmed"""
+        return now - self.last_checked
+
+class PollScheduler:
+    """Priority-queue scheduler giving every watched section its own next-due time
+
+    Sections are keyed by any hashable (the bot uses (term_code, crn)). The heap uses
+    lazy deletion: rescheduling pushes a new entry and stale ones are skipped when popped.
+    """
+
+    def __init__(self, requests_per_minute: int, registration_windows: Iterable[Tuple[str, str]] = ()):
+        self.budget = RequestBudget(requests_per_minute)
+        self.registration_windows = [
+            (datetime.fromisoformat(start).timestamp(), datetime.fromisoformat(end).timestamp())
+            for start, end in registration_windows
+        ]
+        self.sections: Dict[Hashable, SectionSchedule] = {}
+        self._heap: List[Tuple[float, int, Hashable]] = []
+        self._counter = 0
+
+    def _push(self, key: Hashable, schedule: SectionSchedule):
+        self._counter += 1
+        heapq.heappush(self._heap, (schedule.next_due, self._counter, key))
+
+    def sync(self, keys: Iterable[Hashable], baselines: Dict[Hashable, Optional[int]] = None):
+        """Track exactly the given sections: new ones become due now, missing ones are dropped"""
+        now = time.time()
+        keys = set(keys)
+        for key in list(self.sections):
+            if key not in keys:
+                del self.sections[key]
+        for key in keys:
+            if key not in self.sections:
+                schedule = self.sections[key] = SectionSchedule(now)
+                if baselines:
+                    schedule.last_seats = baselines.get(key)
+                self._push(key, schedule)
+
+    def warm_start(self, baselines: Dict[Hashable, Tuple[Optional[int], Optional[float], Optional[float]]],
+                   period: float = WARMUP_PERIOD, now: float = None):
+        """Start tracking sections from checkpointed (seats, checked_at, changed_at) baselines
+
+        Each section resumes with its saved seat count and when it was last confirmed and
+        last changed. Instead of all being due at once, the oldest baselines (or missing
+        ones) go first and the rest follow at a steadily rising rate: the i-th of n is due
+        period * sqrt(i / n) seconds from now.
+        """
+        now = now or time.time()
+        keys = sorted((key for key in baselines if key not in self.sections), key=lambda key: baselines[key][1] or 0)
+        for index, key in enumerate(keys):
+            seats, checked_at, changed_at = baselines[key]
+            schedule = self.sections[key] = SectionSchedule(now)
+            schedule.last_seats = seats
+            schedule.last_checked = checked_at or now
+            schedule.last_change = changed_at or now
+            schedule.next_due = now + period * math.sqrt(index / len(keys))
+            schedule.reason = 'warming up after a restart'
+            self._push(key, schedule)
+
+    def pop_due(self, now: float = None) -> List[Hashable]:
+        """Remove and return every section whose next-due time has passed, most overdue first"""
+        now = now or time.time()
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            next_due, _, key = heapq.heappop(self._heap)
+            schedule = self.sections.get(key)
+            if schedule is None or schedule.next_due != next_due:
+                continue  # Stale entry: the section was dropped or rescheduled
+            due.append(key)
+        return due
+
+    def in_registration_window(self, now: float) -> bool:
+        return any(start <= now <= end for start, end in self.registration_windows)
+
+    def _schedule(self, key: Hashable, schedule: SectionSchedule, interval: float, reason: str, now: float):
+        schedule.interval = interval
+        schedule.reason = reason
+        schedule.next_due = now + interval
+        self._push(key, schedule)
+
+    def record(self, key: Hashable, seats: int, now: float = None):
+        """Record a fresh seat count for a section and schedule its next check"""
+        schedule = self.sections.get(key)
+        if schedule is None:
+            return
+        now = now or time.time()
+
+        schedule.worst_staleness = max(schedule.worst_staleness, schedule.staleness(now))
+        schedule.last_checked = now
+        if schedule.last_seats is not None and seats != schedule.last_seats:
+            schedule.last_change = now
+        schedule.last_seats = seats
+        schedule.observations.append((now, seats))
+
+        interval, reason = self.compute_interval(schedule, now)
+        self._schedule(key, schedule, interval, reason, now)
+
+    def requeue(self, key: Hashable):
+        """Put back a section popped as due but not polled, keeping its due time and so its place in line"""
+        schedule = self.sections.get(key)
+        if schedule is not None:
+            self._push(key, schedule)
+
+    def defer(self, key: Hashable, reason: str, delay: float = DEFER_DELAY, now: float = None):
+        """Push a section back without a new observation (over budget, request failed...)"""
+        schedule = self.sections.get(key)
+        if schedule is None:
+            return
+        self._schedule(key, schedule, delay, reason, now or time.time())
+
+    def compute_interval(self, schedule: SectionSchedule, now: float) -> Tuple[float, str]:
+        """Pick a section's next polling interval, returning it with a human-readable reason"""
+        changes = sum(
+            1 for (_, previous), (at, seats) in zip(schedule.observations, list(schedule.observations)[1:])
+            if seats != previous and now - at <= VOLATILITY_WINDOW
+        )
+        stable_for = now - schedule.last_change
+
+        if self.in_registration_window(now):
+            return MIN_POLL_INTERVAL, 'inside a registration window'
+        if changes:
+            # More changes in the window -> closer to the minimum interval
+            interval = max(MIN_POLL_INTERVAL, BASE_POLL_INTERVAL / (1 + changes))
+            return interval, f'volatile ({changes} change(s) in the last {VOLATILITY_WINDOW // 60} min)'
+        if schedule.last_seats is not None and 0 < schedule.last_seats <= NEAR_ZERO_SEATS:
+            return BASE_POLL_INTERVAL, f'near zero ({schedule.last_seats} seat(s) left)'
+
+        doublings = int(stable_for // STABLE_DOUBLING_PERIOD)
+        if doublings == 0:
+            return BASE_POLL_INTERVAL, 'recently changed or new'
+        interval = min(MAX_POLL_INTERVAL, BASE_POLL_INTERVAL * 2 ** min(doublings, 10))
+        state = 'full' if schedule.last_seats == 0 else 'stable'
+        return interval, f'{state} for {int(stable_for // 60)} min'
+
+    def upcoming(self, limit: int = 10) -> List[Tuple[Hashable, SectionSchedule]]:
+        """The next sections due, soonest first"""
+        return sorted(self.sections.items(), key=lambda item: item[1].next_due)[:limit]
+
+    def stalest(self, now: float = None) -> Optional[Tuple[Hashable, float]]:
+        """The section whose seat count has gone unconfirmed the longest, with how long"""
+        if not self.sections:
+            return None
+        now = now or time.time()
+        key, schedule = min(self.sections.items(), key=lambda item: item[1].last_checked)
+        return key, schedule.staleness(now)
+
+class RoundRobin:
+    """Orders each tick's work fairly across its owners (guilds), picking up where the last tick stopped
+
+    Owners take turns contributing their next item, so one owner with hundreds of items
+    can't push everyone else's to the back. An item several owners share is taken once, in
+    the turn of whichever owner reaches it first. Owners with a quota contribute at most
+    that many items per tick.
+    """
+
+    def __init__(self, quotas: Dict[Hashable, int] = None):
+        self.quotas = quotas or {}
+        # The owner served last, the next tick starts with the owner after it
+        self.last_served: Optional[Hashable] = None
+
+    def order(self, items_by_owner: Dict[Hashable, Iterable[Hashable]]) -> Tuple[List[Tuple[Hashable, Hashable]], List[Hashable]]:
+        """Interleave every owner's items (each already in its own priority order)
+
+        Returns the (item, owner) pairs in turn order, then the items left over once their
+        owners' quotas were used up.
+        """
+        owners = sorted(items_by_owner)
+        if self.last_served is not None:
+            start = bisect.bisect_right(owners, self.last_served)
+            owners = owners[start:] + owners[:start]
+
+        queues = [(owner, deque(items_by_owner[owner])) for owner in owners]
+        taken = set()
+        counts = dict.fromkeys(owners, 0)
+        ordered: List[Tuple[Hashable, Hashable]] = []
+        while queues:
+            still_waiting = []
+            for owner, queue in queues:
+                while queue and queue[0] in taken:
+                    queue.popleft()
+                quota = self.quotas.get(owner)
+                if not queue or (quota is not None and counts[owner] >= quota):
+                    continue
+                item = queue.popleft()
+                taken.add(item)
+                counts[owner] += 1
+                ordered.append((item, owner))
+                still_waiting.append((owner, queue))
+            queues = still_waiting
+
+        over_quota = list(dict.fromkeys(
+            item for items in items_by_owner.values() for item in items if item not in taken
+        ))
+        return ordered, over_quota
+
+    def served(self, owner: Hashable):
+        self.last_served = owner
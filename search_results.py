@@ -0,0 +1,141 @@
+import json
+import re
+from typing import Dict, Iterable, List, Optional
+
+# What the seat checker needs from each section: its CRN, seats, capacity and waitlist, plus
+# the term so a response served without our term context can be spotted
+SEAT_FIELDS = ('courseReferenceNumber', 'term', 'seatsAvailable', 'maximumEnrollment', 'waitAvailable', 'waitCapacity')
+
+# Top-level fields of a searchResults response that are kept
+RESPONSE_FIELDS = ('success', 'totalCount')
+
+# Skips over everything but brackets and the keys of interest (whole strings at a time, so
+# brackets inside them don't count), then stops at one of those keys (1), a bracket (2), a string
+# that may continue in the next chunk (3), or the end of the chunk. As the end always matches,
+# the scan never has to backtrack
+TOKEN_PATTERN = (rb'(?:[^"{}\[\]]+|"(?!(?:%(keys)s)"\s*:)[^"\\]*(?:\\.[^"\\]*)*"(?!\s*\Z))*'
+                 rb'(?:"(%(keys)s)"\s*:|([{}\[\]])|(")|\Z)')
+SCALAR = re.compile(rb'(-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|"(?:[^"\\]|\\.)*"|true|false|null)')
+WHITESPACE = re.compile(rb'\s*')
+# What may follow a scalar value. A number is only complete once one of these comes after it
+DELIMITERS = b',}] \t\r\n'
+
+OPEN_OBJECT, CLOSE_OBJECT, OPEN_ARRAY = ord('{'), ord('}'), ord('[')
+NESTED = (OPEN_OBJECT, OPEN_ARRAY)
+
+class SearchResultsParser:
+    """Incremental searchResults parser that keeps only the fields asked for
+
+    Fed the response body chunk by chunk, it walks the JSON without building it: the nested
+    faculty, meeting time and attribute data of every section is skipped over, and each
+    item of 'data' comes out as a small dict of the requested top-level fields.
+    """
+
+    def __init__(self, fields: Iterable[str] = SEAT_FIELDS):
+        self.fields = set(fields)
+        keys = b'|'.join(re.escape(key.encode()) for key in sorted(self.fields | set(RESPONSE_FIELDS) | {'data'}))
+        self._token = re.compile(TOKEN_PATTERN % {b'keys': keys})
+        self.response: Dict = {'data': None}
+        self.sections: List[Dict] = []
+
+        self._buffer = b''
+        self._depth = 0
+        self._data_next = False
+        self._in_data = False
+        self._section: Optional[Dict] = None
+
+    def feed(self, chunk: bytes):
+        self._buffer += chunk
+        self._parse(final=False)
+
+    def close(self) -> Dict:
+        """Finish parsing, returning the response like json.loads would, minus the skipped fields"""
+        self._parse(final=True)
+        if self._depth or self._buffer.strip():
+            raise ValueError("Truncated searchResults response")
+        return self.response
+
+    def _scalar(self, position: int, final: bool):
+        """Parse the scalar value starting at position: (value, end), (None, -1) if it isn't one, or None to wait for more"""
+        buffer = self._buffer
+        start = WHITESPACE.match(buffer, position).end()
+        if start == len(buffer) or buffer[start] in NESTED:
+            return None if start == len(buffer) and not final else (None, -1)
+
+        match = SCALAR.match(buffer, start)
+        if match is None or (match.end() < len(buffer) and buffer[match.end()] not in DELIMITERS):
+            if final:
+                raise ValueError("Malformed searchResults response")
+            return None  # Cut off by the end of the chunk, e.g. 1 of 1.5 or tru of true
+        if match.end() == len(buffer) and not final:
+            return None  # A number that may carry on
+        return json.loads(match.group(1)), match.end()
+
+    def _parse(self, final: bool):
+        buffer = self._buffer
+        token = self._token
+        position = 0
+        while True:
+            match = token.match(buffer, position)
+            if match.lastindex is None:
+                position = match.end()
+                break
+            if match.lastindex == 3:
+                # A string that may be cut off, wait for the rest
+                if final:
+                    raise ValueError("Truncated searchResults response")
+                position = match.start(3)
+                break
+
+            if match.lastindex == 2:
+                bracket = buffer[match.start(2)]
+                position = match.end()
+                if bracket == OPEN_OBJECT or bracket == OPEN_ARRAY:
+                    self._depth += 1
+                    if self._data_next and bracket == OPEN_ARRAY and self._depth == 2:
+                        self._in_data = True
+                        self.response['data'] = self.sections
+                    elif self._in_data and self._depth == 3:
+                        self._section = {}
+                else:
+                    if self._in_data and self._depth == 3 and bracket == CLOSE_OBJECT:
+                        self.sections.append(self._section)
+                        self._section = None
+                    elif self._in_data and self._depth == 2:
+                        self._in_data = False
+                    self._depth -= 1
+                self._data_next = False
+                continue
+
+            self._data_next = False
+            key = match.group(1).decode()
+            key_start = match.start(1) - 1
+            position = match.end()
+            if self._depth == 1:
+                if key == 'data':
+                    self._data_next = True
+                    continue
+                if key not in RESPONSE_FIELDS:
+                    continue
+                target = self.response
+            elif self._depth == 3 and self._in_data and key in self.fields:
+                target = self._section
+            else:
+                continue  # The same name deeper down, in nested data
+
+            scalar = self._scalar(position, final)
+            if scalar is None:
+                position = key_start
+                break
+            value, end = scalar
+            if end != -1:
+                target[key] = value
+                position = end
+
+        self._buffer = buffer[position:]
+
+def parse_search_results(body: bytes, fields: Iterable[str] = SEAT_FIELDS) -> Dict:
+    """Parse a whole searchResults body at once, keeping only the given section fields"""
+    parser = SearchResultsParser(fields)
+    parser.feed(body)
+    return parser.close()
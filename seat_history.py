@@ -0,0 +1,228 @@
+import sqlite3
+import time
+import zlib
+from array import array
+from collections import deque
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# Observations are buffered per section and written as one chunk once there are
+# CHUNK_SIZE of them or the oldest has waited CHUNK_MAX_AGE seconds
+CHUNK_SIZE = 256
+CHUNK_MAX_AGE = 3600
+
+# Chunks older than DOWNSAMPLE_AFTER keep only seat changes plus one sample per
+# DOWNSAMPLE_BUCKET, and anything older than RETENTION is deleted
+DOWNSAMPLE_AFTER = 7 * 24 * 3600
+DOWNSAMPLE_BUCKET = 3600
+RETENTION = 180 * 24 * 3600
+# How often maintain() runs the downsampling/retention pass
+COMPACT_INTERVAL = 3600
+
+SCHEMA = """
+-- Each row is a delta-encoded chunk of one section's seat observations: time_deltas holds
+-- seconds since the previous observation and seat_deltas the change in seats (the first
+-- entry of each is relative to chunk_start / zero), both as zlib-compressed int arrays
+CREATE TABLE IF NOT EXISTS seat_history (
+    term_code TEXT NOT NULL,
+    crn TEXT NOT NULL,
+    chunk_start INTEGER NOT NULL,
+    chunk_end INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    downsampled INTEGER NOT NULL DEFAULT 0,
+    time_deltas BLOB NOT NULL,
+    seat_deltas BLOB NOT NULL,
+    PRIMARY KEY (term_code, crn, chunk_start)
+);
+-- latest_term looks a CRN up without knowing its term
+CREATE INDEX IF NOT EXISTS seat_history_crn ON seat_history (crn, chunk_end);
+"""
+
+Observation = Tuple[int, int]
+
+def encode_chunk(observations: List[Observation]) -> Tuple[bytes, bytes]:
+    """Delta-encode (timestamp, seats) pairs into two compressed int arrays"""
+    time_deltas = array('i')
+    seat_deltas = array('i')
+    previous_at, previous_seats = observations[0][0], 0
+    for at, seats in observations:
+        time_deltas.append(at - previous_at)
+        seat_deltas.append(seats - previous_seats)
+        previous_at, previous_seats = at, seats
+    return zlib.compress(time_deltas.tobytes()), zlib.compress(seat_deltas.tobytes())
+
+def decode_chunk(chunk_start: int, time_blob: bytes, seat_blob: bytes) -> Iterator[Observation]:
+    """Yield the (timestamp, seats) pairs of an encoded chunk"""
+    time_deltas = array('i')
+    time_deltas.frombytes(zlib.decompress(time_blob))
+    seat_deltas = array('i')
+    seat_deltas.frombytes(zlib.decompress(seat_blob))
+
+    at, seats = chunk_start, 0
+    for time_delta, seat_delta in zip(time_deltas, seat_deltas):
+        at += time_delta
+        seats += seat_delta
+        yield at, seats
+
+def downsample(observations: List[Observation]) -> List[Observation]:
+    """Keep every seat change, plus the first observation of each DOWNSAMPLE_BUCKET"""
+    kept = []
+    previous_seats = None
+    previous_bucket = None
+    for at, seats in observations:
+        bucket = at // DOWNSAMPLE_BUCKET
+        if seats != previous_seats or bucket != previous_bucket:
+            kept.append((at, seats))
+        previous_seats, previous_bucket = seats, bucket
+    return kept
+
+class SeatHistory:
+    """Compact time series of every seat count observed per (term_code, crn)
+
+    With a sync_interval, chunks still being filled are also written out that often (and
+    rewritten as they grow), for readers of the database in another process.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, sync_interval: Optional[float] = None):
+        self.connection = connection
+        self.sync_interval = sync_interval
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+        # (term_code, crn) -> observations of the chunk being filled, and how many of them are
+        # already written (when synced)
+        self._buffers: Dict[Tuple[str, str], List[Observation]] = {}
+        self._written: Dict[Tuple[str, str], int] = {}
+        self.last_compaction = 0.0
+        self.last_sync = time.time()
+
+    def record(self, term_code: str, crn: str, seats: int, at: float = None):
+        """Buffer one seat count observation"""
+        self._buffers.setdefault((term_code, crn), []).append((int(at or time.time()), seats))
+
+    def _write_chunk(self, term_code: str, crn: str, observations: List[Observation], downsampled: bool = False):
+        time_blob, seat_blob = encode_chunk(observations)
+        self.connection.execute(
+            'INSERT OR REPLACE INTO seat_history '
+            '(term_code, crn, chunk_start, chunk_end, count, downsampled, time_deltas, seat_deltas) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+            (term_code, crn, observations[0][0], observations[-1][0], len(observations),
+             int(downsampled), time_blob, seat_blob),
+        )
+
+    def flush(self, force: bool = False):
+        """Write every buffer that is full or old enough (or all of them if forced)
+
+        Once per sync_interval the rest are written too, but kept to be extended.
+        """
+        now = time.time()
+        sync = self.sync_interval is not None and now - self.last_sync >= self.sync_interval
+        with self.connection:
+            for key, observations in list(self._buffers.items()):
+                if force or len(observations) >= CHUNK_SIZE or now - observations[0][0] >= CHUNK_MAX_AGE:
+                    self._write_chunk(*key, observations)
+                    del self._buffers[key]
+                    self._written.pop(key, None)
+                elif sync and len(observations) > self._written.get(key, 0):
+                    # Same chunk_start, so this replaces the row written at the last sync
+                    self._write_chunk(*key, observations)
+                    self._written[key] = len(observations)
+        if sync:
+            self.last_sync = now
+
+    def compact(self):
+        """Downsample old chunks and drop anything past the retention period"""
+        now = time.time()
+        with self.connection:
+            self.connection.execute('DELETE FROM seat_history WHERE chunk_end < ?', (now - RETENTION,))
+
+            rows = self.connection.execute(
+                'SELECT term_code, crn, chunk_start, time_deltas, seat_deltas FROM seat_history '
+                'WHERE downsampled = 0 AND chunk_end < ?',
+                (now - DOWNSAMPLE_AFTER,),
+            ).fetchall()
+            for term_code, crn, chunk_start, time_blob, seat_blob in rows:
+                observations = downsample(list(decode_chunk(chunk_start, time_blob, seat_blob)))
+                self._write_chunk(term_code, crn, observations, downsampled=True)
+
+    def maintain(self):
+        """Flush whatever buffers are due, and compact the stored history once per COMPACT_INTERVAL"""
+        self.flush()
+        if time.time() - self.last_compaction >= COMPACT_INTERVAL:
+            self.compact()
+            self.last_compaction = time.time()
+
+    def iter_observations(self, term_code: str, crn: str, start: float, end: float) -> Iterator[Observation]:
+        """Yield a section's observations in [start, end], decoding one chunk at a time"""
+        rows = self.connection.execute(
+            'SELECT chunk_start, time_deltas, seat_deltas FROM seat_history '
+            'WHERE term_code = ? AND crn = ? AND chunk_end >= ? AND chunk_start <= ? ORDER BY chunk_start',
+            (term_code, crn, int(start), int(end)),
+        )
+        for chunk_start, time_blob, seat_blob in rows:
+            for at, seats in decode_chunk(chunk_start, time_blob, seat_blob):
+                if start <= at <= end:
+                    yield at, seats
+
+        key = (term_code, crn)
+        for at, seats in self._buffers.get(key, [])[self._written.get(key, 0):]:
+            if start <= at <= end:
+                yield at, seats
+
+    def latest_term(self, crn: str) -> Optional[str]:
+        """The most recent term a CRN has history in"""
+        row = self.connection.execute(
+            'SELECT term_code FROM seat_history WHERE crn = ? ORDER BY chunk_end DESC LIMIT 1', (crn,)
+        ).fetchone()
+        if row:
+            return row[0]
+        terms = sorted(term_code for term_code, buffered_crn in self._buffers if buffered_crn == crn)
+        return terms[-1] if terms else None
+
+    def summarize(self, term_code: str, crn: str, start: float, end: float, max_events: int = 10) -> Dict:
+        """Summary stats and the most recent change events for a section over a time range
+
+        Streams through the observations, so only max_events change events are held in memory.
+        """
+        count = 0
+        total_seats = 0
+        min_seats = max_seats = None
+        first = last = None
+        zero_time = 0.0
+        changes = 0
+        openings = 0
+        openings_by_hour = [0] * 24
+        events = deque(maxlen=max_events)
+
+        for at, seats in self.iter_observations(term_code, crn, start, end):
+            count += 1
+            total_seats += seats
+            min_seats = seats if min_seats is None else min(min_seats, seats)
+            max_seats = seats if max_seats is None else max(max_seats, seats)
+
+            if last is not None:
+                last_at, last_seats = last
+                if last_seats == 0:
+                    zero_time += at - last_at
+                if seats != last_seats:
+                    changes += 1
+                    events.append((at, last_seats, seats))
+                    if last_seats == 0 and seats > 0:
+                        openings += 1
+                        openings_by_hour[time.localtime(at).tm_hour] += 1
+            else:
+                first = (at, seats)
+            last = (at, seats)
+
+        covered = (last[0] - first[0]) if count > 1 else 0
+        return {
+            'count': count,
+            'first': first,
+            'last': last,
+            'min': min_seats,
+            'max': max_seats,
+            'mean': total_seats / count if count else None,
+            'changes': changes,
+            'openings': openings,
+            'openings_by_hour': openings_by_hour,
+            'full_fraction': zero_time / covered if covered else None,
+            'events': list(events),
+        }
@@ -0,0 +1,222 @@
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+from banner import TERMS
+from subscriptions import SubscriptionIndex
+
+# Classes per cn!status page. An embed holds at most 25 fields and 6000 characters, so
+# this leaves room for the notification channel field and long course names
+STATUS_PAGE_SIZE = 12
+# How long a status message's buttons keep working
+NAVIGATION_TIMEOUT = 300
+
+# (term or None, subject or None, only classes with open seats)
+StatusFilter = Tuple[Optional[str], Optional[str], bool]
+
+def parse_filter(args: Iterable[str]) -> StatusFilter:
+    """Read cn!status arguments in any order: a term (FALL), a subject (CMPT) and/or 'open'"""
+    term = subject = None
+    only_open = False
+    for arg in args:
+        arg = arg.upper()
+        if arg in TERMS:
+            term = arg
+        elif arg == 'OPEN':
+            only_open = True
+        else:
+            subject = arg
+    return term, subject, only_open
+
+class StatusRow:
+    """One watched class as of the snapshot it belongs to"""
+    __slots__ = ('crn', 'term', 'year', 'subject', 'course_number', 'watchers', 'seats')
+
+    def __init__(self, crn: str, term: str, year: str, subject: str, course_number: str, watchers: int, seats: Optional[int]):
+        self.crn = crn
+        self.term = term
+        self.year = year
+        self.subject = subject
+        self.course_number = course_number
+        self.watchers = watchers
+        self.seats = seats
+
+    def matches(self, status_filter: StatusFilter) -> bool:
+        term, subject, only_open = status_filter
+        return ((term is None or self.term == term) and (subject is None or self.subject == subject)
+                and (not only_open or bool(self.seats)))
+
+class GuildStatus:
+    """A read-only snapshot of one guild's watched classes, rendered into pages as they're asked for
+
+    Rendered pages are kept until the guild's data changes, which replaces the whole
+    snapshot (with a new version) instead of updating this one.
+    """
+
+    def __init__(self, version: int, fingerprint: Tuple, notify_channel: Optional[str], rows: List[StatusRow]):
+        self.version = version
+        self.fingerprint = fingerprint
+        self.notify_channel = notify_channel
+        self.rows = rows
+        self._filtered: Dict[StatusFilter, List[StatusRow]] = {}
+        self._pages: Dict[Tuple[StatusFilter, int], Tuple[discord.Embed, int]] = {}
+
+    def page_count(self, status_filter: StatusFilter) -> int:
+        return max(1, -(-len(self.filtered(status_filter)) // STATUS_PAGE_SIZE))
+
+    def filtered(self, status_filter: StatusFilter) -> List[StatusRow]:
+        rows = self._filtered.get(status_filter)
+        if rows is None:
+            rows = self._filtered[status_filter] = [row for row in self.rows if row.matches(status_filter)]
+        return rows
+
+    def render(self, status_filter: StatusFilter, page: int) -> Tuple[discord.Embed, int, int]:
+        """The embed for a page (clamped to the pages there are), with its page number and the page count"""
+        pages = self.page_count(status_filter)
+        page = min(max(page, 0), pages - 1)
+        cached = self._pages.get((status_filter, page))
+        if cached is None:
+            cached = self._pages[(status_filter, page)] = (self._build_page(status_filter, page, pages), page)
+        return cached[0], cached[1], pages
+
+    def _build_page(self, status_filter: StatusFilter, page: int, pages: int) -> discord.Embed:
+        rows = self.filtered(status_filter)
+        embed = discord.Embed(title="📚 Class Monitoring Status", color=0x0c6b41)
+
+        if self.notify_channel:
+            embed.add_field(name="📢 Notification Channel", value=self.notify_channel, inline=False)
+        else:
+            embed.add_field(
+                name="⚠️ Notification Channel",
+                value="Not set! Use `cn!setchannel` to set where notifications will be sent.",
+                inline=False
+            )
+
+        term, subject, only_open = status_filter
+        shown = [part for part in (term, subject, "open seats only" if only_open else None) if part]
+        if shown:
+            embed.description = f"**Filter:** {' · '.join(shown)}"
+        if not rows:
+            embed.description = (embed.description + "\n" if embed.description else "") + "No classes match this filter."
+
+        for row in rows[page * STATUS_PAGE_SIZE:(page + 1) * STATUS_PAGE_SIZE]:
+            status_text = f"**Term:** {row.term} {row.year}\n"
+            status_text += f"**Users watching:** {row.watchers}\n"
+            status_text += f"**Available seats:** {row.seats if row.seats is not None else 'Checking...'}"
+            embed.add_field(name=f"{row.subject} {row.course_number} (CRN: {row.crn})", value=status_text, inline=True)
+
+        embed.set_footer(text=f"Page {page + 1}/{pages} · {len(rows)} class(es)")
+        return embed
+
+class StatusBoard:
+    """The latest status snapshot of every guild, republished after seat counts or subscriptions change
+
+    Publishing is skipped while nothing was invalidated, and a guild whose classes, seat
+    counts and channel are unchanged keeps its snapshot, version and rendered pages.
+    """
+
+    def __init__(self):
+        self.guilds: Dict[int, GuildStatus] = {}
+        self.version = 0
+        self.stale = True
+
+    def invalidate(self):
+        self.stale = True
+
+    def publish(self, subscriptions: SubscriptionIndex, notify_channels: Dict[int, discord.abc.GuildChannel]):
+        """Snapshot every guild's classes, given each guild's usable notification channel"""
+        if not self.stale:
+            return
+        self.stale = False
+        guilds = {}
+        for guild_id, guild in subscriptions.guilds.items():
+            channel = notify_channels.get(guild_id)
+            subscriptions_by_course = sorted(
+                guild.subscriptions.values(),
+                key=lambda subscription: (subscription.section.term_code, subscription.section.subject,
+                                          subscription.section.course_number, subscription.crn)
+            )
+            fingerprint = (channel.id if channel else None, tuple(
+                (subscription.section.term_code, subscription.crn, len(subscription.user_ids),
+                 subscription.section.last_available_seats)
+                for subscription in subscriptions_by_course
+            ))
+
+            previous = self.guilds.get(guild_id)
+            if previous is not None and previous.fingerprint == fingerprint:
+                guilds[guild_id] = previous
+                continue
+
+            self.version += 1
+            rows = [
+                StatusRow(subscription.crn, subscription.section.term, subscription.section.year, subscription.section.subject,
+                          subscription.section.course_number, len(subscription.user_ids), subscription.section.last_available_seats)
+                for subscription in subscriptions_by_course
+            ]
+            guilds[guild_id] = GuildStatus(self.version, fingerprint, channel.mention if channel else None, rows)
+        self.guilds = guilds
+
+class StatusView(discord.ui.View):
+    """Page and open-seats buttons under a cn!status message, for the member who asked for it
+
+    Every click renders from the current snapshot, so the pages stay up to date while the
+    message is open.
+    """
+
+    def __init__(self, current_status: Callable[[], Optional[GuildStatus]], author_id: int, status_filter: StatusFilter):
+        super().__init__(timeout=NAVIGATION_TIMEOUT)
+        self.current_status = current_status
+        self.author_id = author_id
+        self.status_filter = status_filter
+        self.page = 0
+        self.message: Optional[discord.Message] = None
+
+    def render(self) -> Optional[discord.Embed]:
+        """Render the current page and update the buttons to match, None if the guild watches nothing anymore"""
+        status = self.current_status()
+        if status is None:
+            return None
+        embed, self.page, pages = status.render(self.status_filter, self.page)
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= pages - 1
+        self.only_open.style = discord.ButtonStyle.success if self.status_filter[2] else discord.ButtonStyle.secondary
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.author_id:
+            await interaction.response.send_message("Use `cn!status` to get your own copy of this list.", ephemeral=True)
+            return False
+        return True
+
+    async def _update(self, interaction: discord.Interaction):
+        embed = self.render()
+        if embed is None:
+            self.stop()
+            await interaction.response.edit_message(content="📋 No classes are currently being monitored in this server.",
+                                                    embed=None, view=None)
+            return
+        await interaction.response.edit_message(embed=embed, view=self)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page -= 1
+        await self._update(interaction)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        self.page += 1
+        await self._update(interaction)
+
+    @discord.ui.button(label="Open seats only", style=discord.ButtonStyle.secondary)
+    async def only_open(self, interaction: discord.Interaction, button: discord.ui.Button):
+        term, subject, only_open = self.status_filter
+        self.status_filter = (term, subject, not only_open)
+        self.page = 0
+        await self._update(interaction)
+
+    async def on_timeout(self):
+        if self.message is not None:
+            try:
+                await self.message.edit(view=None)
+            except discord.HTTPException:
+                pass
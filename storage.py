@@ -0,0 +1,267 @@
+import json
+import sqlite3
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from banner import get_term_code
+from subscriptions import Section, SectionKey, Subscription, SubscriptionIndex
+
+DATABASE_PATH = 'bot_data.db'
+LEGACY_JSON_PATH = 'bot_data.json'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS guilds (
+    guild_id INTEGER PRIMARY KEY,
+    notify_channel_id INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS classes (
+    guild_id INTEGER NOT NULL,
+    crn TEXT NOT NULL,
+    term_code TEXT NOT NULL,
+    subject TEXT NOT NULL,
+    course_number TEXT NOT NULL,
+    year TEXT NOT NULL,
+    term TEXT NOT NULL,
+    PRIMARY KEY (guild_id, crn)
+);
+
+CREATE TABLE IF NOT EXISTS subscriptions (
+    guild_id INTEGER NOT NULL,
+    crn TEXT NOT NULL,
+    user_id INTEGER NOT NULL,
+    PRIMARY KEY (guild_id, crn, user_id)
+);
+
+-- Last seen seat count per section, shared by every guild watching it, with when it last
+-- changed (updated_at) and when it was last confirmed (checked_at, checkpointed periodically)
+CREATE TABLE IF NOT EXISTS sections (
+    term_code TEXT NOT NULL,
+    crn TEXT NOT NULL,
+    last_available_seats INTEGER,
+    updated_at REAL NOT NULL,
+    checked_at REAL,
+    PRIMARY KEY (term_code, crn)
+);
+
+-- One cookie set per pooled Banner session, matched by position
+CREATE TABLE IF NOT EXISTS cookies (
+    session_index INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    value TEXT NOT NULL,
+    PRIMARY KEY (session_index, name)
+);
+"""
+
+class BotStorage:
+    """SQLite-backed persistence for guild settings, subscriptions, seat counts and cookies
+
+    Every change is written as a small row-level upsert inside its own transaction, and
+    the database runs in WAL mode so a crash mid-write can't corrupt existing state.
+    """
+
+    def __init__(self, path: str = DATABASE_PATH):
+        self.connection = sqlite3.connect(path)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        with self.connection:
+            self.connection.executescript(SCHEMA)
+            # Databases created before checked_at existed
+            columns = {row[1] for row in self.connection.execute('PRAGMA table_info(sections)')}
+            if 'checked_at' not in columns:
+                self.connection.execute('ALTER TABLE sections ADD COLUMN checked_at REAL')
+
+    def close(self):
+        self.connection.close()
+
+    def get_meta(self, key: str) -> Optional[str]:
+        row = self.connection.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def migrate_from_json(self, json_path: str = LEGACY_JSON_PATH) -> bool:
+        """Import an existing bot_data.json once, returning True if anything was imported"""
+        if self.get_meta('migrated_from_json'):
+            return False
+
+        try:
+            with open(json_path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return False
+
+        # Older files hold a single 'cookies' set
+        cookie_sets = data.get('cookie_sets') or ([data['cookies']] if data.get('cookies') else [])
+
+        with self.connection:
+            for guild_id, guild_info in data.get('guilds', {}).items():
+                guild_id = int(guild_id)
+                self.connection.execute(
+                    'INSERT OR IGNORE INTO guilds (guild_id, notify_channel_id) VALUES (?, ?)',
+                    (guild_id, guild_info.get('notify_channel_id')),
+                )
+                for crn, class_info in guild_info.items():
+                    if crn == 'notify_channel_id':
+                        continue
+                    self._upsert_class(guild_id, crn, get_term_code(class_info['year'], class_info['term']),
+                                       class_info['subject'], class_info['course_number'],
+                                       class_info['year'], class_info['term'])
+                    self.connection.executemany(
+                        'INSERT OR IGNORE INTO subscriptions (guild_id, crn, user_id) VALUES (?, ?, ?)',
+                        [(guild_id, crn, user_id) for user_id in class_info['users_to_notify']],
+                    )
+                    if class_info.get('last_available_seats') is not None:
+                        # Several guilds may have saved the same section, the first known count wins
+                        self.connection.execute(
+                            'INSERT OR IGNORE INTO sections (term_code, crn, last_available_seats, updated_at) VALUES (?, ?, ?, ?)',
+                            (get_term_code(class_info['year'], class_info['term']), crn,
+                             class_info['last_available_seats'], time.time()),
+                        )
+
+            for index, cookies in enumerate(cookie_sets):
+                self._replace_cookie_set(index, cookies)
+
+            self.connection.execute(
+                'INSERT INTO meta (key, value) VALUES (?, ?)',
+                ('migrated_from_json', datetime.now().isoformat()),
+            )
+
+        return True
+
+    def load_subscriptions(self) -> SubscriptionIndex:
+        """Load every guild, watched section and subscribed user into an index"""
+        index = SubscriptionIndex()
+
+        for guild_id, notify_channel_id in self.connection.execute('SELECT guild_id, notify_channel_id FROM guilds'):
+            index.guild(guild_id).notify_channel_id = notify_channel_id
+
+        rows = self.connection.execute(
+            'SELECT c.guild_id, c.crn, c.subject, c.course_number, c.year, c.term, s.last_available_seats '
+            'FROM classes c LEFT JOIN sections s ON s.term_code = c.term_code AND s.crn = c.crn'
+        )
+        for guild_id, crn, subject, course_number, year, term, last_available_seats in rows:
+            index.add(guild_id, crn, year, term, subject, course_number, last_available_seats=last_available_seats)
+
+        for guild_id, crn, user_id in self.connection.execute('SELECT guild_id, crn, user_id FROM subscriptions'):
+            subscription = index.subscription(guild_id, crn)
+            if subscription is not None:
+                subscription.user_ids.add(user_id)
+                index.by_user.setdefault(user_id, set()).add(subscription)
+
+        return index
+
+    def load_watched_sections(self) -> Dict[SectionKey, Section]:
+        """Load every section some guild watches, with the guilds watching it but not their users"""
+        rows = self.connection.execute(
+            'SELECT c.term_code, c.crn, c.subject, c.course_number, c.year, c.term, s.last_available_seats, c.guild_id '
+            'FROM classes c LEFT JOIN sections s ON s.term_code = c.term_code AND s.crn = c.crn'
+        )
+        sections: Dict[SectionKey, Section] = {}
+        for term_code, crn, subject, course_number, year, term, last_available_seats, guild_id in rows:
+            section = sections.get((term_code, crn))
+            if section is None:
+                section = sections[(term_code, crn)] = Section(term_code, crn, subject, course_number, year, term,
+                                                               last_available_seats)
+            section.subscriptions[guild_id] = Subscription(guild_id, section)
+        return sections
+
+    def load_baselines(self) -> Dict[SectionKey, Tuple[Optional[int], float, float]]:
+        """Load every saved seat count with when it was last confirmed and when it last changed"""
+        return {
+            (term_code, crn): (last_available_seats, checked_at or updated_at, updated_at)
+            for term_code, crn, last_available_seats, checked_at, updated_at in self.connection.execute(
+                'SELECT term_code, crn, last_available_seats, checked_at, updated_at FROM sections')
+        }
+
+    def load_cookie_sets(self) -> List[Dict[str, str]]:
+        """Load the saved cookie set of each pooled session, in pool order"""
+        cookie_sets: List[Dict[str, str]] = []
+        for session_index, name, value in self.connection.execute(
+                'SELECT session_index, name, value FROM cookies ORDER BY session_index'):
+            while len(cookie_sets) <= session_index:
+                cookie_sets.append({})
+            cookie_sets[session_index][name] = value
+        return cookie_sets
+
+    def set_notify_channel(self, guild_id: int, channel_id: int):
+        with self.connection:
+            self.connection.execute(
+                'INSERT INTO guilds (guild_id, notify_channel_id) VALUES (?, ?) '
+                'ON CONFLICT (guild_id) DO UPDATE SET notify_channel_id = excluded.notify_channel_id',
+                (guild_id, channel_id),
+            )
+
+    def _upsert_class(self, guild_id: int, crn: str, term_code: str, subject: str, course_number: str, year: str, term: str):
+        self.connection.execute(
+            'INSERT INTO classes (guild_id, crn, term_code, subject, course_number, year, term) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?) '
+            'ON CONFLICT (guild_id, crn) DO UPDATE SET term_code = excluded.term_code, '
+            'subject = excluded.subject, course_number = excluded.course_number, '
+            'year = excluded.year, term = excluded.term',
+            (guild_id, crn, term_code, subject, course_number, year, term),
+        )
+
+    def add_subscription(self, subscription: Subscription, user_id: int):
+        """Save a guild's class (if new) and subscribe a user to it, in one transaction"""
+        self.add_subscriptions([subscription], user_id)
+
+    def add_subscriptions(self, subscriptions: Iterable[Subscription], user_id: int):
+        """Save guilds' classes (where new) and subscribe a user to all of them, in one transaction"""
+        with self.connection:
+            for subscription in subscriptions:
+                section = subscription.section
+                self.connection.execute('INSERT OR IGNORE INTO guilds (guild_id) VALUES (?)', (subscription.guild_id,))
+                self._upsert_class(subscription.guild_id, section.crn, section.term_code, section.subject,
+                                   section.course_number, section.year, section.term)
+                self.connection.execute(
+                    'INSERT OR IGNORE INTO subscriptions (guild_id, crn, user_id) VALUES (?, ?, ?)',
+                    (subscription.guild_id, section.crn, user_id),
+                )
+
+    def remove_subscription(self, guild_id: int, crn: str, user_id: int):
+        """Unsubscribe one user from a guild's class, leaving the class to its other subscribers"""
+        with self.connection:
+            self.connection.execute(
+                'DELETE FROM subscriptions WHERE guild_id = ? AND crn = ? AND user_id = ?', (guild_id, crn, user_id))
+
+    def remove_class(self, guild_id: int, crn: str):
+        """Stop monitoring a class in a guild, dropping its subscriptions"""
+        with self.connection:
+            self.connection.execute('DELETE FROM subscriptions WHERE guild_id = ? AND crn = ?', (guild_id, crn))
+            self.connection.execute('DELETE FROM classes WHERE guild_id = ? AND crn = ?', (guild_id, crn))
+
+    def save_seat_counts(self, seat_counts: Iterable[Tuple[str, str, int]]):
+        """Upsert the latest seat count of each (term_code, crn, seats) given"""
+        now = time.time()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT INTO sections (term_code, crn, last_available_seats, updated_at, checked_at) VALUES (?, ?, ?, ?, ?) '
+                'ON CONFLICT (term_code, crn) DO UPDATE SET last_available_seats = excluded.last_available_seats, '
+                'updated_at = excluded.updated_at, checked_at = excluded.checked_at',
+                [(term_code, crn, seats, now, now) for term_code, crn, seats in seat_counts],
+            )
+
+    def checkpoint_checks(self, checks: Iterable[Tuple[str, str, float]]):
+        """Record when each (term_code, crn, checked_at) given last had its seat count confirmed"""
+        with self.connection:
+            self.connection.executemany(
+                'UPDATE sections SET checked_at = ? WHERE term_code = ? AND crn = ? AND (checked_at IS NULL OR checked_at < ?)',
+                [(checked_at, term_code, crn, checked_at) for term_code, crn, checked_at in checks],
+            )
+
+    def _replace_cookie_set(self, session_index: int, cookies: Dict[str, str]):
+        self.connection.execute('DELETE FROM cookies WHERE session_index = ?', (session_index,))
+        self.connection.executemany(
+            'INSERT INTO cookies (session_index, name, value) VALUES (?, ?, ?)',
+            [(session_index, name, value) for name, value in cookies.items()],
+        )
+
+    def save_cookie_set(self, session_index: int, cookies: Dict[str, str]):
+        """Replace one pooled session's saved cookies"""
+        with self.connection:
+            self._replace_cookie_set(session_index, cookies)
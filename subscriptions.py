@@ -0,0 +1,129 @@
+from typing import Dict, List, Optional, Set, Tuple
+
+from banner import get_term_code
+
+# (term_code, crn)
+SectionKey = Tuple[str, str]
+
+class Section:
+    """A watched section, polled once however many guilds watch it"""
+    __slots__ = ('term_code', 'crn', 'subject', 'course_number', 'year', 'term', 'last_available_seats', 'subscriptions')
+
+    def __init__(self, term_code: str, crn: str, subject: str, course_number: str, year: str = '', term: str = '',
+                 last_available_seats: Optional[int] = None):
+        self.term_code = term_code
+        self.crn = crn
+        self.subject = subject
+        self.course_number = course_number
+        self.year = year
+        self.term = term
+        self.last_available_seats = last_available_seats
+        # guild_id -> that guild's subscription, i.e. which guilds watch this section
+        self.subscriptions: Dict[int, 'Subscription'] = {}
+
+    @property
+    def key(self) -> SectionKey:
+        return (self.term_code, self.crn)
+
+    def describe(self) -> str:
+        return f"{self.subject} {self.course_number}"
+
+class Subscription:
+    """One guild's watch on a section, with the users of that guild to notify"""
+    __slots__ = ('guild_id', 'section', 'user_ids')
+
+    def __init__(self, guild_id: int, section: Section):
+        self.guild_id = guild_id
+        self.section = section
+        self.user_ids: Set[int] = set()
+
+    @property
+    def crn(self) -> str:
+        return self.section.crn
+
+class Guild:
+    __slots__ = ('guild_id', 'notify_channel_id', 'subscriptions')
+
+    def __init__(self, guild_id: int, notify_channel_id: Optional[int] = None):
+        self.guild_id = guild_id
+        self.notify_channel_id = notify_channel_id
+        # crn -> Subscription
+        self.subscriptions: Dict[str, Subscription] = {}
+
+class SubscriptionIndex:
+    """Every guild's subscriptions, indexed by guild, by watched section and by user
+
+    Sections are shared between the guilds watching them, so a seat count is stored once
+    and every guild's view of it is always current.
+    """
+
+    def __init__(self):
+        self.guilds: Dict[int, Guild] = {}
+        self.sections: Dict[SectionKey, Section] = {}
+        # user_id -> every subscription the user is part of, across guilds
+        self.by_user: Dict[int, Set[Subscription]] = {}
+
+    def guild(self, guild_id: int) -> Guild:
+        """The guild's record, created empty the first time it's needed"""
+        guild = self.guilds.get(guild_id)
+        if guild is None:
+            guild = self.guilds[guild_id] = Guild(guild_id)
+        return guild
+
+    def subscription(self, guild_id: int, crn: str) -> Optional[Subscription]:
+        guild = self.guilds.get(guild_id)
+        return guild.subscriptions.get(crn) if guild is not None else None
+
+    def add(self, guild_id: int, crn: str, year: str, term: str, subject: str, course_number: str,
+            user_id: Optional[int] = None, last_available_seats: Optional[int] = None) -> Subscription:
+        """Subscribe a guild to a section (if it isn't already) and a user to the guild's subscription"""
+        guild = self.guild(guild_id)
+        subscription = guild.subscriptions.get(crn)
+        if subscription is None:
+            term_code = get_term_code(year, term)
+            section = self.sections.get((term_code, crn))
+            if section is None:
+                section = self.sections[(term_code, crn)] = Section(term_code, crn, subject, course_number, year, term)
+            # Adopt a known seat count if the section doesn't have one yet
+            if section.last_available_seats is None:
+                section.last_available_seats = last_available_seats
+
+            subscription = guild.subscriptions[crn] = section.subscriptions[guild_id] = Subscription(guild_id, section)
+
+        if user_id is not None:
+            subscription.user_ids.add(user_id)
+            self.by_user.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def remove_user(self, subscription: Subscription, user_id: int):
+        subscription.user_ids.discard(user_id)
+        user_subscriptions = self.by_user.get(user_id)
+        if user_subscriptions is not None:
+            user_subscriptions.discard(subscription)
+            if not user_subscriptions:
+                del self.by_user[user_id]
+
+    def remove(self, guild_id: int, crn: str) -> Optional[Section]:
+        """Drop a guild's subscription, returning its section if no guild watches it anymore"""
+        guild = self.guilds.get(guild_id)
+        subscription = guild.subscriptions.pop(crn, None) if guild is not None else None
+        if subscription is None:
+            return None
+
+        for user_id in list(subscription.user_ids):
+            self.remove_user(subscription, user_id)
+
+        section = subscription.section
+        del section.subscriptions[guild_id]
+        if section.subscriptions:
+            return None
+        del self.sections[section.key]
+        return section
+
+    def user_subscriptions(self, user_id: int, guild_id: Optional[int] = None) -> List[Subscription]:
+        """A user's subscriptions, optionally only in one guild, sorted by course"""
+        return sorted(
+            (subscription for subscription in self.by_user.get(user_id, ())
+             if guild_id is None or subscription.guild_id == guild_id),
+            key=lambda subscription: (subscription.section.subject, subscription.section.course_number, subscription.crn)
+        )
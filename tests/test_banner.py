@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from yarl import URL
+
+import banner
+from banner import TERM_AFFINITY_LIMIT, BannerSessionPool
+from benchmarks.fake_banner import ROOT, FakeBanner, bound_port
+from limiter import RateLimiter
+
+TERM_CODE = '202409'
+
+def run_against_fake(fake: FakeBanner, sessions: int, test, monkeypatch):
+    """Run test(pool) against fake served locally, with a pool of sessions whose cookies Banner doesn't know yet"""
+    async def run():
+        runner = await fake.start()
+        monkeypatch.setattr(banner, 'BANNER_URL', URL(f'http://localhost:{bound_port(runner)}{ROOT}'))
+        # Pacing requests like the real Banner needs would only slow the tests down
+        pool = BannerSessionPool([{'JSESSIONID': f'test-{index}'} for index in range(sessions)],
+                                 rate_limiter=RateLimiter(1000, 1000))
+        pool.initialize()
+        try:
+            return await test(pool)
+        finally:
+            await pool.close()
+            await runner.cleanup()
+
+    return asyncio.run(run())
+
+def test_check_class_seats(monkeypatch):
+    fake = FakeBanner([TERM_CODE], subjects=2, courses_per_subject=3)
+    record = fake.sections[TERM_CODE][4]
+
+    async def test(pool: BannerSessionPool):
+        # The unknown cookies are answered with a 401, refreshed and the search retried
+        seats = await pool.check_class_seats(record['subject'], record['courseNumber'], '2024', 'FALL',
+                                             record['courseReferenceNumber'])
+        missing = await pool.check_class_seats(record['subject'], record['courseNumber'], '2024', 'FALL', '1')
+        return seats, missing
+
+    assert run_against_fake(fake, 1, test, monkeypatch) == (record['seatsAvailable'], -1)
+
+def test_search_sections_walks_every_page(monkeypatch):
+    fake = FakeBanner([TERM_CODE], subjects=1, courses_per_subject=1, sections_per_course=12)
+
+    async def test(pool: BannerSessionPool):
+        async with pool.acquire(TERM_CODE) as banner_session:
+            return await banner_session.search_sections(TERM_CODE, 'S000', '100', page_size=5)
+
+    sections = run_against_fake(fake, 1, test, monkeypatch)
+    assert [section['courseReferenceNumber'] for section in sections] == fake.all_crns(TERM_CODE)
+    assert fake.request_counts['ssb/searchResults/searchResults'] == 3
+
+def test_searches_leave_the_event_loop_free(monkeypatch):
+    fake = FakeBanner([TERM_CODE], subjects=2, courses_per_subject=4, latency=0.05)
+    course_keys = [(TERM_CODE, f'S00{subject}', str(100 + course)) for subject in range(2) for course in range(4)]
+
+    async def test(pool: BannerSessionPool):
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        results = {}
+
+        async def on_result(key, sections):
+            results[key] = sections
+
+        ticking = asyncio.ensure_future(ticker())
+        try:
+            skipped = await pool.search_many(course_keys, on_result)
+        finally:
+            ticking.cancel()
+        return skipped, results, ticks
+
+    skipped, results, ticks = run_against_fake(fake, 2, test, monkeypatch)
+    assert skipped == []
+    assert sorted(results) == sorted(course_keys)
+    assert all(len(sections) == 6 for sections in results.values())
+    # Other tasks kept running while the requests were in flight
+    assert ticks >= 10
+
+def searched_order(monkeypatch, course_keys, deadline=None):
+    """The order one session searches course_keys in, and the ones it never started"""
+    fake = FakeBanner(['202409', '202501'], subjects=1, courses_per_subject=TERM_AFFINITY_LIMIT + 4, sections_per_course=1)
+
+    async def test(pool: BannerSessionPool):
+        order = []
+
+        async def on_result(key, sections):
+            order.append(key)
+
+        unstarted = await pool.search_many(course_keys, on_result, deadline=deadline)
+        return order, unstarted
+
+    return run_against_fake(fake, 1, test, monkeypatch)
+
+def test_search_many_prefers_the_sessions_term_within_limits(monkeypatch):
+    fall = [('202409', 'S000', str(100 + course)) for course in range(TERM_AFFINITY_LIMIT + 2)]
+    winter = ('202501', 'S000', '100')
+    order, unstarted = searched_order(monkeypatch, [fall[0], winter] + fall[1:])
+    assert unstarted == []
+    # Fall courses behind the winter one jump ahead to save a term switch, but only so many times
+    assert order == fall[:TERM_AFFINITY_LIMIT + 1] + [winter] + fall[TERM_AFFINITY_LIMIT + 1:]
+
+def test_search_many_starts_nothing_past_its_deadline(monkeypatch):
+    course_keys = [('202409', 'S000', '100'), ('202501', 'S000', '101')]
+    order, unstarted = searched_order(monkeypatch, course_keys, deadline=time.monotonic())
+    assert order == []
+    assert unstarted == course_keys
@@ -0,0 +1,27 @@
+import asyncio
+
+from breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+
+def test_only_the_probe_counts_once_tripped():
+    async def run():
+        breaker = CircuitBreaker(failure_threshold=2, base_backoff=0, max_backoff=0)
+        assert not await breaker.before_request()
+        breaker.record_failure('HTTP 503')
+        breaker.record_failure('HTTP 503')
+        assert breaker.state == OPEN
+
+        # Requests that were in flight when it tripped come back
+        breaker.record_success()
+        breaker.record_failure('HTTP 503')
+        assert breaker.state == OPEN
+
+        assert await breaker.before_request()
+        assert breaker.state == HALF_OPEN
+        breaker.record_success()
+        breaker.record_failure('HTTP 503')
+        assert breaker.state == HALF_OPEN
+
+        breaker.record_success(is_probe=True)
+        assert breaker.state == CLOSED
+
+    asyncio.run(run())
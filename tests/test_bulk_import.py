@@ -0,0 +1,79 @@
+import pytest
+
+from bulk_import import MAX_SUMMARY_LINES, ImportEntry, build_summary, group_by_term, parse_arguments, parse_attachment
+
+def entry_values(entries):
+    return [(entry.crn, entry.term, entry.year, entry.subject, entry.course_number) for entry in entries]
+
+def test_parse_arguments():
+    entries, term, year = parse_arguments(['fall', '2024', '10001,10002', '10003', 'WINTER', '2025', '10004'])
+    assert (term, year) == ('FALL', '2024')
+    assert entry_values(entries) == [
+        ('10001', 'FALL', '2024', None, None),
+        ('10002', 'FALL', '2024', None, None),
+        # A term right after a CRN applies to that CRN only
+        ('10003', 'WINTER', '2025', None, None),
+        ('10004', 'FALL', '2024', None, None),
+    ]
+
+    entries, term, year = parse_arguments(['10001', 'FALL'])
+    assert (term, year) == (None, None)
+    assert entry_values(entries) == [('10001', 'FALL', None, None, None)]
+
+def test_entry_problems():
+    assert ImportEntry('10001', 'fall', '2024').problem() is None
+    assert ImportEntry('CMPT', 'FALL', '2024').problem() == 'not a CRN'
+    assert ImportEntry('10001').problem() == 'no term and year given'
+    assert ImportEntry('10001', 'AUTUMN', '2024').problem().startswith('unknown term')
+    assert ImportEntry('10001', 'FALL', '24').problem() == 'the year should look like 2024'
+
+def test_parse_csv():
+    with_header = b'\xef\xbb\xbfCRN,Term,Year,Subject,Course Number\n10001,fall,2024,cmpt,141\n\n10002,,,,\n'
+    assert entry_values(parse_attachment('classes.csv', with_header, 'WINTER', '2025')) == [
+        ('10001', 'FALL', '2024', 'CMPT', '141'),
+        ('10002', 'WINTER', '2025', None, None),
+    ]
+    # Without a header the columns are read in order
+    assert entry_values(parse_attachment('classes.txt', b'10003,SPRING,2025\n10004')) == [
+        ('10003', 'SPRING', '2025', None, None),
+        ('10004', None, None, None, None),
+    ]
+    assert parse_attachment('empty.csv', b'\n\n') == []
+
+def test_parse_json():
+    data = b'[10001, "10002", {"crn": 10003, "term": "fall", "year": 2024, "subject": null}]'
+    assert entry_values(parse_attachment('classes.JSON', data, 'WINTER', '2025')) == [
+        ('10001', 'WINTER', '2025', None, None),
+        ('10002', 'WINTER', '2025', None, None),
+        ('10003', 'FALL', '2024', None, None),
+    ]
+
+def test_unreadable_attachments():
+    with pytest.raises(ValueError):
+        parse_attachment('classes.json', b'{"crn": 10001}')
+    with pytest.raises(ValueError):
+        parse_attachment('classes.json', b'[10001')
+    with pytest.raises(ValueError):
+        parse_attachment('classes.csv', b'\xff\xfe10001')
+
+def test_group_by_term():
+    entries = [ImportEntry('1', 'FALL', '2024'), ImportEntry('2', 'WINTER', '2025'), ImportEntry('3', 'FALL', '2024')]
+    groups = group_by_term(entries)
+    assert {term_code: [entry.crn for entry in group] for term_code, group in groups.items()} == {
+        '202409': ['1', '3'],
+        '202501': ['2'],
+    }
+
+def test_build_summary():
+    embed = build_summary(['CMPT 141 (CRN: 10001)'], [('10002', 'not found')])
+    assert embed.title == '📥 Added 1 class(es), rejected 1'
+    assert embed.description == '**✅ Added**\n• CMPT 141 (CRN: 10001)\n\n**❌ Rejected**\n• 10002: not found'
+    assert embed.footer.text
+
+    # Long lists are cut short, keeping the embed under Discord's limits
+    embed = build_summary([], [(str(10000 + index), 'not a CRN') for index in range(MAX_SUMMARY_LINES + 5)])
+    lines = embed.description.splitlines()
+    assert len(lines) == 1 + MAX_SUMMARY_LINES + 1
+    assert lines[-1] == '...and 5 more'
+    assert embed.footer.text is None
+    assert len(embed) <= 6000
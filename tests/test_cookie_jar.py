@@ -0,0 +1,73 @@
+import asyncio
+
+import aiohttp
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+from yarl import URL
+
+from cookie_jar import BannerCookieJar
+
+def make_app() -> web.Application:
+    async def set_cookie(request: web.Request) -> web.Response:
+        response = web.Response(text='ok')
+        response.set_cookie('JSESSIONID', request.query['value'], path=request.query.get('path', '/'))
+        return response
+
+    app = web.Application()
+    app.router.add_get('/{tail:.*}', set_cookie)
+    return app
+
+def jsessionids(jar: BannerCookieJar):
+    return [(cookie.value, cookie['path']) for cookie in jar if cookie.key == 'JSESSIONID']
+
+def test_response_cookies():
+    async def run():
+        # Cookies from IP addresses are refused, so the server is reached by name
+        server = TestServer(make_app(), host='localhost')
+        await server.start_server()
+        jar = BannerCookieJar()
+        try:
+            async with aiohttp.ClientSession(cookie_jar=jar) as session:
+                async def get(url: str, **query):
+                    async with session.get(server.make_url(url), params=query) as response:
+                        await response.read()
+
+                await get('/', value='first')
+                assert jsessionids(jar) == [('first', '/')]
+                version = jar.version
+
+                # Banner rotating the cookie on an ordinary response
+                await get('/', value='second')
+                assert jsessionids(jar) == [('second', '/')]
+                assert jar.version != version
+                version = jar.version
+
+                # The same name under another path replaces the old copy instead of adding one
+                await get('/StudentRegistrationSsb/ssb', value='third', path='/StudentRegistrationSsb')
+                assert jsessionids(jar) == [('third', '/StudentRegistrationSsb')]
+                assert jar.version != version
+                version = jar.version
+
+                # Setting the value it already has isn't a change
+                await get('/StudentRegistrationSsb/ssb', value='third', path='/StudentRegistrationSsb')
+                assert jsessionids(jar) == [('third', '/StudentRegistrationSsb')]
+                assert jar.version == version
+        finally:
+            await server.close()
+
+    asyncio.run(run())
+
+def test_update_cookies_replaces_other_scopes():
+    async def run():
+        jar = BannerCookieJar()
+        jar.update_cookies({'JSESSIONID': 'first'}, URL('https://banner.example.ca/'))
+        version = jar.version
+        jar.update_cookies({'JSESSIONID': 'first'}, URL('https://banner.example.ca/'))
+        assert jar.version == version
+
+        jar.update_cookies({'JSESSIONID': 'second'}, URL('https://sso.example.ca/'))
+        assert jar.values() == {'JSESSIONID': 'second'}
+        assert len(jar) == 1
+        assert jar.version != version
+
+    asyncio.run(run())
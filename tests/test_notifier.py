@@ -0,0 +1,85 @@
+import asyncio
+
+import notifier
+from notifier import MAX_MESSAGE_LENGTH, MAX_OPENINGS_PER_MESSAGE, NotificationDispatcher, SeatOpening, chunk_mentions
+from subscriptions import SubscriptionIndex
+
+class RecordingChannel:
+    """Stands in for a Discord channel, keeping what was sent to it"""
+
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.name = f'channel-{channel_id}'
+        self.sent = []
+
+    async def send(self, content=None, embed=None):
+        self.sent.append((content, embed))
+
+def opening(index: SubscriptionIndex, crn: str, seats: int, *user_ids: int) -> SeatOpening:
+    subscription = index.add(1, crn, '2024', 'FALL', 'CMPT', '141')
+    subscription.user_ids = set(user_ids)
+    return SeatOpening(subscription, seats)
+
+def dispatch(monkeypatch, sends):
+    """Queue every (channel, opening) in sends at once and wait for them all to go out"""
+    monkeypatch.setattr(notifier, 'COALESCE_DELAY', 0)
+
+    async def run():
+        dispatcher = NotificationDispatcher()
+        for channel, seat_opening in sends:
+            dispatcher.enqueue(channel, seat_opening)
+        assert dispatcher.depth == len(sends)
+        await dispatcher.drain()
+        assert dispatcher.depth == 0
+
+    asyncio.run(run())
+
+def test_chunk_mentions():
+    assert chunk_mentions([]) == []
+    assert chunk_mentions([1, 2]) == ['<@1> <@2>']
+
+    user_ids = list(range(10 ** 17, 10 ** 17 + 300))
+    chunks = chunk_mentions(user_ids)
+    assert len(chunks) > 1
+    assert all(len(chunk) <= MAX_MESSAGE_LENGTH for chunk in chunks)
+    assert ' '.join(chunks) == ' '.join(f'<@{user_id}>' for user_id in user_ids)
+
+def test_openings_in_a_channel_are_merged(monkeypatch):
+    index = SubscriptionIndex()
+    channel = RecordingChannel(1)
+    dispatch(monkeypatch, [
+        (channel, opening(index, '10001', 2, 7, 8)),
+        (channel, opening(index, '10002', 1, 8, 9)),
+        # A later count for a class already queued replaces the earlier one, keeping both sets of watchers
+        (channel, opening(index, '10001', 3, 6)),
+    ])
+
+    assert len(channel.sent) == 1
+    content, embed = channel.sent[0]
+    # Every watcher of either class, mentioned once
+    assert sorted(content.split()) == ['<@6>', '<@7>', '<@8>', '<@9>']
+    lines = embed.description.splitlines()
+    assert len(lines) == 2
+    assert 'CRN: 10001) - 3 seat(s)' in lines[0]
+    assert 'CRN: 10002) - 1 seat(s)' in lines[1]
+
+def test_long_batches_and_mention_lists_are_split(monkeypatch):
+    index = SubscriptionIndex()
+    many_classes = RecordingChannel(1)
+    many_watchers = RecordingChannel(2)
+    user_ids = range(10 ** 17, 10 ** 17 + 150)
+    dispatch(monkeypatch, [(many_classes, opening(index, str(10000 + crn), 1, 5)) for crn in range(MAX_OPENINGS_PER_MESSAGE + 2)]
+             + [(many_watchers, opening(index, '20000', 4, *user_ids))])
+
+    assert [len(embed.description.splitlines()) for _, embed in many_classes.sent] == [MAX_OPENINGS_PER_MESSAGE, 2]
+
+    # The embed goes with the first chunk of mentions only
+    assert len(many_watchers.sent) == 2
+    assert many_watchers.sent[0][1] is not None and many_watchers.sent[1][1] is None
+    assert all(len(content) <= MAX_MESSAGE_LENGTH for content, _ in many_watchers.sent)
+    assert len(' '.join(content for content, _ in many_watchers.sent).split()) == len(user_ids)
+
+def test_openings_without_watchers_are_dropped():
+    dispatcher = NotificationDispatcher()
+    dispatcher.enqueue(RecordingChannel(1), opening(SubscriptionIndex(), '10001', 2))
+    assert dispatcher.depth == 0
@@ -0,0 +1,127 @@
+import math
+import time
+
+from scheduler import (BASE_POLL_INTERVAL, MAX_POLL_INTERVAL, MIN_POLL_INTERVAL, STABLE_DOUBLING_PERIOD, PollScheduler,
+                       RequestBudget, RoundRobin, SectionSchedule)
+
+NOW = 1_700_000_000.0
+
+def observed(*seat_counts: int, every: float = 30, last_change: float = NOW) -> SectionSchedule:
+    """A schedule that saw the given seat counts, the last of them at NOW"""
+    schedule = SectionSchedule(NOW)
+    for index, seats in enumerate(seat_counts):
+        schedule.observations.append((NOW - (len(seat_counts) - 1 - index) * every, seats))
+    schedule.last_seats = seat_counts[-1] if seat_counts else None
+    schedule.last_change = last_change
+    return schedule
+
+def test_volatile_sections_speed_up():
+    scheduler = PollScheduler(240)
+    interval, reason = scheduler.compute_interval(observed(10, 9), NOW)
+    assert interval == BASE_POLL_INTERVAL / 2
+    assert reason.startswith('volatile (1 change')
+
+    interval, _ = scheduler.compute_interval(observed(10, 9, 8, 7, 6, 5), NOW)
+    assert interval == MIN_POLL_INTERVAL
+
+    # Changes older than the volatility window don't count
+    interval, _ = scheduler.compute_interval(observed(10, 9, 9, 9, every=1000, last_change=NOW - 2000), NOW)
+    assert interval > BASE_POLL_INTERVAL
+
+def test_near_zero_sections_stay_at_the_base_rate():
+    scheduler = PollScheduler(240)
+    interval, reason = scheduler.compute_interval(observed(2, 2, last_change=NOW - 5 * STABLE_DOUBLING_PERIOD), NOW)
+    assert (interval, reason) == (BASE_POLL_INTERVAL, 'near zero (2 seat(s) left)')
+
+def test_stable_sections_back_off():
+    scheduler = PollScheduler(240)
+    assert scheduler.compute_interval(observed(0, 0, last_change=NOW - 60), NOW)[0] == BASE_POLL_INTERVAL
+
+    interval, reason = scheduler.compute_interval(observed(0, 0, last_change=NOW - 2 * STABLE_DOUBLING_PERIOD), NOW)
+    assert interval == BASE_POLL_INTERVAL * 4
+    assert reason == f'full for {2 * STABLE_DOUBLING_PERIOD // 60} min'
+
+    interval, reason = scheduler.compute_interval(observed(40, 40, last_change=NOW - 30 * STABLE_DOUBLING_PERIOD), NOW)
+    assert interval == MAX_POLL_INTERVAL
+    assert reason.startswith('stable')
+
+def test_registration_windows_poll_fastest():
+    scheduler = PollScheduler(240, [('2023-11-14 00:00', '2023-11-16 00:00')])
+    assert scheduler.in_registration_window(NOW)
+    assert scheduler.compute_interval(observed(0, 0, last_change=NOW - 30 * STABLE_DOUBLING_PERIOD), NOW) == \
+        (MIN_POLL_INTERVAL, 'inside a registration window')
+
+def test_record_reschedules_and_pop_due_skips_stale_entries():
+    scheduler = PollScheduler(240)
+    # New sections are due as soon as they're tracked
+    scheduler.sync(['a', 'b'])
+    now = time.time()
+    assert sorted(scheduler.pop_due(now)) == ['a', 'b']
+
+    scheduler.record('a', 5, now=now)
+    scheduler.defer('b', 'over the request budget', 5, now=now)
+    assert scheduler.sections['a'].next_due == now + BASE_POLL_INTERVAL
+    assert scheduler.pop_due(now + 5) == ['b']
+
+    # Rescheduling leaves the old heap entry behind, it mustn't make the section due twice
+    scheduler.record('a', 5, now=now + 1)
+    assert scheduler.pop_due(now + BASE_POLL_INTERVAL) == []
+    assert scheduler.pop_due(now + BASE_POLL_INTERVAL + 1) == ['a']
+
+    scheduler.sync(['b'])
+    assert 'a' not in scheduler.sections
+
+def test_warm_start_ramps_up_oldest_first():
+    scheduler = PollScheduler(240)
+    baselines = {
+        'fresh': (3, NOW - 10, NOW - 100),
+        'old': (0, NOW - 5000, NOW - 9000),
+        'unknown': (None, None, None),
+        'middle': (7, NOW - 600, NOW - 600),
+    }
+    scheduler.warm_start(baselines, period=60, now=NOW)
+
+    order = ['unknown', 'old', 'middle', 'fresh']
+    for index, key in enumerate(order):
+        assert math.isclose(scheduler.sections[key].next_due, NOW + 60 * math.sqrt(index / len(order)))
+    assert scheduler.pop_due(NOW) == ['unknown']
+    assert scheduler.pop_due(NOW + 60) == ['old', 'middle', 'fresh']
+
+    # Sections resume with their saved state
+    assert scheduler.sections['old'].last_seats == 0
+    assert scheduler.sections['old'].last_change == NOW - 9000
+    assert scheduler.sections['old'].staleness(NOW) == 5000
+
+def test_request_budget():
+    budget = RequestBudget(60)
+    assert budget.try_consume(60)
+    assert not budget.try_consume(5)
+    budget.charge(10)
+    assert budget.available() < 0
+
+def test_round_robin_takes_turns_across_guilds():
+    round_robin = RoundRobin()
+    ordered, over_quota = round_robin.order({
+        2: ['b1', 'shared', 'b2'],
+        1: ['a1', 'a2', 'a3', 'a4'],
+        3: ['shared'],
+    })
+    # A course several guilds share is taken once, in the turn of the first guild to reach it
+    assert ordered == [('a1', 1), ('b1', 2), ('shared', 3), ('a2', 1), ('b2', 2), ('a3', 1), ('a4', 1)]
+    assert over_quota == []
+
+def test_round_robin_resumes_after_the_guild_served_last():
+    round_robin = RoundRobin()
+    courses = {1: ['a1', 'a2'], 2: ['b1'], 3: ['c1']}
+    round_robin.served(2)
+    assert [owner for _, owner in round_robin.order(courses)[0]] == [3, 1, 2, 1]
+
+    # A guild that served last and has since gone picks up with the one after it
+    round_robin.served(2)
+    assert [owner for _, owner in round_robin.order({1: ['a1'], 3: ['c1']})[0]] == [3, 1]
+
+def test_round_robin_quotas():
+    round_robin = RoundRobin({1: 2})
+    ordered, over_quota = round_robin.order({1: ['a1', 'a2', 'a3', 'shared'], 2: ['b1', 'shared']})
+    assert ordered == [('a1', 1), ('b1', 2), ('a2', 1), ('shared', 2)]
+    assert over_quota == ['a3']
@@ -0,0 +1,52 @@
+import pytest
+
+from search_results import SearchResultsParser, parse_search_results
+
+BODY = (b'{"success": true, "totalCount": 2, "data": ['
+        b'{"courseReferenceNumber": "10001", "term": "202409", "seatsAvailable": 3e2, "maximumEnrollment": 1.5E+1,'
+        b' "faculty": [{"seatsAvailable": 99}], "waitAvailable": -12, "waitCapacity": 0.25},'
+        b'{"courseReferenceNumber": "10002", "term": "202409", "seatsAvailable": 0, "maximumEnrollment": null,'
+        b' "waitAvailable": true, "waitCapacity": false}]}')
+
+EXPECTED = {
+    'success': True,
+    'totalCount': 2,
+    'data': [
+        {'courseReferenceNumber': '10001', 'term': '202409', 'seatsAvailable': 300.0, 'maximumEnrollment': 15.0,
+         'waitAvailable': -12, 'waitCapacity': 0.25},
+        {'courseReferenceNumber': '10002', 'term': '202409', 'seatsAvailable': 0, 'maximumEnrollment': None,
+         'waitAvailable': True, 'waitCapacity': False},
+    ],
+}
+
+def test_whole_body():
+    assert parse_search_results(BODY) == EXPECTED
+
+@pytest.mark.parametrize('split', range(1, len(BODY)))
+def test_split_anywhere(split):
+    parser = SearchResultsParser()
+    parser.feed(BODY[:split])
+    parser.feed(BODY[split:])
+    assert parser.close() == EXPECTED
+
+@pytest.mark.parametrize('first, second, value', [
+    (b'3', b'e2', 300.0),
+    (b'3e', b'2', 300.0),
+    (b'1', b'.5', 1.5),
+    (b'1.', b'5', 1.5),
+    (b'-', b'7', -7),
+    (b'12', b'34', 1234),
+])
+def test_number_split_at_chunk_boundary(first, second, value):
+    parser = SearchResultsParser()
+    parser.feed(b'{"data": [{"seatsAvailable": ' + first)
+    parser.feed(second + b'}]}')
+    assert parser.close()['data'] == [{'seatsAvailable': value}]
+
+def test_truncated_body():
+    with pytest.raises(ValueError):
+        parse_search_results(BODY[:-3])
+
+def test_malformed_number():
+    with pytest.raises(ValueError):
+        parse_search_results(b'{"data": [{"seatsAvailable": 3x}]}')
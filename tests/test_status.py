@@ -0,0 +1,103 @@
+import asyncio
+
+from status import STATUS_PAGE_SIZE, StatusBoard, StatusView, parse_filter
+from subscriptions import SubscriptionIndex
+
+class Channel:
+    def __init__(self, channel_id: int):
+        self.id = channel_id
+        self.mention = f'<#{channel_id}>'
+
+def watch(index: SubscriptionIndex, guild_id: int, count: int, subject: str = 'CMPT', seats: int = None):
+    for number in range(count):
+        subscription = index.add(guild_id, f'{guild_id}{subject}{number:03d}', '2024', 'FALL', subject, str(100 + number), user_id=1)
+        subscription.section.last_available_seats = seats
+
+def test_parse_filter():
+    assert parse_filter([]) == (None, None, False)
+    assert parse_filter(['open', 'cmpt', 'Fall']) == ('FALL', 'CMPT', True)
+    assert parse_filter(['WINTER']) == ('WINTER', None, False)
+
+def test_pages_and_filters():
+    index = SubscriptionIndex()
+    watch(index, 1, STATUS_PAGE_SIZE + 3, seats=0)
+    watch(index, 1, 2, subject='MATH', seats=5)
+    board = StatusBoard()
+    board.publish(index, {1: Channel(7)})
+    status = board.guilds[1]
+
+    assert status.page_count((None, None, False)) == 2
+    embed, page, pages = status.render((None, None, False), 1)
+    assert (page, pages) == (1, 2)
+    # The notification channel field, then the classes left for the last page
+    assert len(embed.fields) == 1 + 5
+    assert embed.fields[0].value == '<#7>'
+    assert embed.footer.text == f'Page 2/2 · {STATUS_PAGE_SIZE + 5} class(es)'
+
+    # Out of range pages are clamped, and pages are rendered once
+    assert status.render((None, None, False), 9)[0] is embed
+    assert status.render((None, None, False), -1)[1] == 0
+
+    embed, page, pages = status.render(('FALL', 'MATH', True), 0)
+    assert pages == 1
+    assert [field.name for field in embed.fields[1:]] == ['MATH 100 (CRN: 1MATH000)', 'MATH 101 (CRN: 1MATH001)']
+    assert embed.description == '**Filter:** FALL · MATH · open seats only'
+
+    embed, _, pages = status.render((None, 'BIOL', False), 0)
+    assert pages == 1 and len(embed.fields) == 1
+    assert embed.description.endswith('No classes match this filter.')
+
+def test_publish_reuses_unchanged_snapshots():
+    index = SubscriptionIndex()
+    watch(index, 1, 3, seats=0)
+    watch(index, 2, 3, seats=0)
+    board = StatusBoard()
+    board.publish(index, {1: Channel(7)})
+    first, second = board.guilds[1], board.guilds[2]
+    assert second.notify_channel is None
+
+    # Nothing republished until something is invalidated
+    index.subscription(1, '1CMPT000').section.last_available_seats = 4
+    board.publish(index, {1: Channel(7)})
+    assert board.guilds[1] is first
+
+    board.invalidate()
+    board.publish(index, {1: Channel(7)})
+    assert board.guilds[1] is not first
+    assert board.guilds[1].version > second.version
+    assert board.guilds[1].rows[0].seats == 4
+    assert board.guilds[2] is second
+
+    # A guild that stops watching everything drops out
+    for number in range(3):
+        index.remove(2, f'2CMPT{number:03d}')
+    del index.guilds[2]
+    board.invalidate()
+    board.publish(index, {1: Channel(7)})
+    assert sorted(board.guilds) == [1]
+
+def test_view_buttons_follow_the_snapshot():
+    async def run():
+        index = SubscriptionIndex()
+        watch(index, 1, STATUS_PAGE_SIZE + 1, seats=0)
+        board = StatusBoard()
+        board.publish(index, {})
+        view = StatusView(lambda: board.guilds.get(1), author_id=1, status_filter=(None, None, False))
+
+        assert view.render() is not None
+        assert view.previous_page.disabled and not view.next_page.disabled
+        view.page = 1
+        view.render()
+        assert not view.previous_page.disabled and view.next_page.disabled
+
+        # The snapshot shrinking under an open message clamps its page
+        index.remove(1, f'1CMPT{STATUS_PAGE_SIZE:03d}')
+        board.invalidate()
+        board.publish(index, {})
+        view.render()
+        assert view.page == 0 and view.next_page.disabled
+
+        board.guilds.clear()
+        assert view.render() is None
+
+    asyncio.run(run())
@@ -0,0 +1,41 @@
+from storage import BotStorage
+from subscriptions import SubscriptionIndex
+
+def subscribe(storage: BotStorage, index: SubscriptionIndex, guild_id: int, crn: str, user_id: int):
+    subscription = index.add(guild_id, crn, '2024', 'FALL', 'CMPT', '141', user_id)
+    storage.add_subscription(subscription, user_id)
+    return subscription
+
+def test_section_watched_by_many_guilds_is_stored_once():
+    storage = BotStorage(':memory:')
+    index = SubscriptionIndex()
+    for guild_id in (1, 2, 3):
+        subscribe(storage, index, guild_id, '12345', 100 + guild_id)
+    subscribe(storage, index, 1, '12346', 101)
+
+    watched = storage.load_watched_sections()
+    assert sorted(watched) == [('202409', '12345'), ('202409', '12346')]
+    assert sorted(watched[('202409', '12345')].subscriptions) == [1, 2, 3]
+
+    # A seat count is saved once per section and every guild's view picks it up
+    storage.save_seat_counts([('202409', '12345', 4)])
+    loaded = storage.load_subscriptions()
+    assert len(loaded.sections) == 2
+    assert {loaded.subscription(guild_id, '12345').section.last_available_seats for guild_id in (1, 2, 3)} == {4}
+    assert loaded.subscription(1, '12345').section is loaded.subscription(3, '12345').section
+    assert loaded.subscription(2, '12345').user_ids == {102}
+
+def test_removing_a_guilds_class_keeps_it_for_the_others():
+    storage = BotStorage(':memory:')
+    index = SubscriptionIndex()
+    for guild_id in (1, 2):
+        subscribe(storage, index, guild_id, '12345', 100 + guild_id)
+
+    assert index.remove(1, '12345') is None
+    storage.remove_class(1, '12345')
+    assert sorted(storage.load_watched_sections()[('202409', '12345')].subscriptions) == [2]
+
+    # The last guild to stop watching takes the section out of the polling set
+    assert index.remove(2, '12345').key == ('202409', '12345')
+    storage.remove_class(2, '12345')
+    assert storage.load_watched_sections() == {}
@@ -0,0 +1,73 @@
+from subscriptions import SubscriptionIndex
+
+def check_consistent(index: SubscriptionIndex):
+    """Every index agrees with the guilds' own subscriptions"""
+    subscriptions = {subscription for guild in index.guilds.values() for subscription in guild.subscriptions.values()}
+    assert {subscription for section in index.sections.values() for subscription in section.subscriptions.values()} == subscriptions
+    for subscription in subscriptions:
+        assert index.sections[subscription.section.key] is subscription.section
+        for user_id in subscription.user_ids:
+            assert subscription in index.by_user[user_id]
+    for user_id, user_subscriptions in index.by_user.items():
+        assert user_subscriptions
+        assert all(user_id in subscription.user_ids and subscription in subscriptions for subscription in user_subscriptions)
+
+def test_add_is_idempotent_and_shares_sections():
+    index = SubscriptionIndex()
+    first = index.add(1, '12345', '2024', 'FALL', 'CMPT', '141', user_id=10, last_available_seats=3)
+    assert index.add(1, '12345', '2024', 'FALL', 'CMPT', '141', user_id=10) is first
+    assert first.user_ids == {10}
+
+    second = index.add(2, '12345', '2024', 'FALL', 'CMPT', '141', user_id=11)
+    assert second.section is first.section
+    assert second.section.last_available_seats == 3
+    assert sorted(first.section.subscriptions) == [1, 2]
+
+    # The same CRN in another term is another section
+    other_term = index.add(2, '12345', '2025', 'WINTER', 'CMPT', '141')
+    assert other_term is second  # A guild watches a CRN once
+    index.add(3, '12345', '2025', 'WINTER', 'CMPT', '141')
+    assert sorted(index.sections) == [('202409', '12345'), ('202501', '12345')]
+    check_consistent(index)
+
+def test_user_index():
+    index = SubscriptionIndex()
+    index.add(1, '3', '2024', 'FALL', 'MATH', '110', user_id=10)
+    index.add(1, '1', '2024', 'FALL', 'CMPT', '141', user_id=10)
+    index.add(2, '2', '2024', 'FALL', 'CMPT', '141', user_id=10)
+    index.add(2, '4', '2024', 'FALL', 'BIOL', '120', user_id=11)
+
+    assert [subscription.crn for subscription in index.user_subscriptions(10)] == ['1', '2', '3']
+    assert [subscription.crn for subscription in index.user_subscriptions(10, guild_id=1)] == ['1', '3']
+    assert index.user_subscriptions(12) == []
+
+    index.remove_user(index.subscription(1, '1'), 10)
+    assert [subscription.crn for subscription in index.user_subscriptions(10)] == ['2', '3']
+    # Unsubscribing leaves the guild's class watched
+    assert index.subscription(1, '1').user_ids == set()
+    check_consistent(index)
+
+    index.remove_user(index.subscription(2, '4'), 11)
+    assert 11 not in index.by_user
+    check_consistent(index)
+
+def test_remove():
+    index = SubscriptionIndex()
+    index.add(1, '12345', '2024', 'FALL', 'CMPT', '141', user_id=10)
+    index.add(2, '12345', '2024', 'FALL', 'CMPT', '141', user_id=10)
+    index.add(2, '12345', '2024', 'FALL', 'CMPT', '141', user_id=11)
+
+    assert index.remove(1, '99999') is None
+    assert index.remove(3, '12345') is None
+
+    # The section stays while another guild watches it
+    assert index.remove(2, '12345') is None
+    assert 11 not in index.by_user
+    assert [subscription.guild_id for subscription in index.user_subscriptions(10)] == [1]
+    check_consistent(index)
+
+    section = index.remove(1, '12345')
+    assert section.key == ('202409', '12345')
+    assert index.sections == {} and index.by_user == {}
+    assert index.subscription(1, '12345') is None
+    check_consistent(index)